@@ -1,7 +1,8 @@
+from functools import partial
 from django.db import models
 from django.contrib.auth.models import AbstractUser
-from django.utils.text import slugify
 from django.conf import settings
+from apps.core.slugs import save_with_slug
 
 
 class CustomUser(AbstractUser):
@@ -31,6 +32,8 @@ class Store(models.Model):
     slug = models.SlugField(unique=True)
     description = models.TextField(blank=True)
     logo = models.ImageField(upload_to="store_logos", blank=True, null=True)
+    # Manifesto das variantes do logo (ver apps/core/images.py)
+    logo_variants = models.JSONField(default=dict, blank=True, editable=False)
     owner = models.OneToOneField(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -41,15 +44,7 @@ class Store(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)
-            unique_slug = self.slug
-            counter = 1
-            while Store.objects.filter(slug=unique_slug).exists():
-                unique_slug = f"{self.slug}-{counter}"
-                counter += 1
-            self.slug = unique_slug
-        super().save(*args, **kwargs)
+        save_with_slug(self, partial(super().save, *args, **kwargs), self.name)
 
     def __str__(self):
         return self.name
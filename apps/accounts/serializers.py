@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth import get_user_model
+from apps.core.images import SrcsetField
 from .models import Store
 
 User = get_user_model()
@@ -76,10 +77,23 @@ class StoreSerializer(serializers.ModelSerializer):
     """
 
     owner = UserSerializer(read_only=True, help_text="Proprietário da loja")
+    logo_srcset = SrcsetField(
+        source="logo_variants",
+        help_text="URLs das variantes do logo por tipo e largura",
+    )
 
     class Meta:
         model = Store
-        fields = ["id", "name", "slug", "description", "logo", "owner", "is_active"]
+        fields = [
+            "id",
+            "name",
+            "slug",
+            "description",
+            "logo",
+            "logo_srcset",
+            "owner",
+            "is_active",
+        ]
         read_only_fields = ["slug"]
 
 
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CartConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.cart"
+
+    def ready(self):
+        """
+        Importar os signals que mantêm updated_at do carrinho atualizado.
+        """
+        import apps.cart.signals
@@ -0,0 +1,206 @@
+"""
+Operações em lote sobre os itens do carrinho.
+
+add_items() adiciona vários produtos ao carrinho num único pedido. Todos
+os produtos são bloqueados num só SELECT ... FOR UPDATE ordenado por id:
+dois pedidos com os mesmos produtos bloqueiam-nos pela mesma ordem e não
+entram em deadlock (nem com add_to_cart, que bloqueia um único produto). O
+estoque de todas as linhas é validado de uma vez e os itens são gravados
+com um único INSERT ... ON CONFLICT DO UPDATE. Se alguma linha for
+inválida, nada é gravado.
+
+merge_items() e merge_guest_items() juntam um carrinho temporário (do banco
+ou anónimo) ao do usuário, no login, com um número fixo de consultas,
+independente do número de itens.
+"""
+
+from collections import Counter
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+from apps.products.models import Product
+from . import guest
+from .models import Cart, CartItem
+from .serializers import CartLineSerializer
+
+# Número máximo de linhas por pedido
+MAX_LINES = 200
+
+# Campos do produto usados na mesclagem
+MERGE_PRODUCT_FIELDS = ["in_stock", "stock_quantity", "price"]
+
+
+def add_items(cart_code, lines):
+    """
+    Soma as linhas {product_id, quantity} ao carrinho `cart_code` (criado se
+    não existir; anónimo no store, se configurado, ver guest.py). Linhas
+    repetidas para o mesmo produto são somadas.
+
+    Returns:
+        tuple: (carrinho, erros), com os erros indexados pela posição da
+        linha no pedido; com erros o carrinho é None e nada é gravado
+    """
+    errors = []
+    quantities = Counter()
+    positions = {}
+    for index, line in enumerate(lines):
+        serializer = CartLineSerializer(data=line)
+        if serializer.is_valid():
+            product_id = serializer.validated_data["product_id"]
+            quantities[product_id] += serializer.validated_data["quantity"]
+            positions.setdefault(product_id, index)
+        else:
+            errors.append({"index": index, "errors": serializer.errors})
+    if errors:
+        return None, errors
+
+    with transaction.atomic():
+        products = {
+            product.pk: product
+            for product in Product.objects.select_for_update()
+            .filter(pk__in=quantities, in_stock=True)
+            .only("id", "price", "stock_quantity")
+            .order_by("pk")
+        }
+        store = guest.store_for(cart_code)
+        if store is None:
+            cart, _ = Cart.objects.get_or_create(cart_code=cart_code)
+            current = dict(
+                CartItem.objects.filter(cart=cart, product_id__in=products).values_list(
+                    "product_id", "quantity"
+                )
+            )
+        else:
+            entry = store.get(cart_code)
+            current = entry[0] if entry else {}
+
+        new_quantities = {}
+        for product_id, quantity in quantities.items():
+            index = positions[product_id]
+            product = products.get(product_id)
+            if product is None:
+                errors.append(
+                    {
+                        "index": index,
+                        "errors": {
+                            "product_id": ["Produto não encontrado ou fora de estoque."]
+                        },
+                    }
+                )
+                continue
+            new_quantity = current.get(product_id, 0) + quantity
+            if product.stock_quantity < new_quantity:
+                errors.append(
+                    {
+                        "index": index,
+                        "errors": {
+                            "quantity": [
+                                "Quantidade solicitada excede o estoque disponível. "
+                                f"Apenas {product.stock_quantity} disponível."
+                            ]
+                        },
+                    }
+                )
+                continue
+            new_quantities[product_id] = new_quantity
+
+        if errors:
+            transaction.set_rollback(True)
+            errors.sort(key=lambda error: error["index"])
+            return None, errors
+
+        if store is not None:
+            store.add_many(cart_code, quantities)
+            return guest.load(store, cart_code), []
+
+        CartItem.objects.bulk_create(
+            [
+                CartItem(cart=cart, product_id=product_id, quantity=quantity)
+                for product_id, quantity in new_quantities.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["cart", "product"],
+            update_fields=["quantity"],
+        )
+        # bulk_create não envia post_save: mesmo efeito de touch_cart
+        Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now())
+        Cart.change_summary(
+            cart.pk,
+            sum(quantities.values()),
+            sum(
+                (products[pk].price * n for pk, n in quantities.items()),
+                Decimal("0.00"),
+            ),
+        )
+
+    cart.refresh_from_db()
+    return cart, []
+
+
+def merge_items(user_cart, temp_cart):
+    """
+    Soma os itens de `temp_cart` aos de `user_cart`, limitando cada
+    quantidade ao estoque, e apaga o carrinho temporário. Produtos fora de
+    estoque são ignorados. Deve correr dentro de uma transação.
+    """
+    temp_items = CartItem.objects.filter(cart=temp_cart).select_related("product")
+    temp_items = temp_items.only(
+        "product_id",
+        "quantity",
+        *[f"product__{field}" for field in MERGE_PRODUCT_FIELDS],
+    )
+    _merge(user_cart, [(item.product, item.quantity) for item in temp_items])
+    temp_cart.delete()
+
+
+def merge_guest_items(user_cart, quantities):
+    """
+    Soma os itens de um carrinho anónimo ({produto: quantidade}) aos de
+    `user_cart`, como merge_items. Deve correr dentro de uma transação.
+    """
+    products = Product.objects.filter(pk__in=quantities).only(
+        "id", *MERGE_PRODUCT_FIELDS
+    )
+    _merge(user_cart, [(product, quantities[product.pk]) for product in products])
+
+
+def _merge(user_cart, lines):
+    products = {product.pk: product for product, _ in lines}
+    user_items = {
+        item.product_id: item
+        for item in CartItem.objects.select_for_update()
+        .filter(cart=user_cart, product_id__in=products)
+        .only("id", "product_id", "quantity")
+    }
+
+    to_create = []
+    to_update = []
+    added_quantity = 0
+    added_amount = Decimal("0.00")
+    for product, quantity in lines:
+        if not product.in_stock:
+            continue
+        user_item = user_items.get(product.pk)
+        current = user_item.quantity if user_item else 0
+        # Soma as quantidades, ajustando à quantidade máxima disponível
+        new_quantity = min(current + quantity, product.stock_quantity)
+        delta = new_quantity - current
+        if delta == 0:
+            continue
+        added_quantity += delta
+        added_amount += delta * product.price
+        if user_item:
+            user_item.quantity = new_quantity
+            to_update.append(user_item)
+        else:
+            to_create.append(
+                CartItem(cart=user_cart, product_id=product.pk, quantity=new_quantity)
+            )
+
+    CartItem.objects.bulk_create(to_create)
+    CartItem.objects.bulk_update(to_update, ["quantity"])
+    if to_create or to_update:
+        # bulk_create/bulk_update não enviam post_save: mesmo efeito de
+        # touch_cart
+        Cart.objects.filter(pk=user_cart.pk).update(updated_at=timezone.now())
+        Cart.change_summary(user_cart.pk, added_quantity, added_amount)
@@ -0,0 +1,109 @@
+"""
+Remoção de carrinhos anónimos abandonados.
+
+Carrinhos sem usuário que não mudam há `days` dias são apagados em lotes
+de CHUNK_SIZE, lidos por ordem de chave primária a partir do último id do
+lote anterior (keyset): ids esparsos não geram lotes vazios. Cada lote corre
+na sua própria transação curta, por isso os bloqueios em
+cart_cart/cart_cartitem duram só um lote, e uma pausa entre lotes deixa
+passar as escritas dos pedidos. Dentro da transação os carrinhos do lote
+são bloqueados (SELECT ... FOR UPDATE) com a condição repetida, e só os que
+ainda a cumprem são apagados: um carrinho alterado ou associado a um
+usuário entretanto é mantido.
+
+Corre periodicamente com o comando purge_abandoned_carts (ex.: cron diário
+fora do horário comercial). Carrinhos anónimos no Redis (ver guest.py)
+expiram sozinhos.
+"""
+
+import time
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+from .models import Cart, CartItem
+
+DEFAULT_DAYS = 30
+
+# Carrinhos por lote
+CHUNK_SIZE = 1000
+
+# Segundos de pausa entre lotes
+PAUSE = 0.1
+
+
+def abandoned_carts(days=DEFAULT_DAYS, now=None):
+    """
+    Carrinhos anónimos sem alterações há mais de `days` dias.
+    """
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    return Cart.objects.filter(user__isnull=True, updated_at__lt=cutoff)
+
+
+def purge_abandoned_carts(
+    days=DEFAULT_DAYS,
+    chunk_size=CHUNK_SIZE,
+    pause=PAUSE,
+    dry_run=False,
+    max_seconds=None,
+    progress=None,
+):
+    """
+    Apaga os carrinhos abandonados (e os seus itens) em lotes.
+
+    Args:
+        days: Dias sem alterações para um carrinho ser apagado
+        chunk_size: Carrinhos por lote (uma transação cada)
+        pause: Segundos de espera depois de cada lote com carrinhos apagados
+        dry_run: Só conta o que seria apagado
+        max_seconds: Para depois deste tempo (o resto fica para a execução
+            seguinte)
+        progress: Função chamada com o relatório acumulado após cada lote
+
+    Returns:
+        dict: {"carts", "items", "chunks", "seconds", "interrupted"}, com
+        interrupted=True se parou por max_seconds antes do fim
+    """
+    carts = abandoned_carts(days)
+    result = {"carts": 0, "items": 0, "chunks": 0, "seconds": 0.0, "interrupted": False}
+    started = time.monotonic()
+    last = 0
+    while True:
+        pks = list(
+            carts.filter(pk__gt=last)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:chunk_size]
+        )
+        if not pks:
+            break
+        last = pks[-1]
+        if dry_run:
+            carts_deleted = len(pks)
+            items_deleted = CartItem.objects.filter(cart_id__in=pks).count()
+        else:
+            with transaction.atomic():
+                # Repete a condição com os carrinhos bloqueados: os que
+                # mudaram desde a leitura dos ids ficam de fora
+                locked = list(
+                    carts.filter(pk__in=pks)
+                    .select_for_update()
+                    .values_list("pk", flat=True)
+                )
+                _, deleted = Cart.objects.filter(pk__in=locked).delete()
+            carts_deleted = deleted.get(Cart._meta.label, 0)
+            items_deleted = deleted.get(CartItem._meta.label, 0)
+        result["carts"] += carts_deleted
+        result["items"] += items_deleted
+        result["chunks"] += 1
+        result["seconds"] = time.monotonic() - started
+        if progress:
+            progress(result)
+
+        if len(pks) < chunk_size:
+            break
+        if max_seconds is not None and result["seconds"] >= max_seconds:
+            result["interrupted"] = carts.filter(pk__gt=last).exists()
+            break
+        if pause and carts_deleted and not dry_run:
+            time.sleep(pause)
+    result["seconds"] = time.monotonic() - started
+    return result
@@ -0,0 +1,251 @@
+"""
+Carrinhos anónimos fora do banco (opcional).
+
+Com GUEST_CART_BACKEND = "redis" cada carrinho anónimo é um hash do Redis
+("cart:guest:<código>", {id do produto: quantidade, "version": n}) que
+expira GUEST_CART_TTL segundos depois da última alteração; "local" guarda-os
+em memória no processo (para testes e desenvolvimento). Com "database" (o
+padrão) todos os carrinhos ficam nas tabelas Cart/CartItem.
+
+As views do carrinho mantêm a mesma API por cart_code: create_cart cria o
+carrinho no store, add_to_cart e add-batch alteram-no e get_cart/summary
+leem-no. O carrinho só é gravado no banco ao ser mesclado no do usuário
+(merge_carts) ou ao criar um pedido (create_order, ver persist()).
+Carrinhos que já existem no banco continuam a ser servidos a partir dele.
+"""
+
+import threading
+import time
+from django.conf import settings
+from django.db import transaction
+from apps.products.models import Product
+from apps.products.serializers import ProductListSerializer
+from .models import Cart, CartItem
+
+KEY_PREFIX = "cart:guest:"
+VERSION_FIELD = "version"
+
+# backend -> store
+_stores = {}
+
+
+def get_ttl():
+    return getattr(settings, "GUEST_CART_TTL", 7 * 24 * 3600)
+
+
+class LocalCartStore:
+    """
+    Carrinhos em memória, por processo.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # código -> [expira em, {produto: quantidade}, versão]
+        self.carts = {}
+
+    def _entry(self, cart_code):
+        entry = self.carts.get(cart_code)
+        if entry is not None and entry[0] <= time.monotonic():
+            del self.carts[cart_code]
+            return None
+        return entry
+
+    def create(self, cart_code):
+        with self.lock:
+            self.carts[cart_code] = [time.monotonic() + get_ttl(), {}, 0]
+
+    def exists(self, cart_code):
+        with self.lock:
+            return self._entry(cart_code) is not None
+
+    def get(self, cart_code):
+        with self.lock:
+            entry = self._entry(cart_code)
+            return None if entry is None else (dict(entry[1]), entry[2])
+
+    def add_many(self, cart_code, quantities):
+        with self.lock:
+            entry = self._entry(cart_code)
+            if entry is None:
+                entry = self.carts[cart_code] = [0, {}, 0]
+            items = entry[1]
+            result = {}
+            for product_id, quantity in quantities.items():
+                result[product_id] = items.get(product_id, 0) + quantity
+                if result[product_id] > 0:
+                    items[product_id] = result[product_id]
+                else:
+                    items.pop(product_id, None)
+            entry[0] = time.monotonic() + get_ttl()
+            entry[2] += 1
+            return result
+
+    def delete(self, cart_code):
+        with self.lock:
+            self.carts.pop(cart_code, None)
+
+    def clear(self):
+        with self.lock:
+            self.carts.clear()
+
+
+class RedisCartStore:
+    """
+    Carrinhos partilhados por todos os processos, um hash do Redis cada.
+    """
+
+    def __init__(self):
+        from django_redis import get_redis_connection
+
+        self.client = get_redis_connection("default")
+
+    def key(self, cart_code):
+        return f"{KEY_PREFIX}{cart_code}"
+
+    def create(self, cart_code):
+        pipeline = self.client.pipeline()
+        pipeline.hset(self.key(cart_code), VERSION_FIELD, 0)
+        pipeline.expire(self.key(cart_code), get_ttl())
+        pipeline.execute()
+
+    def exists(self, cart_code):
+        return bool(self.client.exists(self.key(cart_code)))
+
+    def get(self, cart_code):
+        data = self.client.hgetall(self.key(cart_code))
+        if not data:
+            return None
+        version = int(data.pop(VERSION_FIELD.encode(), 0))
+        return {int(field): int(value) for field, value in data.items()}, version
+
+    def add_many(self, cart_code, quantities):
+        key = self.key(cart_code)
+        # MULTI/EXEC: a versão e a expiração mudam junto com as quantidades
+        pipeline = self.client.pipeline()
+        for product_id, quantity in quantities.items():
+            pipeline.hincrby(key, product_id, quantity)
+        pipeline.hincrby(key, VERSION_FIELD, 1)
+        pipeline.expire(key, get_ttl())
+        result = dict(zip(quantities, pipeline.execute()))
+        removed = [product_id for product_id, n in result.items() if n <= 0]
+        if removed:
+            self.client.hdel(key, *removed)
+        return result
+
+    def delete(self, cart_code):
+        self.client.delete(self.key(cart_code))
+
+
+def get_store():
+    """
+    Store dos carrinhos anónimos, ou None se ficam no banco.
+    """
+    backend = getattr(settings, "GUEST_CART_BACKEND", "database")
+    if backend == "database":
+        return None
+    if backend not in _stores:
+        _stores[backend] = RedisCartStore() if backend == "redis" else LocalCartStore()
+    return _stores[backend]
+
+
+def store_for(cart_code):
+    """
+    Store onde está (ou vai ser criado) o carrinho `cart_code`, ou None se o
+    carrinho está no banco.
+    """
+    store = get_store()
+    if store is None:
+        return None
+    if store.exists(cart_code):
+        return store
+    if Cart.objects.filter(cart_code=cart_code).exists():
+        return None
+    return store
+
+
+class GuestCart:
+    """
+    Carrinho anónimo lido do store, com os atributos usados pelos
+    serializers do carrinho (CartSerializer e CartSummarySerializer). Os
+    itens não existem no banco e por isso não têm id.
+    """
+
+    id = None
+
+    def __init__(self, cart_code, quantities, version=0):
+        self.cart_code = cart_code
+        self.version = version
+        products = ProductListSerializer.optimize_queryset(
+            Product.objects.filter(pk__in=quantities)
+        ).in_bulk()
+        # Produtos removidos do catálogo desaparecem do carrinho
+        self.cartitems = [
+            CartItem(product=products[product_id], quantity=quantity)
+            for product_id, quantity in quantities.items()
+            if product_id in products
+        ]
+        self.item_count = sum(item.quantity for item in self.cartitems)
+        self.total = self.compute_total()
+
+    def compute_total(self):
+        return sum(item.product.price * item.quantity for item in self.cartitems)
+
+
+def load(store, cart_code):
+    """
+    Carrinho anónimo `cart_code`, ou None se não existe (ou expirou).
+    """
+    entry = store.get(cart_code)
+    if entry is None:
+        return None
+    return GuestCart(cart_code, *entry)
+
+
+def add_item(store, cart_code, product, quantity):
+    """
+    Soma `quantity` unidades do produto (já bloqueado) ao carrinho anónimo.
+
+    Returns:
+        int | None: None se a quantidade foi somada, ou o estoque disponível
+        se o total excederia o estoque (nada é somado)
+    """
+    new_quantity = store.add_many(cart_code, {product.pk: quantity})[product.pk]
+    if product.stock_quantity < new_quantity:
+        # Desfaz a soma: o incremento atómico evita perder pedidos
+        # concorrentes para o mesmo carrinho
+        store.add_many(cart_code, {product.pk: -quantity})
+        return product.stock_quantity
+    return None
+
+
+def persist(cart_code):
+    """
+    Grava o carrinho anónimo no banco (Cart/CartItem) e retira-o do store
+    depois do commit.
+
+    Returns:
+        Cart | None: Carrinho gravado, ou None se não há carrinho anónimo
+        com esse código
+    """
+    store = get_store()
+    entry = store and store.get(cart_code)
+    if entry is None:
+        return None
+    quantities = entry[0]
+    with transaction.atomic():
+        cart, _ = Cart.objects.get_or_create(cart_code=cart_code)
+        product_ids = Product.objects.filter(pk__in=quantities).values_list(
+            "pk", flat=True
+        )
+        CartItem.objects.bulk_create(
+            [
+                CartItem(cart=cart, product_id=pk, quantity=quantities[pk])
+                for pk in product_ids
+            ],
+            update_conflicts=True,
+            unique_fields=["cart", "product"],
+            update_fields=["quantity"],
+        )
+        Cart.refresh_summaries([cart.pk])
+        transaction.on_commit(lambda: store.delete(cart_code))
+    return cart
@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand
+from apps.cart import cleanup
+
+
+class Command(BaseCommand):
+    help = (
+        "Apaga os carrinhos anónimos sem alterações há N dias, em lotes por "
+        "ordem de chave primária com uma transação curta por lote."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=cleanup.DEFAULT_DAYS,
+            help=f"Dias sem alterações (padrão: {cleanup.DEFAULT_DAYS}).",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=cleanup.CHUNK_SIZE,
+            help=f"Carrinhos por lote (padrão: {cleanup.CHUNK_SIZE}).",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=cleanup.PAUSE,
+            help=f"Segundos de pausa entre lotes (padrão: {cleanup.PAUSE}).",
+        )
+        parser.add_argument(
+            "--max-seconds",
+            type=float,
+            default=None,
+            help="Para depois deste tempo; o resto fica para a execução seguinte.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Só conta os carrinhos e itens que seriam apagados.",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        progress = self.report_chunk if options["verbosity"] > 1 else None
+        result = cleanup.purge_abandoned_carts(
+            days=options["days"],
+            chunk_size=options["chunk_size"],
+            pause=options["pause"],
+            dry_run=dry_run,
+            max_seconds=options["max_seconds"],
+            progress=progress,
+        )
+
+        action = "seriam apagados" if dry_run else "apagados"
+        rate = result["carts"] / result["seconds"] if result["seconds"] else 0
+        self.stdout.write(
+            f"{result['carts']} carrinho(s) e {result['items']} item(ns) {action} "
+            f"em {result['chunks']} lote(s), {result['seconds']:.1f}s "
+            f"({rate:.0f} carrinhos/s)."
+        )
+        if result["interrupted"]:
+            self.stdout.write(
+                self.style.WARNING(
+                    "Tempo máximo atingido; os restantes ficam para a próxima execução."
+                )
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS("Limpeza concluída."))
+
+    def report_chunk(self, result):
+        self.stdout.write(
+            f"Lote {result['chunks']}: {result['carts']} carrinho(s), "
+            f"{result['items']} item(ns) até agora."
+        )
@@ -1,6 +1,15 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.conf import settings
 
+# Subtotal de um item (quantidade * preço atual do produto), calculado no banco
+SUB_TOTAL = models.ExpressionWrapper(
+    F("quantity") * F("product__price"),
+    output_field=models.DecimalField(max_digits=12, decimal_places=2),
+)
+
 
 class Cart(models.Model):
     user = models.OneToOneField(
@@ -11,12 +20,62 @@ class Cart(models.Model):
         null=True,
     )
     cart_code = models.CharField(max_length=11, unique=True)
+    # Resumo desnormalizado (soma das quantidades e total), atualizado de
+    # forma incremental pelas views do carrinho; version aumenta a cada
+    # alteração
+    item_count = models.PositiveIntegerField(default=0, editable=False)
+    total = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, editable=False
+    )
+    version = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.cart_code
 
+    def compute_total(self):
+        """
+        Total do carrinho numa única agregação SQL; 0 se o carrinho está
+        vazio, como a soma dos subtotais.
+        """
+        total = self.cartitems.aggregate(total=Sum(SUB_TOTAL))["total"]
+        return 0 if total is None else total
+
+    @classmethod
+    def change_summary(cls, cart_id, quantity, amount):
+        """
+        Soma `quantity` itens e `amount` ao resumo do carrinho (valores
+        negativos para remoções). Itens gravados sem passar pelas views não
+        entram no resumo; refresh_summaries recalcula-o a partir dos itens.
+        """
+        cls.objects.filter(pk=cart_id).update(
+            item_count=Greatest(F("item_count") + quantity, Value(0)),
+            total=Greatest(F("total") + amount, Value(Decimal("0.00"))),
+            version=F("version") + 1,
+        )
+
+    @classmethod
+    def refresh_summaries(cls, carts):
+        """
+        Recalcula o resumo a partir dos itens, num único UPDATE.
+
+        Args:
+            carts: ids ou queryset dos carrinhos a recalcular
+        """
+        items = CartItem.objects.filter(cart=OuterRef("pk")).order_by().values("cart")
+        cls.objects.filter(pk__in=carts).update(
+            item_count=Coalesce(
+                Subquery(items.annotate(count=Sum("quantity")).values("count")),
+                Value(0),
+            ),
+            total=Coalesce(
+                Subquery(items.annotate(total=Sum(SUB_TOTAL)).values("total")),
+                Value(Decimal("0.00")),
+            ),
+            version=F("version") + 1,
+        )
+
     class Meta:
         verbose_name = "Carrinho"
         verbose_name_plural = "Carrinhos"
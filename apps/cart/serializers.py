@@ -1,9 +1,10 @@
 from rest_framework import serializers
+from apps.core.serializers import QuerysetShapingMixin
 from .models import Cart, CartItem
 from apps.products.serializers import ProductListSerializer
 
 
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(QuerysetShapingMixin, serializers.ModelSerializer):
     """
     Serializer para itens do carrinho de compras.
     Inclui informações do produto e calcula o subtotal.
@@ -17,16 +18,17 @@ class CartItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = CartItem
         fields = ["id", "product", "quantity", "sub_total"]
+        field_dependencies = {"sub_total": ["quantity", "product__price"]}
 
     def get_sub_total(self, obj):
         """
-        Calcula o subtotal do item (preço * quantidade).
+        Calcula o subtotal do item (preço * quantidade). O produto vem na
+        mesma consulta dos itens (ver field_dependencies).
         """
-        total = obj.product.price * obj.quantity
-        return total
+        return obj.product.price * obj.quantity
 
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(QuerysetShapingMixin, serializers.ModelSerializer):
     """
     Serializer para o carrinho de compras.
     Inclui todos os itens e calcula o total do carrinho.
@@ -40,17 +42,23 @@ class CartSerializer(serializers.ModelSerializer):
     class Meta:
         model = Cart
         fields = ["id", "cart_code", "cartitems", "cart_total"]
+        # O total é agregado no banco, sem carregar os itens
+        field_dependencies = {"cart_total": []}
 
     def get_cart_total(self, cart):
         """
-        Calcula o total do carrinho somando os subtotais de todos os itens.
+        Calcula o total do carrinho (soma de quantidade * preço). Se os itens
+        já foram carregados (com os produtos) soma-os; senão usa uma única
+        agregação SQL.
         """
-        items = cart.cartitems.all()
-        total = sum([item.quantity * item.product.price for item in items])
-        return total
+        if "cartitems" in getattr(cart, "_prefetched_objects_cache", {}):
+            return sum(
+                item.product.price * item.quantity for item in cart.cartitems.all()
+            )
+        return cart.compute_total()
 
 
-class CartStatSerializer(serializers.ModelSerializer):
+class CartStatSerializer(QuerysetShapingMixin, serializers.ModelSerializer):
     """
     Serializer para estatísticas do carrinho.
     Inclui apenas informações básicas e a quantidade total de itens.
@@ -63,6 +71,7 @@ class CartStatSerializer(serializers.ModelSerializer):
     class Meta:
         model = Cart
         fields = ["id", "cart_code", "total_quantity"]
+        prefetch_related_fields = ["cartitems"]
 
     def get_total_quantity(self, cart):
         """
@@ -71,3 +80,24 @@ class CartStatSerializer(serializers.ModelSerializer):
         items = cart.cartitems.all()
         total = sum([item.quantity for item in items])
         return total
+
+
+class CartSummarySerializer(serializers.ModelSerializer):
+    """
+    Serializer para o resumo desnormalizado do carrinho (badge/cabeçalho).
+    """
+
+    class Meta:
+        model = Cart
+        fields = ["cart_code", "item_count", "total", "version"]
+
+
+class CartLineSerializer(serializers.Serializer):
+    """
+    Serializer de uma linha da adição em lote ao carrinho.
+    """
+
+    product_id = serializers.IntegerField(help_text="ID do produto")
+    quantity = serializers.IntegerField(
+        min_value=1, default=1, help_text="Quantidade a adicionar"
+    )
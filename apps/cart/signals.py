@@ -0,0 +1,65 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from apps.products.models import Product
+from apps.products.signals import prices_changed
+from .models import Cart, CartItem
+
+
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def touch_cart(sender, instance, **kwargs):
+    """
+    Atualiza updated_at do carrinho quando um item é criado, alterado ou
+    removido, para que os validadores do carrinho (ETag / Last-Modified)
+    reflitam a mudança.
+
+    Args:
+        sender: Modelo que enviou o sinal (CartItem)
+        instance: Item do carrinho que foi salvo ou excluído
+    """
+    # Itens apagados em cascata com o próprio carrinho (instância ou queryset)
+    origin = kwargs.get("origin")
+    if isinstance(origin, Cart) or getattr(origin, "model", None) is Cart:
+        return
+    Cart.objects.filter(pk=instance.cart_id).update(updated_at=timezone.now())
+
+
+@receiver(prices_changed)
+def refresh_cart_totals(sender, product_ids, **kwargs):
+    """
+    Recalcula o resumo dos carrinhos com produtos cujo preço mudou.
+
+    Args:
+        sender: Modelo que enviou o sinal (Product)
+        product_ids: ids dos produtos alterados
+    """
+    Cart.refresh_summaries(
+        Cart.objects.filter(cartitems__product_id__in=product_ids).values("pk")
+    )
+
+
+@receiver(pre_delete, sender=Product)
+def remember_product_carts(sender, instance, **kwargs):
+    """
+    Guarda os carrinhos com o produto antes da exclusão (os itens são
+    apagados em cascata, sem passar pelas views que atualizam o resumo).
+    """
+    instance._cart_ids = list(
+        CartItem.objects.filter(product=instance).values_list("cart_id", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Product)
+def refresh_product_carts(sender, instance, **kwargs):
+    """
+    Recalcula o resumo dos carrinhos que tinham o produto excluído (também
+    quando a exclusão vem da loja ou da categoria).
+
+    Args:
+        sender: Modelo que enviou o sinal (Product)
+        instance: Produto excluído
+    """
+    cart_ids = getattr(instance, "_cart_ids", None)
+    if cart_ids:
+        Cart.refresh_summaries(cart_ids)
@@ -1,12 +1,20 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import RefreshToken
+from . import cleanup, guest
 from .models import Cart, CartItem
 from apps.products.models import Product, Category
 from apps.accounts.models import Store
+from apps.core.testing import QueryCountMixin
 
 User = get_user_model()
 
@@ -95,6 +103,30 @@ class CartAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["cart_code"], self.cart.cart_code)
 
+    def test_empty_cart_total_is_zero(self):
+        """Testa que o total de um carrinho vazio continua a ser 0 (inteiro)"""
+        url = reverse("get_cart", kwargs={"cart_code": self.cart.cart_code})
+        for params in ({}, {"fields": "cart_total"}):
+            response = self.client.get(url, params)
+            self.assertIs(type(response.json()["cart_total"]), int)
+            self.assertEqual(response.json()["cart_total"], 0)
+
+    def test_get_cart_sparse_fields(self):
+        """Testa a obtenção do carrinho só com os campos pedidos"""
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=2)
+        url = reverse("get_cart", kwargs={"cart_code": self.cart.cart_code})
+        response = self.client.get(
+            url, {"fields": "cart_total,cartitems.quantity,cartitems.product.name"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data,
+            {
+                "cartitems": [{"product": {"name": "Test Product"}, "quantity": 2}],
+                "cart_total": Decimal("21.98"),
+            },
+        )
+
     def test_get_cart_not_found(self):
         """Testa a tentativa de obter um carrinho inexistente"""
         url = reverse("get_cart", kwargs={"cart_code": "NONEXISTENT"})
@@ -258,3 +290,598 @@ class CartAPITest(APITestCase):
         # Verifica se o carrinho temporário foi removido
         with self.assertRaises(Cart.DoesNotExist):
             Cart.objects.get(cart_code="TEMP12345678")
+
+
+class CartQueryCountTest(QueryCountMixin, APITestCase):
+    """Testes do número de queries dos endpoints de carrinho"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        self.category = Category.objects.create(name="Test Category")
+        self.cart = Cart.objects.create(cart_code="TEST12345678")
+        self.created = 0
+
+    def add_items(self, count):
+        """Acrescenta itens de produtos de lojas diferentes"""
+        for _ in range(count):
+            self.created += 1
+            seller = User.objects.create_user(
+                username=f"seller{self.created}",
+                email=f"seller{self.created}@example.com",
+                password="testpass123",
+                user_type="seller",
+            )
+            store = Store.objects.create(name=f"Store {self.created}", owner=seller)
+            product = Product.objects.create(
+                name=f"Product {self.created}",
+                price=10,
+                category=self.category,
+                store=store,
+            )
+            CartItem.objects.create(cart=self.cart, product=product, quantity=1)
+
+    def test_get_cart_constant_queries(self):
+        """Testa que obter o carrinho não faz uma query por item"""
+        url = reverse("get_cart", kwargs={"cart_code": self.cart.cart_code})
+        self.assertConstantQueries(lambda: self.client.get(url), self.add_items)
+
+
+class CartConditionalGetTest(APITestCase):
+    """Testes para o GET condicional do carrinho"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        seller = User.objects.create_user(
+            username="seller",
+            email="seller@example.com",
+            password="testpass123",
+            user_type="seller",
+        )
+        store = Store.objects.create(name="Test Store", owner=seller)
+        self.product = Product.objects.create(
+            name="Test Product", price=10, store=store, stock_quantity=10
+        )
+        self.cart = Cart.objects.create(cart_code="TEST12345678")
+        self.item = CartItem.objects.create(
+            cart=self.cart, product=self.product, quantity=1
+        )
+        self.url = reverse("get_cart", kwargs={"cart_code": self.cart.cart_code})
+
+    def test_get_cart_not_modified(self):
+        """Testa a resposta 304 quando o carrinho não mudou"""
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_item_change_updates_validators(self):
+        """Testa que alterar ou remover um item muda o ETag do carrinho"""
+        etag = self.client.get(self.url)["ETag"]
+
+        self.item.quantity = 3
+        self.item.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        etag = response["ETag"]
+        self.item.delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["cartitems"], [])
+
+
+class CartSummaryTest(APITestCase):
+    """Testes para o resumo desnormalizado do carrinho"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        seller = User.objects.create_user(
+            username="seller",
+            email="seller@example.com",
+            password="testpass123",
+            user_type="seller",
+        )
+        store = Store.objects.create(name="Test Store", owner=seller)
+        self.product = Product.objects.create(
+            name="Test Product", price=10, store=store, stock_quantity=10
+        )
+        self.cart = Cart.objects.create(cart_code="TEST12345678")
+        self.url = reverse("get_cart_summary", kwargs={"cart_code": "TEST12345678"})
+
+    def add(self, quantity):
+        """Adiciona o produto ao carrinho pela API"""
+        return self.client.post(
+            reverse("add_to_cart"),
+            {
+                "product_id": self.product.id,
+                "quantity": quantity,
+                "cart_code": self.cart.cart_code,
+            },
+            format="json",
+        )
+
+    def test_summary_follows_cart_changes(self):
+        """Testa que o resumo acompanha adições, alterações e remoções"""
+        self.add(2)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["item_count"], 2)
+        self.assertEqual(response.data["total"], "20.00")
+        version = response.data["version"]
+
+        item = CartItem.objects.get(cart=self.cart)
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+        self.client.put(
+            reverse("update_cartitem_quantity"),
+            {"item_id": item.id, "quantity": 5},
+            format="json",
+        )
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["item_count"], 5)
+        self.assertEqual(response.data["total"], "50.00")
+        self.assertGreater(response.data["version"], version)
+
+        self.client.delete(reverse("delete_cartitem", kwargs={"pk": item.id}))
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["item_count"], 0)
+        self.assertEqual(response.data["total"], "0.00")
+
+    def test_summary_single_query(self):
+        """Testa que o resumo é lido com uma única query"""
+        self.add(1)
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_summary_not_found(self):
+        """Testa o resumo de um carrinho inexistente"""
+        url = reverse("get_cart_summary", kwargs={"cart_code": "NONEXISTENT"})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_price_change_refreshes_summary(self):
+        """Testa que mudar o preço de um produto recalcula os carrinhos"""
+        self.add(3)
+        self.product.price = Decimal("12.50")
+        self.product.save()
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.item_count, 3)
+        self.assertEqual(self.cart.total, Decimal("37.50"))
+
+    def test_product_delete_refreshes_summary(self):
+        """Testa que excluir um produto recalcula o resumo dos carrinhos"""
+        other = Product.objects.create(
+            name="Other Product", price=20, store=self.product.store, stock_quantity=5
+        )
+        self.add(2)
+        self.client.post(
+            reverse("add_to_cart"),
+            {"product_id": other.id, "quantity": 1, "cart_code": self.cart.cart_code},
+            format="json",
+        )
+        self.assertEqual(self.client.get(self.url).data["total"], "40.00")
+
+        other.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["item_count"], 2)
+        self.assertEqual(response.data["total"], "20.00")
+
+    def test_cart_total_single_aggregate(self):
+        """Testa que o total do carrinho é calculado numa agregação"""
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=4)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.cart.compute_total(), Decimal("40.00"))
+
+    def test_refresh_summaries(self):
+        """Testa o recálculo dos resumos a partir dos itens"""
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=4)
+        Cart.refresh_summaries([self.cart.pk])
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.item_count, 4)
+        self.assertEqual(self.cart.total, Decimal("40.00"))
+
+
+class CartBatchAddTest(QueryCountMixin, APITestCase):
+    """Testes para a adição de vários produtos ao carrinho"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        seller = User.objects.create_user(
+            username="seller",
+            email="seller@example.com",
+            password="testpass123",
+            user_type="seller",
+        )
+        self.store = Store.objects.create(name="Test Store", owner=seller)
+        self.products = [
+            Product.objects.create(
+                name=f"Product {i}", price=10, store=self.store, stock_quantity=5
+            )
+            for i in range(3)
+        ]
+        self.cart = Cart.objects.create(cart_code="TEST12345678")
+        self.url = reverse("add_to_cart_batch")
+
+    def post(self, items):
+        """Envia as linhas para o endpoint em lote"""
+        return self.client.post(
+            self.url,
+            {"cart_code": self.cart.cart_code, "items": items},
+            format="json",
+        )
+
+    def test_add_batch(self):
+        """Testa a adição de vários produtos, somando aos itens existentes"""
+        CartItem.objects.create(cart=self.cart, product=self.products[0], quantity=1)
+        response = self.post(
+            [
+                {"product_id": self.products[0].id, "quantity": 2},
+                {"product_id": self.products[1].id, "quantity": 1},
+                {"product_id": self.products[1].id, "quantity": 2},
+                {"product_id": self.products[2].id},
+            ]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        quantities = {
+            item["product"]["id"]: item["quantity"]
+            for item in response.data["cartitems"]
+        }
+        self.assertEqual(
+            quantities,
+            {self.products[0].id: 3, self.products[1].id: 3, self.products[2].id: 1},
+        )
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.total, Decimal("60.00"))
+
+    def test_add_batch_creates_cart(self):
+        """Testa que o carrinho é criado se ainda não existir"""
+        response = self.client.post(
+            self.url,
+            {
+                "cart_code": "NEWCART1234",
+                "items": [{"product_id": self.products[0].id, "quantity": 1}],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["cart_code"], "NEWCART1234")
+
+    def test_add_batch_is_all_or_nothing(self):
+        """Testa que nenhuma linha é gravada se alguma for inválida"""
+        response = self.post(
+            [
+                {"product_id": self.products[0].id, "quantity": 2},
+                {"product_id": self.products[1].id, "quantity": 6},
+                {"product_id": 999, "quantity": 1},
+            ]
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error["index"] for error in response.data["errors"]], [1, 2])
+        self.assertFalse(CartItem.objects.filter(cart=self.cart).exists())
+
+    def test_add_batch_invalid_lines(self):
+        """Testa a validação das linhas e do pedido"""
+        response = self.post([{"product_id": self.products[0].id, "quantity": 0}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["errors"][0]["index"], 0)
+
+        response = self.post([])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_add_batch_constant_queries(self):
+        """Testa que adicionar mais linhas não aumenta o número de queries"""
+        created = []
+
+        def add_products(count):
+            for _ in range(count):
+                created.append(
+                    Product.objects.create(
+                        name=f"Extra {len(created)}",
+                        price=10,
+                        store=self.store,
+                        stock_quantity=5,
+                    )
+                )
+
+        def request():
+            # Um carrinho novo por medição, para partir sempre de vazio
+            self.cart = Cart.objects.create(cart_code=f"BATCH{len(created):06d}")
+            return self.post([{"product_id": product.id} for product in created])
+
+        add_products(1)
+        self.assertConstantQueries(request, add_products)
+
+
+class CartMergeTest(QueryCountMixin, APITestCase):
+    """Testes para a mesclagem do carrinho temporário no login"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        seller = User.objects.create_user(
+            username="seller",
+            email="seller@example.com",
+            password="testpass123",
+            user_type="seller",
+        )
+        self.store = Store.objects.create(name="Test Store", owner=seller)
+        self.user_cart = Cart.objects.create(cart_code="USER1234567", user=self.user)
+        self.created = 0
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+    def create_product(self, **kwargs):
+        """Cria um produto da loja de teste"""
+        self.created += 1
+        data = {"price": 10, "stock_quantity": 10}
+        data.update(kwargs)
+        return Product.objects.create(
+            name=f"Product {self.created}", store=self.store, **data
+        )
+
+    def merge(self, cart_code):
+        """Mescla o carrinho `cart_code` no do usuário"""
+        return self.client.post(
+            reverse("merge_carts"), {"temp_cart_code": cart_code}, format="json"
+        )
+
+    def test_merge_sums_and_clamps_to_stock(self):
+        """Testa que as quantidades são somadas e limitadas ao estoque"""
+        shared = self.create_product(stock_quantity=4)
+        new = self.create_product()
+        unavailable = self.create_product(in_stock=False)
+        CartItem.objects.create(cart=self.user_cart, product=shared, quantity=3)
+        Cart.refresh_summaries([self.user_cart.pk])
+        temp_cart = Cart.objects.create(cart_code="TEMP1234567")
+        CartItem.objects.create(cart=temp_cart, product=shared, quantity=2)
+        CartItem.objects.create(cart=temp_cart, product=new, quantity=2)
+        CartItem.objects.create(cart=temp_cart, product=unavailable, quantity=1)
+
+        response = self.merge("TEMP1234567")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        quantities = dict(
+            self.user_cart.cartitems.values_list("product_id", "quantity")
+        )
+        self.assertEqual(quantities, {shared.id: 4, new.id: 2})
+        self.user_cart.refresh_from_db()
+        self.assertEqual(self.user_cart.item_count, 6)
+        self.assertEqual(self.user_cart.total, Decimal("60.00"))
+        self.assertFalse(Cart.objects.filter(cart_code="TEMP1234567").exists())
+
+    def test_merge_own_cart(self):
+        """Testa que mesclar o carrinho do usuário com ele próprio não o apaga"""
+        CartItem.objects.create(
+            cart=self.user_cart, product=self.create_product(), quantity=1
+        )
+        response = self.merge(self.user_cart.cart_code)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["cartitems"]), 1)
+        self.assertEqual(response.data["cartitems"][0]["quantity"], 1)
+
+    def test_merge_constant_queries(self):
+        """Testa que a mesclagem não faz queries por item"""
+        products = []
+        merges = 0
+
+        def add_products(count):
+            for _ in range(count):
+                products.append(self.create_product())
+                # Metade dos produtos já está no carrinho do usuário
+                if len(products) % 2:
+                    CartItem.objects.create(
+                        cart=self.user_cart, product=products[-1], quantity=1
+                    )
+
+        def request():
+            nonlocal merges
+            merges += 1
+            temp_cart = Cart.objects.create(cart_code=f"TEMP{merges:07d}")
+            CartItem.objects.bulk_create(
+                CartItem(cart=temp_cart, product=product, quantity=1)
+                for product in products
+            )
+            return self.merge(temp_cart.cart_code)
+
+        self.assertConstantQueries(request, add_products, sizes=(2, 10))
+
+
+@override_settings(GUEST_CART_BACKEND="local")
+class GuestCartTest(APITestCase):
+    """Testes para os carrinhos anónimos fora do banco"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        guest.get_store().clear()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        seller = User.objects.create_user(
+            username="seller",
+            email="seller@example.com",
+            password="testpass123",
+            user_type="seller",
+        )
+        store = Store.objects.create(name="Test Store", owner=seller)
+        self.product = Product.objects.create(
+            name="Test Product", price=10, store=store, stock_quantity=5
+        )
+        self.cart_code = self.client.post(reverse("create_cart")).data["cart_code"]
+
+    def add(self, quantity, cart_code=None):
+        """Adiciona o produto ao carrinho pela API"""
+        return self.client.post(
+            reverse("add_to_cart"),
+            {
+                "product_id": self.product.id,
+                "quantity": quantity,
+                "cart_code": cart_code or self.cart_code,
+            },
+            format="json",
+        )
+
+    def test_guest_cart_is_not_stored_in_database(self):
+        """Testa que o carrinho anónimo é servido sem linhas no banco"""
+        response = self.add(2)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["cartitems"][0]["quantity"], 2)
+        self.assertFalse(Cart.objects.filter(cart_code=self.cart_code).exists())
+
+        url = reverse("get_cart", kwargs={"cart_code": self.cart_code})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["cart_code"], self.cart_code)
+        self.assertEqual(response.data["cart_total"], Decimal("20.00"))
+
+        url = reverse("get_cart_summary", kwargs={"cart_code": self.cart_code})
+        response = self.client.get(url)
+        self.assertEqual(response.data["item_count"], 2)
+        self.assertEqual(response.data["total"], "20.00")
+
+    def test_guest_cart_stock_check(self):
+        """Testa que o estoque é validado sem alterar o carrinho anónimo"""
+        self.add(4)
+        response = self.add(2)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(guest.get_store().get(self.cart_code)[0], {self.product.id: 4})
+
+    def test_guest_cart_batch_add(self):
+        """Testa a adição em lote a um carrinho anónimo"""
+        response = self.client.post(
+            reverse("add_to_cart_batch"),
+            {
+                "cart_code": self.cart_code,
+                "items": [{"product_id": self.product.id, "quantity": 3}],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["cartitems"][0]["quantity"], 3)
+        self.assertFalse(Cart.objects.filter(cart_code=self.cart_code).exists())
+
+    @override_settings(GUEST_CART_TTL=0)
+    def test_guest_cart_expires(self):
+        """Testa que o carrinho anónimo expira"""
+        cart_code = self.client.post(reverse("create_cart")).data["cart_code"]
+        url = reverse("get_cart", kwargs={"cart_code": cart_code})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_database_cart_is_still_used(self):
+        """Testa que carrinhos já gravados no banco continuam no banco"""
+        cart = Cart.objects.create(cart_code="TEST12345678")
+        self.add(1, cart_code=cart.cart_code)
+        self.assertEqual(cart.cartitems.get().quantity, 1)
+        self.assertFalse(guest.get_store().exists(cart.cart_code))
+
+    def test_merge_persists_guest_cart(self):
+        """Testa que mesclar grava o carrinho anónimo no do usuário"""
+        self.add(2)
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("merge_carts"),
+                {"temp_cart_code": self.cart_code},
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user_cart = Cart.objects.get(user=self.user)
+        self.assertEqual(user_cart.cartitems.get().quantity, 2)
+        self.assertEqual(user_cart.total, Decimal("20.00"))
+        self.assertFalse(guest.get_store().exists(self.cart_code))
+
+
+class PurgeAbandonedCartsTest(TestCase):
+    """Testes para a remoção dos carrinhos anónimos abandonados"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        seller = User.objects.create_user(
+            username="seller",
+            email="seller@example.com",
+            password="testpass123",
+            user_type="seller",
+        )
+        store = Store.objects.create(name="Test Store", owner=seller)
+        self.product = Product.objects.create(
+            name="Test Product", price=10, store=store, stock_quantity=5
+        )
+        old = timezone.now() - timedelta(days=40)
+        self.abandoned = []
+        for i in range(5):
+            cart = Cart.objects.create(cart_code=f"OLD{i:08d}")
+            CartItem.objects.create(cart=cart, product=self.product, quantity=1)
+            self.abandoned.append(cart.pk)
+        self.recent = Cart.objects.create(cart_code="RECENT12345")
+        self.user_cart = Cart.objects.create(cart_code="USER1234567", user=self.user)
+        # Alterações aos itens atualizam updated_at: a data antiga vem depois
+        Cart.objects.filter(pk__in=self.abandoned + [self.user_cart.pk]).update(
+            updated_at=old
+        )
+
+    def test_purge_in_chunks(self):
+        """Testa que só os carrinhos anónimos antigos são apagados, por lotes"""
+        result = cleanup.purge_abandoned_carts(chunk_size=2, pause=0)
+        self.assertEqual(result["carts"], 5)
+        self.assertEqual(result["items"], 5)
+        self.assertEqual(result["chunks"], 3)
+        self.assertFalse(Cart.objects.filter(pk__in=self.abandoned).exists())
+        self.assertEqual(
+            set(Cart.objects.values_list("pk", flat=True)),
+            {self.recent.pk, self.user_cart.pk},
+        )
+
+    def test_dry_run(self):
+        """Testa que o dry-run só conta o que seria apagado"""
+        out = StringIO()
+        call_command("purge_abandoned_carts", dry_run=True, pause=0, stdout=out)
+        self.assertIn("5 carrinho(s) e 5 item(ns) seriam apagados", out.getvalue())
+        self.assertEqual(Cart.objects.filter(pk__in=self.abandoned).count(), 5)
+
+    def test_max_seconds(self):
+        """Testa que a limpeza para ao atingir o tempo máximo"""
+        result = cleanup.purge_abandoned_carts(chunk_size=1, pause=0, max_seconds=0)
+        self.assertEqual(result["chunks"], 1)
+        self.assertTrue(result["interrupted"])
+        self.assertEqual(Cart.objects.filter(pk__in=self.abandoned).count(), 4)
+
+    def test_sparse_ids_do_not_create_empty_chunks(self):
+        """Testa que ids esparsos não geram lotes vazios nem pausas"""
+        old = timezone.now() - timedelta(days=40)
+        for pk in (100000, 500000):
+            Cart.objects.create(pk=pk, cart_code=f"SPARSE{pk}")
+        Cart.objects.filter(pk__in=[100000, 500000]).update(updated_at=old)
+        with mock.patch.object(cleanup.time, "sleep") as sleep:
+            result = cleanup.purge_abandoned_carts(chunk_size=5, pause=1)
+        self.assertEqual(result["carts"], 7)
+        self.assertEqual(result["chunks"], 2)
+        self.assertEqual(sleep.call_count, 1)
+
+    def test_chunk_rechecks_condition(self):
+        """Testa que um carrinho alterado depois da leitura dos ids não é
+        apagado"""
+        atomic = cleanup.transaction.atomic
+        changed = self.abandoned[0]
+
+        def touch_then_atomic(*args, **kwargs):
+            Cart.objects.filter(pk=changed).update(updated_at=timezone.now())
+            return atomic(*args, **kwargs)
+
+        with mock.patch.object(cleanup.transaction, "atomic", touch_then_atomic):
+            result = cleanup.purge_abandoned_carts(pause=0)
+        self.assertEqual(result["carts"], 4)
+        self.assertTrue(Cart.objects.filter(pk=changed).exists())
+
+    def test_purge_queries_per_chunk(self):
+        """Testa que os itens apagados não atualizam um a um o carrinho"""
+        with self.assertNumQueries(8):
+            # Ids do lote, savepoint, bloqueio com a condição, carrinhos,
+            # itens, DELETE dos itens e dos carrinhos, release
+            cleanup.purge_abandoned_carts(chunk_size=100, pause=0)
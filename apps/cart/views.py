@@ -1,33 +1,96 @@
 from django.db import transaction
+from django.db.models import Count, Max, Sum
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from apps.core.conditional import conditional, latest
+from apps.core.serializers import requested_fields
+from . import bulk, guest
 from .models import Cart, CartItem
 from apps.products.models import Product
-from .serializers import CartItemSerializer, CartSerializer
+from .serializers import CartItemSerializer, CartSerializer, CartSummarySerializer
 
 
+def cart_probe(request, cart_code):
+    """
+    Validadores do carrinho: data do carrinho (atualizada pelos signals dos
+    itens), datas dos produtos e das lojas, contagem e soma das quantidades.
+    """
+    row = (
+        Cart.objects.filter(cart_code=cart_code)
+        .annotate(
+            products_updated=Max("cartitems__product__updated_at"),
+            stores_updated=Max("cartitems__product__store__updated_at"),
+            line_count=Count("cartitems"),
+            quantity=Sum("cartitems__quantity"),
+        )
+        .values_list(
+            "updated_at", "products_updated", "stores_updated", "line_count", "quantity"
+        )
+        .first()
+    )
+    if row is None:
+        return None
+    return row, latest(*row[:3])
+
+
+@conditional(cart_probe)
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def get_cart(request, cart_code):
     """
     Endpoint para obter detalhes de um carrinho pelo código.
+    Suporta GET condicional (ETag / Last-Modified).
 
     Parâmetros:
     - cart_code: Código do carrinho
+    - fields, expand: campos a devolver (ex.: fields=cart_total)
 
     Retorna:
     - Detalhes do carrinho ou mensagem de erro
     """
     try:
         cart = Cart.objects.get(cart_code=cart_code)
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
     except Cart.DoesNotExist:
+        store = guest.get_store()
+        cart = store and guest.load(store, cart_code)
+        if cart is None:
+            return Response(
+                {"error": "Carrinho não encontrado."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+    serializer = CartSerializer(cart, fields=requested_fields(request))
+    return Response(serializer.data)
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def get_cart_summary(request, cart_code):
+    """
+    Endpoint para obter o resumo do carrinho (número de itens, total e
+    versão), para o badge e o cabeçalho. Lê uma única linha, sem os itens.
+
+    Parâmetros:
+    - cart_code: Código do carrinho
+
+    Retorna:
+    - Resumo do carrinho ou mensagem de erro
+    """
+    cart = (
+        Cart.objects.filter(cart_code=cart_code)
+        .only(*CartSummarySerializer.Meta.fields)
+        .first()
+    )
+    if cart is None:
+        # Carrinhos anónimos: o total é calculado com os preços atuais
+        store = guest.get_store()
+        cart = store and guest.load(store, cart_code)
+    if cart is None:
         return Response(
             {"error": "Carrinho não encontrado."}, status=status.HTTP_404_NOT_FOUND
         )
+    return Response(CartSummarySerializer(cart).data)
 
 
 @api_view(["POST"])
@@ -44,7 +107,13 @@ def create_cart(request):
     import string
 
     cart_code = "".join(random.choices(string.ascii_letters + string.digits, k=11))
-    cart = Cart.objects.create(cart_code=cart_code)
+    store = guest.get_store()
+    if store is not None:
+        # Carrinho anónimo fora do banco (ver guest.py)
+        store.create(cart_code)
+        cart = guest.GuestCart(cart_code, {})
+    else:
+        cart = Cart.objects.create(cart_code=cart_code)
     serializer = CartSerializer(cart)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -79,6 +148,19 @@ def add_to_cart(request):
                 id=product_id, in_stock=True
             )
 
+            store = guest.store_for(cart_code)
+            if store is not None:
+                available = guest.add_item(store, cart_code, product, quantity)
+                if available is not None:
+                    return Response(
+                        {
+                            "error": f"Quantidade solicitada excede o estoque disponível. "
+                            f"Apenas {available} disponível."
+                        },
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+                return Response(CartSerializer(guest.load(store, cart_code)).data)
+
             cart, created = Cart.objects.get_or_create(cart_code=cart_code)
 
             cartitem, item_created = CartItem.objects.get_or_create(
@@ -99,6 +181,7 @@ def add_to_cart(request):
 
             cartitem.quantity = new_quantity
             cartitem.save()
+            Cart.change_summary(cart.pk, quantity, product.price * quantity)
 
         # Recarregar o carrinho fora da transação
         cart.refresh_from_db()
@@ -117,6 +200,50 @@ def add_to_cart(request):
         )
 
 
+@api_view(["POST"])
+@permission_classes([AllowAny])
+def add_to_cart_batch(request):
+    """
+    Endpoint para adicionar vários produtos ao carrinho de uma vez.
+    Todos os produtos são bloqueados numa única consulta, ordenada por id;
+    se alguma linha for inválida nada é adicionado.
+
+    Parâmetros:
+    - cart_code: Código do carrinho
+    - items: lista de linhas {product_id, quantity} (até MAX_LINES)
+
+    Retorna:
+    - Carrinho atualizado ou relatório de erros por linha
+    """
+    cart_code = request.data.get("cart_code")
+    lines = request.data.get("items")
+
+    if not cart_code:
+        return Response(
+            {"error": "Código do carrinho é obrigatório."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if not isinstance(lines, list) or not lines:
+        return Response(
+            {"error": "Envie uma lista de itens a adicionar."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if len(lines) > bulk.MAX_LINES:
+        return Response(
+            {"error": f"Máximo de {bulk.MAX_LINES} itens por pedido."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    cart, errors = bulk.add_items(cart_code, lines)
+    if errors:
+        return Response(
+            {"error": "Nenhum item foi adicionado.", "errors": errors},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    serializer = CartSerializer(cart)
+    return Response(serializer.data)
+
+
 @api_view(["PUT"])
 @permission_classes([IsAuthenticated])
 def update_cartitem_quantity(request):
@@ -134,20 +261,27 @@ def update_cartitem_quantity(request):
     quantity = request.data.get("quantity")
 
     try:
-        cartitem = CartItem.objects.get(id=cartitem_id)
-        product = cartitem.product
-
-        # Verificar se a nova quantidade excede o estoque
-        if product.stock_quantity < quantity:
-            return Response(
-                {
-                    "error": f"Quantidade solicitada excede o estoque disponível. Apenas {product.stock_quantity} disponível."
-                },
-                status=status.HTTP_400_BAD_REQUEST,
+        with transaction.atomic():
+            cartitem = (
+                CartItem.objects.select_for_update()
+                .select_related("product")
+                .get(id=cartitem_id)
             )
+            product = cartitem.product
 
-        cartitem.quantity = quantity
-        cartitem.save()
+            # Verificar se a nova quantidade excede o estoque
+            if product.stock_quantity < quantity:
+                return Response(
+                    {
+                        "error": f"Quantidade solicitada excede o estoque disponível. Apenas {product.stock_quantity} disponível."
+                    },
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            delta = quantity - cartitem.quantity
+            cartitem.quantity = quantity
+            cartitem.save()
+            Cart.change_summary(cartitem.cart_id, delta, product.price * delta)
 
         serializer = CartItemSerializer(cartitem)
         return Response(
@@ -176,8 +310,18 @@ def delete_cartitem(request, pk):
     - Mensagem de sucesso ou erro
     """
     try:
-        cartitem = CartItem.objects.get(id=pk)
-        cartitem.delete()
+        with transaction.atomic():
+            cartitem = (
+                CartItem.objects.select_for_update()
+                .select_related("product")
+                .get(id=pk)
+            )
+            cartitem.delete()
+            Cart.change_summary(
+                cartitem.cart_id,
+                -cartitem.quantity,
+                -cartitem.product.price * cartitem.quantity,
+            )
         return Response(
             "Item do carrinho deletado com sucesso.", status=status.HTTP_204_NO_CONTENT
         )
@@ -215,10 +359,11 @@ def create_user_cart(request):
 def get_user_cart(request):
     """
     Endpoint para obter o carrinho do usuário autenticado.
+    Aceita fields/expand para escolher os campos devolvidos.
     """
     try:
         cart = request.user.cart
-        serializer = CartSerializer(cart)
+        serializer = CartSerializer(cart, fields=requested_fields(request))
         return Response(serializer.data)
     except Cart.DoesNotExist:
         return Response(
@@ -231,7 +376,8 @@ def get_user_cart(request):
 def merge_carts(request):
     """
     Endpoint para mesclar o carrinho temporário com o carrinho do usuário.
-    SOMA as quantidades de itens duplicados.
+    SOMA as quantidades de itens duplicados, com um número fixo de queries
+    (ver bulk.merge_items).
     """
     try:
         with transaction.atomic():
@@ -246,39 +392,18 @@ def merge_carts(request):
                 user_cart.save()
 
             temp_cart_code = request.data.get("temp_cart_code")
-            if temp_cart_code:
+            store = guest.get_store()
+            entry = temp_cart_code and store and store.get(temp_cart_code)
+            if entry:
+                # Carrinho anónimo: gravado diretamente no do usuário
+                bulk.merge_guest_items(user_cart, entry[0])
+                transaction.on_commit(lambda: store.delete(temp_cart_code))
+            elif temp_cart_code:
                 try:
                     temp_cart = Cart.objects.get(cart_code=temp_cart_code)
-
-                    for item in temp_cart.cartitems.all():
-                        # Verificar se produto está disponível
-                        if not item.product.in_stock:
-                            continue
-
-                        # Buscar ou criar item no carrinho do usuário
-                        user_item, item_created = CartItem.objects.get_or_create(
-                            cart=user_cart,
-                            product=item.product,
-                            defaults={"quantity": 0},
-                        )
-
-                        # SOMAR quantidades
-                        new_quantity = user_item.quantity + item.quantity
-
-                        # Verificar estoque
-                        if item.product.stock_quantity < new_quantity:
-                            # Ajustar para quantidade máxima disponível
-                            new_quantity = item.product.stock_quantity
-
-                        if new_quantity > 0:  # Só adiciona se houver estoque
-                            user_item.quantity = new_quantity
-                            user_item.save()
-
-                        user_item.quantity = new_quantity
-                        user_item.save()
-
-                    # Deletar carrinho temporário
-                    temp_cart.delete()
+                    # Mesclar o carrinho com ele próprio apagá-lo-ia
+                    if temp_cart.pk != user_cart.pk:
+                        bulk.merge_items(user_cart, temp_cart)
 
                 except Cart.DoesNotExist:
                     pass
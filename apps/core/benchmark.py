@@ -0,0 +1,90 @@
+"""
+Dados e medições comuns aos comandos de benchmark (benchmark_serializers,
+benchmark_json). Os comandos criam os dados numa transação que é desfeita
+no fim.
+"""
+
+import time
+from django.contrib.auth import get_user_model
+from apps.accounts.models import Store
+from apps.cart.models import Cart, CartItem
+from apps.orders.models import Order, OrderItem
+from apps.products.models import Category, Product
+from apps.reviews.models import Review
+
+User = get_user_model()
+
+# Utilizadores que avaliam cada produto nos dados de teste
+REVIEWERS = 100
+
+
+def best_time(func, repeat):
+    """
+    Executa func() `repeat` vezes e retorna (melhor tempo, último resultado).
+    """
+    best = result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def create_data(count):
+    """
+    Cria `count` produtos, pedidos e carrinhos (com dois itens cada) e
+    avaliações.
+    """
+    users = User.objects.bulk_create(
+        User(username=f"bench{i}", email=f"bench{i}@example.com", password="!")
+        for i in range(REVIEWERS)
+    )
+    store = Store.objects.create(name="Benchmark", owner=users[0])
+    category = Category.objects.create(name="Benchmark")
+    products = Product.objects.bulk_create(
+        Product(
+            name=f"Produto {i}",
+            slug=f"benchmark-{i}",
+            search_key=f"produto {i}",
+            description="Descrição " * 20,
+            price=i % 1000 + 0.99,
+            category=category,
+            store=store,
+        )
+        for i in range(count)
+    )
+    orders = Order.objects.bulk_create(
+        Order(
+            order_number=f"BENCH-{i}",
+            user=users[i % REVIEWERS],
+            total_amount=10,
+            shipping_address="Luanda",
+        )
+        for i in range(count)
+    )
+    OrderItem.objects.bulk_create(
+        OrderItem(
+            order=order,
+            product=products[(i + offset) % count],
+            quantity=offset + 1,
+            price=5,
+        )
+        for i, order in enumerate(orders)
+        for offset in range(2)
+    )
+    carts = Cart.objects.bulk_create(Cart(cart_code=f"B{i:010d}") for i in range(count))
+    CartItem.objects.bulk_create(
+        CartItem(cart=cart, product=products[(i + offset) % count], quantity=offset + 1)
+        for i, cart in enumerate(carts)
+        for offset in range(2)
+    )
+    Review.objects.bulk_create(
+        Review(
+            product=products[i // REVIEWERS],
+            user=users[i % REVIEWERS],
+            rating=i % 5 + 1,
+            comment="Comentário",
+        )
+        for i in range(count)
+    )
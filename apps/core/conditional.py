@@ -0,0 +1,54 @@
+"""
+GET condicional (ETag / Last-Modified) para as views da API.
+
+Cada view declara uma consulta barata (probe) que resume o estado do recurso
+(datas de alteração, contagens). Quando o cliente envia If-None-Match ou
+If-Modified-Since e nada mudou, a resposta 304 é devolvida sem executar a
+view nem serializar o conteúdo.
+"""
+
+import hashlib
+from django.views.decorators.http import condition
+
+
+def conditional(probe):
+    """
+    Decorator de GET condicional, aplicado por cima de @api_view.
+
+    Args:
+        probe: função probe(request, *args, **kwargs) que retorna None quando
+            o recurso não existe (a view trata o 404) ou uma tupla
+            (partes, last_modified):
+            - partes: valores que mudam sempre que a representação muda;
+              o ETag é um hash deles
+            - last_modified: datetime da última alteração, ou None para não
+              emitir Last-Modified
+    """
+
+    def validators(request, *args, **kwargs):
+        # etag_func e last_modified_func partilham uma única consulta
+        if not hasattr(request, "_conditional_validators"):
+            result = probe(request, *args, **kwargs)
+            if result is not None:
+                parts, last_modified = result
+                digest = hashlib.md5(repr(parts).encode()).hexdigest()
+                result = (f'W/"{digest}"', last_modified)
+            request._conditional_validators = result
+        return request._conditional_validators
+
+    def etag_func(request, *args, **kwargs):
+        result = validators(request, *args, **kwargs)
+        return result and result[0]
+
+    def last_modified_func(request, *args, **kwargs):
+        result = validators(request, *args, **kwargs)
+        return result and result[1]
+
+    return condition(etag_func=etag_func, last_modified_func=last_modified_func)
+
+
+def latest(*values):
+    """
+    Retorna a data mais recente entre os valores, ignorando os nulos.
+    """
+    return max((value for value in values if value is not None), default=None)
@@ -0,0 +1,269 @@
+"""
+Serialização rápida (fast path) a partir de linhas de values().
+
+Um ModelSerializer chama, para cada objeto, get_attribute e
+to_representation de cada campo. Para listas grandes isso domina o tempo
+de CPU. Aqui o serializer é compilado uma única vez numa projeção: a lista
+de colunas a pedir a values() e, por campo, uma função que converte o valor
+da coluna exatamente como o campo do serializer o faria. As respostas são
+construídas diretamente a partir das linhas, sem instanciar modelos.
+
+Suporta campos de modelo (incluindo fontes com pontos, "product.name"),
+get_<campo>_display, serializers aninhados por FK e listas aninhadas por FK
+reversa (uma consulta extra por lista). Um SerializerMethodField só é
+suportado quando o serializer define get_<campo>_from_row(row) e declara as
+colunas usadas em Meta.field_dependencies. Serializers com outros campos
+não têm projeção e usam o caminho normal.
+
+Ativado com FAST_SERIALIZATION = True nas settings.
+"""
+
+import re
+from functools import lru_cache
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.utils.encoding import force_str
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+from .serializers import freeze_selection, thaw_selection
+
+DISPLAY_RE = re.compile(r"get_(\w+)_display")
+
+
+class Unsupported(Exception):
+    """
+    O serializer tem campos que a projeção não sabe reproduzir.
+    """
+
+
+def enabled():
+    """
+    Indica se as views devem usar o fast path.
+    """
+    return getattr(settings, "FAST_SERIALIZATION", False)
+
+
+def _model_field(model, path):
+    """
+    Segue o caminho ("product__store__name") e retorna o campo final.
+    """
+    *relations, name = path.split("__")
+    try:
+        for relation in relations:
+            field = model._meta.get_field(relation)
+            if not field.many_to_one and not field.one_to_one:
+                raise Unsupported(path)
+            model = field.related_model
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        raise Unsupported(path)
+
+
+def _converter(field, model_field):
+    """
+    Função que converte o valor da coluna como field.to_representation
+    converteria o atributo do objeto.
+    """
+    if isinstance(field, serializers.FileField):
+        storage = model_field.storage
+        return lambda name: storage.url(name) if name else None
+    if isinstance(field, (serializers.ChoiceField, serializers.DecimalField)):
+        return field.to_representation
+    if isinstance(field, serializers.DateTimeField):
+        return field.to_representation
+    if isinstance(field, serializers.CharField):
+        return str
+    if isinstance(field, serializers.BooleanField):
+        return bool
+    if isinstance(field, serializers.IntegerField):
+        return int
+    if isinstance(field, serializers.FloatField):
+        return float
+    return field.to_representation
+
+
+def _value_getter(key, convert):
+    def get(row, children):
+        value = row[key]
+        return None if value is None else convert(value)
+
+    return get
+
+
+def _display_getter(key, choices):
+    def get(row, children):
+        value = row[key]
+        return None if value is None else force_str(choices.get(value, value))
+
+    return get
+
+
+def _method_getter(method):
+    def get(row, children):
+        return method(row)
+
+    return get
+
+
+def _nested_getter(key, projection):
+    def get(row, children):
+        if row[key] is None:
+            return None
+        return projection.render_row(row, children)
+
+    return get
+
+
+def _many_getter(name, pk):
+    def get(row, children):
+        return children[name].get(row[pk], [])
+
+    return get
+
+
+class Projection:
+    """
+    Serializer compilado: colunas de values() e funções de conversão.
+
+    Uso:
+        projection = get_projection(ProductListSerializer)
+        data = projection.render(projection.values(queryset))
+    """
+
+    def __init__(self, serializer, model, prefix=""):
+        self.model = model
+        self.prefix = prefix
+        self.pk = f"{prefix}{model._meta.pk.attname}"
+        self.paths = [self.pk]
+        self.getters = []
+        # Listas aninhadas: (nome, FK do filho para o pai, projeção do filho)
+        self.children = []
+        for name, field in serializer.fields.items():
+            self.getters.append((name, self.compile_field(serializer, name, field)))
+        self.paths = list(dict.fromkeys(self.paths))
+
+    def compile_field(self, serializer, name, field):
+        prefix = self.prefix
+        if isinstance(field, serializers.SerializerMethodField):
+            method = getattr(serializer, f"get_{name}_from_row", None)
+            dependencies = getattr(serializer.Meta, "field_dependencies", {})
+            if method is None or name not in dependencies or prefix:
+                raise Unsupported(name)
+            self.paths.extend(dependencies[name])
+            return _method_getter(method)
+
+        if field.source == "*":
+            raise Unsupported(name)
+        path = field.source.replace(".", "__")
+
+        if isinstance(field, serializers.ListSerializer):
+            relation = _model_field(self.model, path)
+            if not relation.one_to_many or prefix:
+                raise Unsupported(name)
+            child = Projection(field.child, relation.related_model)
+            back_reference = relation.field.attname
+            child.paths.append(back_reference)
+            self.children.append((name, back_reference, child))
+            return _many_getter(name, self.pk)
+
+        key = f"{prefix}{path}"
+        if isinstance(field, serializers.ModelSerializer):
+            relation = _model_field(self.model, path)
+            if not relation.many_to_one and not relation.one_to_one:
+                raise Unsupported(name)
+            child = Projection(field, relation.related_model, f"{key}__")
+            if child.children:
+                raise Unsupported(name)
+            self.paths.append(key)
+            self.paths.extend(child.paths)
+            return _nested_getter(key, child)
+
+        display = DISPLAY_RE.fullmatch(path)
+        if display:
+            model_field = _model_field(self.model, display.group(1))
+            if not model_field.choices:
+                raise Unsupported(name)
+            key = f"{prefix}{display.group(1)}"
+            self.paths.append(key)
+            return _display_getter(key, dict(model_field.flatchoices))
+
+        model_field = _model_field(self.model, path)
+        if model_field.is_relation:
+            if (
+                not isinstance(field, PrimaryKeyRelatedField)
+                or model_field.many_to_many
+            ):
+                raise Unsupported(name)
+            self.paths.append(key)
+            return _value_getter(key, lambda pk: pk)
+        if not model_field.concrete:
+            raise Unsupported(name)
+        self.paths.append(key)
+        return _value_getter(key, _converter(field, model_field))
+
+    def values(self, queryset):
+        """
+        Queryset de values() com as colunas da projeção.
+        """
+        return queryset.values(*self.paths)
+
+    def fetch_children(self, rows):
+        """
+        Carrega as listas aninhadas de todas as linhas (uma consulta por
+        lista) e retorna {nome: {id do pai: [itens]}}.
+        """
+        children = {}
+        ids = [row[self.pk] for row in rows]
+        for name, back_reference, child in self.children:
+            grouped = {}
+            if ids:
+                queryset = child.model._default_manager.filter(
+                    **{f"{back_reference}__in": ids}
+                )
+                if not queryset.ordered:
+                    queryset = queryset.order_by("pk")
+                child_rows = list(child.values(queryset))
+                for row, item in zip(child_rows, child.render(child_rows)):
+                    grouped.setdefault(row[back_reference], []).append(item)
+            children[name] = grouped
+        return children
+
+    def render_row(self, row, children):
+        return {name: get(row, children) for name, get in self.getters}
+
+    def render(self, rows):
+        """
+        Converte as linhas de values() na representação do serializer.
+        """
+        rows = list(rows)
+        children = self.fetch_children(rows)
+        render_row = self.render_row
+        return [render_row(row, children) for row in rows]
+
+
+@lru_cache(maxsize=256)
+def _projection(serializer_class, frozen):
+    serializer = serializer_class(fields=thaw_selection(frozen))
+    try:
+        return Projection(serializer, serializer_class.Meta.model)
+    except Unsupported:
+        return None
+
+
+def get_projection(serializer_class, fields=None):
+    """
+    Retorna a projeção compilada do serializer (com a seleção de campos
+    indicada, ver parse_fieldsets), ou None se não for suportada.
+    """
+    return _projection(serializer_class, freeze_selection(fields))
+
+
+def serialize(serializer_class, queryset, fields=None):
+    """
+    Serializa o queryset pelo fast path, quando ativo e suportado, ou pelo
+    serializer.
+    """
+    projection = get_projection(serializer_class, fields) if enabled() else None
+    if projection is None:
+        return serializer_class(queryset, many=True, fields=fields).data
+    return projection.render(projection.values(queryset))
@@ -0,0 +1,290 @@
+"""
+Variantes de imagens (miniatura e tamanho médio, em WebP e JPEG/PNG).
+
+Depois de um upload, as variantes são geradas fora do pedido: o post_save
+agenda a geração para depois do commit e ela corre num pool de threads
+(IMAGE_VARIANTS_ASYNC = False gera no próprio callback, útil em testes e
+scripts). O resultado fica num manifesto JSON no próprio modelo:
+
+    {
+        "source": "product_img/foto.jpg",
+        "hash": "<sha256 do original>",
+        "files": {"image/webp": {"300w": "variants/...", ...}, ...}
+    }
+
+As variantes só são refeitas quando o hash do conteúdo do original muda
+(um novo upload do mesmo ficheiro só atualiza "source"). Os serializers
+expõem o manifesto com SrcsetField, no formato de um srcset por tipo:
+{"image/webp": {"300w": url, "800w": url}, "image/jpeg": {...}}.
+
+Modelos e campos são registados com register() (ver products/signals.py).
+Quando um manifesto muda é enviado o sinal variants_generated.
+"""
+
+import hashlib
+import io
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.dispatch import Signal
+from django.utils import timezone
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+# Enviado com sender=modelo e pk quando o manifesto de um objeto muda
+variants_generated = Signal()
+
+DEFAULT_SIZES = {"thumbnail": 300, "medium": 800}
+
+WEBP = "image/webp"
+JPEG = "image/jpeg"
+PNG = "image/png"
+
+QUALITY = 80
+
+VARIANTS_DIR = "variants"
+
+# Bloco de leitura do original ao calcular o hash
+HASH_CHUNK_SIZE = 64 * 1024
+
+# modelo -> [(campo da imagem, campo do manifesto)]
+_registry = {}
+
+_executor = None
+
+
+def get_sizes():
+    return getattr(settings, "IMAGE_VARIANT_SIZES", DEFAULT_SIZES)
+
+
+def is_async():
+    return getattr(settings, "IMAGE_VARIANTS_ASYNC", True)
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "IMAGE_VARIANTS_WORKERS", 2),
+            thread_name_prefix="image-variants",
+        )
+    return _executor
+
+
+def register(model, field, manifest_field):
+    """
+    Gera variantes de `field` (ImageField) do modelo, guardando o manifesto
+    em `manifest_field` (JSONField).
+    """
+    _registry.setdefault(model, []).append((field, manifest_field))
+    post_save.connect(
+        schedule_changed,
+        sender=model,
+        dispatch_uid=f"image-variants:{model._meta.label}",
+    )
+
+
+def registered():
+    """
+    Retorna [(modelo, campo, campo do manifesto)] registados.
+    """
+    return [
+        (model, field, manifest_field)
+        for model, fields in _registry.items()
+        for field, manifest_field in fields
+    ]
+
+
+def schedule_changed(sender, instance, **kwargs):
+    """
+    Agenda a geração das imagens do objeto que mudaram desde o manifesto.
+    """
+    if kwargs.get("raw"):
+        return
+    for field, manifest_field in _registry.get(sender, []):
+        name = getattr(instance, field).name or ""
+        manifest = getattr(instance, manifest_field) or {}
+        if name != manifest.get("source", ""):
+            schedule(sender, instance.pk, field, manifest_field)
+
+
+def schedule(model, pk, field, manifest_field):
+    """
+    Gera as variantes depois do commit, em segundo plano.
+    """
+
+    def run():
+        if is_async():
+            get_executor().submit(_run_in_thread, model, pk, field, manifest_field)
+        else:
+            _generate(model, pk, field, manifest_field)
+
+    transaction.on_commit(run)
+
+
+def _generate(model, pk, field, manifest_field):
+    # Uma imagem inválida não deve afetar o pedido que fez o upload
+    try:
+        generate_variants(model, pk, field, manifest_field)
+    except Exception:
+        logger.exception("Erro ao gerar as variantes de %s %s", model.__name__, pk)
+
+
+def _run_in_thread(model, pk, field, manifest_field):
+    close_old_connections()
+    try:
+        _generate(model, pk, field, manifest_field)
+    finally:
+        close_old_connections()
+
+
+def content_hash(fieldfile):
+    """
+    sha256 do conteúdo do ficheiro, lido em blocos.
+    """
+    digest = hashlib.sha256()
+    with fieldfile.storage.open(fieldfile.name, "rb") as source:
+        for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _encode(image, content_type):
+    buffer = io.BytesIO()
+    if content_type == WEBP:
+        image.save(buffer, "WEBP", quality=QUALITY, method=4)
+    elif content_type == PNG:
+        image.save(buffer, "PNG", optimize=True)
+    else:
+        image.convert("RGB").save(buffer, "JPEG", quality=QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def render_variants(fieldfile, digest):
+    """
+    Gera e grava as variantes do ficheiro.
+
+    Returns:
+        dict: {tipo: {"<largura>w": nome no storage}}
+    """
+    storage = fieldfile.storage
+    with storage.open(fieldfile.name, "rb") as source:
+        original = Image.open(source)
+        original.load()
+    original = ImageOps.exif_transpose(original)
+    has_alpha = original.mode in ("RGBA", "LA", "PA") or (
+        original.mode == "P" and "transparency" in original.info
+    )
+    if original.mode not in ("RGB", "RGBA"):
+        original = original.convert("RGBA" if has_alpha else "RGB")
+    fallback = PNG if has_alpha else JPEG
+
+    directory = posixpath.join(VARIANTS_DIR, posixpath.dirname(fieldfile.name))
+    stem = posixpath.splitext(posixpath.basename(fieldfile.name))[0]
+    files = {WEBP: {}, fallback: {}}
+    for name, size in sorted(get_sizes().items(), key=lambda item: item[1]):
+        image = original.copy()
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        descriptor = f"{image.width}w"
+        # Originais pequenos dão a mesma largura em vários tamanhos
+        if descriptor in files[WEBP]:
+            continue
+        for content_type in (WEBP, fallback):
+            extension = "webp" if content_type == WEBP else content_type[6:]
+            path = posixpath.join(directory, f"{stem}-{digest[:12]}-{name}.{extension}")
+            # O nome inclui o hash: um ficheiro existente tem o mesmo conteúdo
+            if not storage.exists(path):
+                path = storage.save(path, ContentFile(_encode(image, content_type)))
+            files[content_type][descriptor] = path
+    return files
+
+
+def manifest_files(manifest):
+    return [
+        name
+        for variants in manifest.get("files", {}).values()
+        for name in variants.values()
+    ]
+
+
+def delete_files(storage, names):
+    for name in names:
+        try:
+            storage.delete(name)
+        except OSError:
+            logger.warning("Não foi possível apagar a variante %s", name)
+
+
+def generate_variants(model, pk, field, manifest_field):
+    """
+    Atualiza as variantes de uma imagem do objeto, refazendo-as só se o
+    conteúdo do original mudou.
+
+    Returns:
+        bool: True se o manifesto mudou
+    """
+    instance = model._default_manager.filter(pk=pk).first()
+    if instance is None:
+        return False
+    fieldfile = getattr(instance, field)
+    previous = getattr(instance, manifest_field) or {}
+
+    if not fieldfile.name:
+        manifest = {}
+    else:
+        digest = content_hash(fieldfile)
+        if digest == previous.get("hash"):
+            manifest = {**previous, "source": fieldfile.name}
+        else:
+            manifest = {
+                "source": fieldfile.name,
+                "hash": digest,
+                "files": render_variants(fieldfile, digest),
+            }
+    if manifest == previous:
+        return False
+
+    # Só grava se o original não mudou entretanto (outro upload agenda a sua
+    # própria geração)
+    if fieldfile.name:
+        same_source = Q(**{field: fieldfile.name})
+    else:
+        same_source = Q(**{field: ""}) | Q(**{f"{field}__isnull": True})
+    values = {manifest_field: manifest}
+    if any(f.name == "updated_at" for f in model._meta.concrete_fields):
+        values["updated_at"] = timezone.now()
+    if not model._default_manager.filter(same_source, pk=pk).update(**values):
+        return False
+
+    stale = set(manifest_files(previous)) - set(manifest_files(manifest))
+    delete_files(fieldfile.storage, stale)
+    variants_generated.send(sender=model, pk=pk)
+    return True
+
+
+class SrcsetField(serializers.Field):
+    """
+    Campo só de leitura com as URLs das variantes de um manifesto:
+    {"image/webp": {"300w": url, ...}, "image/jpeg": {...}}.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, manifest):
+        return {
+            content_type: {
+                descriptor: default_storage.url(name)
+                for descriptor, name in variants.items()
+            }
+            for content_type, variants in (manifest or {}).get("files", {}).items()
+        }
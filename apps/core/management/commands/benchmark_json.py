@@ -0,0 +1,80 @@
+import io
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from apps.cart.models import Cart
+from apps.cart.serializers import CartSerializer
+from apps.core import renderers
+from apps.core.benchmark import best_time, create_data
+from apps.orders.models import Order
+from apps.orders.serializers import OrderSerializer
+from apps.products.models import Product
+from apps.products.serializers import ProductListSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara o JSONRenderer/JSONParser do DRF com FastJSONRenderer/"
+        "FastJSONParser sobre a saída real dos serializers de produtos, "
+        "pedidos e carrinhos, e confirma que o resultado é idêntico."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            nargs="+",
+            default=[1000, 10000],
+            help="Números de linhas a medir (padrão: 1000 10000).",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Repetições por medição; conta a mais rápida (padrão: 5).",
+        )
+
+    def handle(self, *args, **options):
+        sizes = sorted(options["rows"])
+        if sizes[0] < 1:
+            raise CommandError("O número de linhas tem de ser positivo.")
+        if renderers.orjson is None:
+            self.stderr.write("orjson não está instalado: ambos usam o DRF.")
+
+        repeat = options["repeat"]
+        with transaction.atomic():
+            create_data(sizes[-1])
+            cases = [
+                ("produtos", ProductListSerializer, Product.objects.order_by("id")),
+                ("pedidos", OrderSerializer, Order.objects.order_by("id")),
+                ("carrinhos", CartSerializer, Cart.objects.order_by("id")),
+            ]
+            self.stdout.write(
+                f"{'listagem':<12}{'linhas':>8}{'render DRF':>14}{'orjson':>12}"
+                f"{'parse DRF':>14}{'orjson':>12}"
+            )
+            for name, serializer_class, queryset in cases:
+                for size in sizes:
+                    data = serializer_class(queryset[:size], many=True).data
+                    render, content = best_time(
+                        lambda: JSONRenderer().render(data), repeat
+                    )
+                    fast_render, fast_content = best_time(
+                        lambda: renderers.FastJSONRenderer().render(data), repeat
+                    )
+                    parse, parsed = best_time(
+                        lambda: JSONParser().parse(io.BytesIO(content)), repeat
+                    )
+                    fast_parse, fast_parsed = best_time(
+                        lambda: renderers.FastJSONParser().parse(io.BytesIO(content)),
+                        repeat,
+                    )
+                    if fast_content != content or fast_parsed != parsed:
+                        raise CommandError(f"JSON diferente em {name} ({size}).")
+                    self.stdout.write(
+                        f"{name:<12}{size:>8}{render * 1000:>12.1f}ms"
+                        f"{fast_render * 1000:>10.1f}ms{parse * 1000:>12.1f}ms"
+                        f"{fast_parse * 1000:>10.1f}ms"
+                    )
+            transaction.set_rollback(True)
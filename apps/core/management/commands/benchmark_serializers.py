@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from apps.core import fastpath
+from apps.core.benchmark import best_time, create_data
+from apps.orders.models import Order
+from apps.orders.serializers import OrderSerializer
+from apps.products.models import Product
+from apps.products.serializers import ProductListSerializer
+from apps.reviews.models import Review
+from apps.reviews.serializers import ReviewSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara o tempo de serialização (ModelSerializer vs fast path) das "
+        "listagens de produtos, pedidos e avaliações, e confirma que o JSON "
+        "produzido é idêntico. Os dados de teste são criados numa transação "
+        "desfeita no fim."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            nargs="+",
+            default=[1000, 10000],
+            help="Números de linhas a medir (padrão: 1000 10000).",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Repetições por medição; conta a mais rápida (padrão: 3).",
+        )
+
+    def handle(self, *args, **options):
+        sizes = sorted(options["rows"])
+        if sizes[0] < 1:
+            raise CommandError("O número de linhas tem de ser positivo.")
+
+        renderer = JSONRenderer()
+        with transaction.atomic():
+            create_data(sizes[-1])
+            cases = [
+                ("produtos", ProductListSerializer, Product.objects.order_by("id")),
+                ("pedidos", OrderSerializer, Order.objects.order_by("id")),
+                ("avaliações", ReviewSerializer, Review.objects.order_by("id")),
+            ]
+            self.stdout.write(
+                f"{'listagem':<12}{'linhas':>8}{'serializer':>14}"
+                f"{'fast path':>14}{'ganho':>8}"
+            )
+            for name, serializer_class, queryset in cases:
+                projection = fastpath.get_projection(serializer_class)
+                for size in sizes:
+                    rows = queryset[:size]
+                    normal, expected = best_time(
+                        lambda: renderer.render(serializer_class(rows, many=True).data),
+                        options["repeat"],
+                    )
+                    fast, actual = best_time(
+                        lambda: renderer.render(
+                            projection.render(projection.values(rows))
+                        ),
+                        options["repeat"],
+                    )
+                    if actual != expected:
+                        raise CommandError(f"JSON diferente em {name} ({size}).")
+                    self.stdout.write(
+                        f"{name:<12}{size:>8}{normal * 1000:>12.1f}ms"
+                        f"{fast * 1000:>12.1f}ms{normal / fast:>7.1f}x"
+                    )
+            transaction.set_rollback(True)
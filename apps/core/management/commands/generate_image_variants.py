@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from apps.core import images
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera as variantes das imagens de produtos, categorias e lojas. Só "
+        "as imagens cujo conteúdo mudou desde a última geração são refeitas."
+    )
+
+    def handle(self, *args, **options):
+        for model, field, manifest_field in images.registered():
+            with_image = ~Q(**{field: ""}) & Q(**{f"{field}__isnull": False})
+            pks = model._default_manager.filter(
+                with_image | ~Q(**{manifest_field: {}})
+            ).values_list("pk", flat=True)
+            updated = 0
+            for pk in list(pks):
+                try:
+                    updated += images.generate_variants(
+                        model, pk, field, manifest_field
+                    )
+                except Exception as error:
+                    self.stderr.write(f"{model.__name__} {pk}: {error}")
+            self.stdout.write(
+                f"{model._meta.verbose_name_plural}: {updated} atualizada(s)"
+            )
+        self.stdout.write(self.style.SUCCESS("Variantes das imagens atualizadas."))
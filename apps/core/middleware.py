@@ -0,0 +1,167 @@
+"""
+Compressão das respostas da API (gzip e, quando instalado, brotli).
+
+Só são comprimidas as respostas que a view marca com mark_compressible(),
+sob COMPRESSION_PATH_PREFIX e com pelo menos COMPRESSION_MIN_SIZE bytes
+(abaixo disso o ganho não compensa o custo). A marcação é explícita por
+causa do BREACH: comprimir uma resposta que reflete dados do pedido ao lado
+de um segredo (tokens JWT, dados da conta ou do carrinho) permite deduzir o
+segredo pelo tamanho. Só as respostas públicas do catálogo, iguais para
+todos os usuários e sem segredos, são marcadas.
+
+Quando a resposta vem do cache do catálogo, a view indica a chave da
+entrada. Os bytes comprimidos ficam guardados ao lado dela, em
+"<chave>:<codificação>", junto com um digest do conteúdo original: enquanto
+a resposta for a mesma, é reaproveitada a versão já comprimida em vez de a
+comprimir em cada pedido.
+"""
+
+import gzip
+import hashlib
+import re
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+ACCEPT_ENCODING_RE = re.compile(r"^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*$")
+WEAK_ETAG_RE = re.compile(r"^W/")
+
+
+def get_min_size():
+    return getattr(settings, "COMPRESSION_MIN_SIZE", 1024)
+
+
+def get_path_prefix():
+    return getattr(settings, "COMPRESSION_PATH_PREFIX", "/api/v1/")
+
+
+def available_encodings():
+    """
+    Codificações suportadas, por ordem de preferência.
+    """
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def accepted_encodings(header):
+    """
+    Retorna {codificação: q} a partir do cabeçalho Accept-Encoding.
+    """
+    accepted = {}
+    for part in (header or "").split(","):
+        match = ACCEPT_ENCODING_RE.match(part)
+        if not match:
+            continue
+        try:
+            quality = float(match.group(2) or 1)
+        except ValueError:
+            continue
+        accepted[match.group(1).lower()] = quality
+    return accepted
+
+
+def choose_encoding(header):
+    """
+    Escolhe a codificação a usar para o Accept-Encoding do cliente, ou None.
+    """
+    accepted = accepted_encodings(header)
+    best = None
+    for encoding in available_encodings():
+        quality = accepted.get(encoding, accepted.get("*", 0))
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (encoding, quality)
+    return best[0] if best else None
+
+
+def compress(content, encoding):
+    if encoding == "br":
+        return brotli.compress(content, quality=BROTLI_QUALITY)
+    # mtime=0 torna a saída determinística (igual para o mesmo conteúdo)
+    return gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def mark_compressible(response, key=None):
+    """
+    Marca a resposta como comprimível (só para respostas públicas, sem
+    segredos). Com `key`, a associa a uma entrada do cache, para que a
+    versão comprimida seja guardada ao lado dela e reaproveitada.
+    """
+    response.compressible = True
+    response.compressed_cache_key = key
+    return response
+
+
+def compressed_key(key, encoding):
+    return f"{key}:{encoding}"
+
+
+def cached_compress(key, content, encoding, timeout=None):
+    """
+    Comprime o conteúdo reaproveitando a versão guardada em `key`, se for
+    do mesmo conteúdo, ou guardando a nova.
+    """
+    digest = hashlib.md5(content).hexdigest()
+    entry = cache.get(compressed_key(key, encoding))
+    if entry is not None and entry[0] == digest:
+        return entry[1]
+    compressed = compress(content, encoding)
+    if timeout is None:
+        timeout = getattr(settings, "CATALOG_CACHE_TIMEOUT", 300)
+    cache.set(compressed_key(key, encoding), (digest, compressed), timeout)
+    return compressed
+
+
+class CompressionMiddleware:
+    """
+    Comprime com gzip ou brotli as respostas da API marcadas com
+    mark_compressible.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not request.path.startswith(get_path_prefix()):
+            return response
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        if (
+            not getattr(response, "compressible", False)
+            or response.streaming
+            or response.has_header("Content-Encoding")
+            or len(response.content) < get_min_size()
+        ):
+            return response
+        if "no-transform" in response.get("Cache-Control", ""):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = choose_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+
+        key = getattr(response, "compressed_cache_key", None)
+        if key:
+            compressed = cached_compress(key, response.content, encoding)
+        else:
+            compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response["Content-Length"] = str(len(compressed))
+        response["Content-Encoding"] = encoding
+        # O corpo mudou: um ETag forte deixa de ser válido byte a byte
+        etag = response.get("ETag")
+        if etag and not WEAK_ETAG_RE.match(etag):
+            response["ETag"] = f"W/{etag}"
+        return response
@@ -0,0 +1,97 @@
+"""
+Renderer e parser JSON baseados em orjson, quando instalado.
+
+Produzem o mesmo JSON que o JSONRenderer/JSONParser do DRF: formato
+compacto em UTF-8, \\u2028/\\u2029 escapados, chaves int/float/bool/None
+convertidas em texto e datas, Decimals (como float, tal como o encoder do
+DRF; os de DecimalField já chegam como texto, "10.00") e outros tipos
+convertidos pelo próprio encoder do DRF. Sem orjson, ou nos casos que ele
+não cobre (indentação, ensure_ascii, inteiros com mais de 64 bits), usam a
+implementação do DRF.
+
+O orjson escreve sem expoente ou noutro formato os floats que o Python
+escreve com expoente (1e16 em vez de 1e+16, 0.00001 em vez de 1e-05); se a
+saída contém um número assim (ou texto parecido), é gerada de novo pelo
+DRF. Diferenças que ficam: NaN/Infinity saem como null (o DRF recusa-os) e
+chaves datetime/UUID são aceites (o DRF recusa-as).
+
+Ativados em REST_FRAMEWORK (DEFAULT_RENDERER_CLASSES e
+DEFAULT_PARSER_CLASSES).
+"""
+
+import codecs
+import io
+import re
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_encoder = encoders.JSONEncoder()
+
+# Números que o orjson escreve com expoente ("1e16", "1e-7") ou sem ele onde o
+# Python usa expoente ("0.00001"), no início de um valor
+_EXPONENT_FLOAT = re.compile(rb"(?:^|[:,\[])-?(?:\d+\.?\d*e|0\.0000)")
+
+
+def _default(obj):
+    # Tipos que o orjson não serializa, ou serializa num formato diferente
+    # do DRF (datas), passam pelo encoder do DRF
+    return _encoder.default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer com orjson.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=_default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if _EXPONENT_FLOAT.search(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace("\u2028".encode(), b"\\u2028").replace(
+            "\u2029".encode(), b"\\u2029"
+        )
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSONParser com orjson.
+    """
+
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != "utf-8":
+            return super().parse(stream, media_type, parser_context)
+
+        raw = stream.read()
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # Repete com o parser do DRF: aceita o que o orjson recusa
+            # (inteiros grandes) e devolve a mesma mensagem de erro
+            return super().parse(io.BytesIO(raw), media_type, parser_context)
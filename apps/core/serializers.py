@@ -0,0 +1,421 @@
+from functools import lru_cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.db.models import Prefetch, QuerySet, prefetch_related_objects
+from rest_framework import serializers
+from rest_framework.relations import (
+    ManyRelatedField,
+    PrimaryKeyRelatedField,
+    RelatedField,
+)
+
+
+class QuerysetPlan:
+    """
+    Caminhos de select_related/prefetch_related/only() necessários para
+    serializar um modelo sem queries N+1.
+    """
+
+    def __init__(self, select=(), prefetch=(), only=None):
+        self.select = list(select)
+        # Lista de (caminho, spec): spec é None para um lookup simples ou
+        # (modelo, classe do serializer filho ou QuerysetPlan, FK para o pai)
+        self.prefetch = list(prefetch)
+        self.only = None if only is None else list(only)
+
+    def prefetch_lookups(self):
+        """
+        Constrói os lookups de prefetch (objetos Prefetch são recriados a cada
+        chamada, pois o Django altera-os durante o prefetch).
+        """
+        lookups = []
+        for path, spec in self.prefetch:
+            if spec is None:
+                lookups.append(path)
+            else:
+                model, child, back_reference = spec
+                if not isinstance(child, QuerysetPlan):
+                    child = build_plan(child)
+                queryset = apply_plan(
+                    model._default_manager.all(), child, back_reference
+                )
+                lookups.append(Prefetch(path, queryset=queryset))
+        return lookups
+
+
+def _relation(model, source):
+    """
+    Retorna o campo de relação `source` do modelo, ou None.
+    """
+    try:
+        field = model._meta.get_field(source)
+    except FieldDoesNotExist:
+        return None
+    return field if field.is_relation else None
+
+
+def build_plan(serializer_class):
+    """
+    Combina as declarações do Meta do serializer com as dos serializers
+    aninhados.
+
+    Declarações suportadas no Meta:
+    - select_related_fields: relações FK/OneToOne usadas pelos campos
+    - prefetch_related_fields: relações reversas ou M2M usadas pelos campos
+    - only_fields: campos a carregar (opcional; exige a lista completa)
+    """
+    cached = serializer_class.__dict__.get("_queryset_plan")
+    if cached is not None:
+        return cached
+
+    meta = getattr(serializer_class, "Meta", None)
+    model = getattr(meta, "model", None)
+    select = list(getattr(meta, "select_related_fields", []))
+    prefetch = [(path, None) for path in getattr(meta, "prefetch_related_fields", [])]
+    only = getattr(meta, "only_fields", None)
+    only = None if only is None else list(only) + select
+
+    for field in serializer_class().fields.values():
+        many = isinstance(field, serializers.ListSerializer)
+        child = field.child if many else field
+        if not isinstance(child, serializers.ModelSerializer) or field.source == "*":
+            continue
+
+        source = field.source.replace(".", "__")
+        relation = _relation(model, source)
+        if relation is None:
+            continue
+
+        child_plan = build_plan(type(child))
+        if many or relation.one_to_many or relation.many_to_many:
+            back_reference = relation.field.name if relation.one_to_many else None
+            prefetch.append((source, (child.Meta.model, type(child), back_reference)))
+            continue
+
+        select.append(source)
+        select.extend(f"{source}__{path}" for path in child_plan.select)
+        prefetch.extend(
+            (f"{source}__{path}", spec) for path, spec in child_plan.prefetch
+        )
+        if only is not None:
+            if child_plan.only is None:
+                only = None
+            else:
+                only.append(source)
+                only.extend(f"{source}__{name}" for name in child_plan.only)
+
+    plan = QuerysetPlan(select, prefetch, only)
+    serializer_class._queryset_plan = plan
+    return plan
+
+
+# Valor de uma relação expandida com todos os campos na seleção
+EXPANDED = "*"
+
+
+def parse_fieldsets(fields=None, expand=None):
+    """
+    Converte os parâmetros ?fields= e ?expand= numa seleção de campos.
+
+    - fields: nomes separados por vírgulas; subcampos de relações com ponto
+      ("id,items.quantity,items.product.name")
+    - expand: relações a incluir com todos os campos ("items.product")
+
+    Uma relação indicada em fields sem subcampos nem expand é devolvida só
+    com a chave primária, sem JOIN.
+
+    Returns:
+        dict: {campo: None | EXPANDED | seleção dos subcampos}, ou None
+        quando fields não é indicado (todos os campos)
+    """
+    if not fields:
+        return None
+
+    selection = {}
+    for path in fields.split(","):
+        parts = [part.strip() for part in path.split(".")]
+        if not all(parts):
+            continue
+        node = selection
+        for part in parts[:-1]:
+            if node.get(part) == EXPANDED:
+                break
+            if not isinstance(node.get(part), dict):
+                node[part] = {}
+            node = node[part]
+        else:
+            node.setdefault(parts[-1], None)
+
+    for path in (expand or "").split(","):
+        parts = [part.strip() for part in path.split(".")]
+        if not all(parts):
+            continue
+        node = selection
+        for part in parts[:-1]:
+            if node.get(part) is None and part in node:
+                node[part] = EXPANDED
+            if node.get(part) == EXPANDED:
+                break
+            node = node.setdefault(part, {})
+        else:
+            if not isinstance(node.get(parts[-1]), dict):
+                node[parts[-1]] = EXPANDED
+    return selection
+
+
+def requested_fields(request):
+    """
+    Seleção de campos pedida em ?fields= e ?expand= (ver parse_fieldsets).
+    """
+    return parse_fieldsets(
+        request.query_params.get("fields"), request.query_params.get("expand")
+    )
+
+
+def freeze_selection(selection):
+    """
+    Converte a seleção num valor imutável (chave de cache).
+    """
+    if not isinstance(selection, dict):
+        return selection
+    return tuple(
+        sorted((name, freeze_selection(value)) for name, value in selection.items())
+    )
+
+
+def thaw_selection(frozen):
+    """
+    Inverso de freeze_selection.
+    """
+    if not isinstance(frozen, tuple):
+        return frozen
+    return {name: thaw_selection(value) for name, value in frozen}
+
+
+def _model_field(model, name):
+    if name == "pk":
+        return model._meta.pk
+    return model._meta.get_field(name)
+
+
+def plan_from_paths(model, paths):
+    """
+    Constrói o plano que carrega exatamente os caminhos do ORM indicados
+    ("name", "store__name", "items__product__price").
+
+    Relações FK/OneToOne entram no select_related só quando algum campo do
+    modelo relacionado é usado; relações reversas e M2M tornam-se Prefetch
+    com o seu próprio only(). Um caminho "*" (ou que não corresponde a um
+    campo) carrega todas as colunas do modelo em que aparece.
+    """
+    full = False
+    groups = {}
+    for path in paths:
+        head, _, rest = path.partition("__")
+        if head == EXPANDED:
+            full = True
+            continue
+        groups.setdefault(head, [])
+        if rest:
+            groups[head].append(rest)
+
+    select, prefetch, only = [], [], []
+    for name, subpaths in groups.items():
+        try:
+            field = _model_field(model, name)
+        except FieldDoesNotExist:
+            full = True
+            continue
+        if not field.is_relation:
+            only.append(name)
+            continue
+
+        if field.many_to_many or not field.concrete:
+            back_reference = None if field.many_to_many else field.field.name
+            child = plan_from_paths(field.related_model, subpaths or ["pk"])
+            prefetch.append((name, (field.related_model, child, back_reference)))
+            continue
+
+        only.append(name)
+        if not subpaths:
+            continue
+        child = plan_from_paths(field.related_model, subpaths)
+        select.append(name)
+        select.extend(f"{name}__{path}" for path in child.select)
+        prefetch.extend((f"{name}__{path}", spec) for path, spec in child.prefetch)
+        if child.only is not None:
+            only.extend(f"{name}__{path}" for path in child.only)
+        elif child.select:
+            # Todas as colunas de um modelo que também seleciona relações não
+            # têm representação em only()
+            full = True
+
+    return QuerysetPlan(select, prefetch, None if full else only)
+
+
+def field_paths(serializer):
+    """
+    Caminhos do ORM lidos pelos campos do serializer.
+
+    Campos calculados (SerializerMethodField, propriedades) declaram os
+    caminhos de que dependem em Meta.field_dependencies; sem declaração,
+    carregam todas as colunas do modelo.
+    """
+    dependencies = getattr(serializer.Meta, "field_dependencies", {})
+    paths = []
+    for name, field in serializer.fields.items():
+        if name in dependencies:
+            paths.extend(dependencies[name])
+            continue
+        if field.source == "*":
+            paths.append(EXPANDED)
+            continue
+
+        path = field.source.replace(".", "__")
+        many = isinstance(field, (serializers.ListSerializer, ManyRelatedField))
+        if isinstance(field, serializers.ListSerializer):
+            child = field.child
+        else:
+            child = getattr(field, "child_relation", field)
+        if isinstance(child, serializers.ModelSerializer):
+            paths.extend(f"{path}__{child_path}" for child_path in field_paths(child))
+        elif isinstance(child, RelatedField) and not isinstance(
+            child, PrimaryKeyRelatedField
+        ):
+            paths.append(f"{path}__{EXPANDED}")
+        elif many:
+            paths.append(f"{path}__pk")
+        else:
+            paths.append(path)
+    return paths
+
+
+@lru_cache(maxsize=256)
+def _sparse_plan(serializer_class, frozen):
+    model = serializer_class.Meta.model
+    return plan_from_paths(
+        model, field_paths(serializer_class(fields=thaw_selection(frozen)))
+    )
+
+
+def get_plan(serializer_class, fields=None):
+    """
+    Plano de queries do serializer: o declarado (build_plan) para todos os
+    campos, ou o calculado a partir da seleção de campos.
+    """
+    if fields is None:
+        return build_plan(serializer_class)
+    return _sparse_plan(serializer_class, freeze_selection(fields))
+
+
+def apply_plan(queryset, plan, back_reference=None):
+    """
+    Aplica ao queryset os caminhos de um QuerysetPlan.
+
+    Args:
+        queryset: QuerySet ainda não avaliado
+        plan: Plano a aplicar
+        back_reference: FK para o objeto pai, quando o queryset é usado num
+            prefetch (tem de ser carregada mesmo com only())
+    """
+    if plan.select:
+        queryset = queryset.select_related(*plan.select)
+    lookups = plan.prefetch_lookups()
+    if lookups:
+        queryset = queryset.prefetch_related(*lookups)
+    if plan.only is not None:
+        only = plan.only + ([back_reference] if back_reference else [])
+        queryset = queryset.only(*only)
+    return queryset
+
+
+def shape_queryset(queryset, serializer_class, back_reference=None, fields=None):
+    """
+    Aplica ao queryset os caminhos declarados pelo serializer.
+
+    Args:
+        queryset: QuerySet ainda não avaliado
+        serializer_class: Classe do serializer que vai serializar o queryset
+        back_reference: FK para o objeto pai, quando o queryset é usado num
+            prefetch (tem de ser carregada mesmo com only())
+        fields: Seleção de campos (ver parse_fieldsets), ou None para todos
+    """
+    return apply_plan(queryset, get_plan(serializer_class, fields), back_reference)
+
+
+def prefetch_instances(instances, serializer_class, fields=None):
+    """
+    Carrega as relações declaradas em instâncias já obtidas do banco
+    (páginas e objetos únicos), com um número constante de queries.
+    """
+    plan = get_plan(serializer_class, fields)
+    lookups = sorted(plan.select, key=lambda path: path.count("__"))
+    lookups += plan.prefetch_lookups()
+    if instances and lookups:
+        prefetch_related_objects(instances, *lookups)
+
+
+class QuerysetShapingMixin:
+    """
+    Aplica automaticamente o plano de queries do serializer.
+
+    - Serializer(queryset, many=True): o queryset recebe select_related,
+      prefetch_related e only() antes de ser avaliado
+    - Serializer(lista_de_objetos, many=True) ou Serializer(objeto): as
+      relações são carregadas com prefetch_related_objects
+
+    Aceita também fields=<seleção> (ver parse_fieldsets): só os campos
+    selecionados são serializados e o plano carrega apenas as colunas e
+    relações que eles usam.
+
+    Para querysets que são paginados na view, use optimize_queryset() antes
+    de paginar.
+    """
+
+    def __init__(self, instance=None, *args, **kwargs):
+        self.selection = kwargs.pop("fields", None)
+        if isinstance(instance, models.Model):
+            prefetch_instances([instance], type(self), self.selection)
+        super().__init__(instance, *args, **kwargs)
+
+    @classmethod
+    def optimize_queryset(cls, queryset, fields=None):
+        return shape_queryset(queryset, cls, fields=fields)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        if args:
+            fields = kwargs.get("fields")
+            instances = args[0]
+            if isinstance(instances, QuerySet):
+                if instances._result_cache is None:
+                    instances = cls.optimize_queryset(instances, fields)
+                else:
+                    prefetch_instances(instances._result_cache, cls, fields)
+            elif isinstance(instances, list):
+                prefetch_instances(instances, cls, fields)
+            args = (instances, *args[1:])
+        return super().many_init(*args, **kwargs)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.selection is None:
+            return fields
+
+        selected = {}
+        for name, field in fields.items():
+            if name not in self.selection:
+                continue
+            value = self.selection[name]
+            many = isinstance(field, serializers.ListSerializer)
+            child = field.child if many else field
+            if isinstance(child, QuerysetShapingMixin) and value != EXPANDED:
+                kwargs = {"source": field.source} if field.source else {}
+                if value is None:
+                    field = PrimaryKeyRelatedField(read_only=True, many=many, **kwargs)
+                else:
+                    field = type(child)(
+                        read_only=True, many=many, fields=value, **kwargs
+                    )
+            selected[name] = field
+        return selected
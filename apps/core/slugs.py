@@ -0,0 +1,148 @@
+"""
+Alocação de slugs únicos.
+
+Em vez de testar "nome", "nome-1", "nome-2", ... com uma query cada, o maior
+sufixo numérico já usado para o prefixo é obtido numa única consulta e o
+slug seguinte é maior + 1. allocate_slugs faz o mesmo para um lote inteiro
+(importações), com uma consulta por bloco de BATCH_SIZE prefixos distintos.
+"""
+
+from functools import reduce
+from operator import or_
+from django.db import IntegrityError, transaction
+from django.db.models import Count, IntegerField, Max, Q
+from django.db.models.functions import Cast, Substr
+from django.utils.text import slugify
+
+# Espaço reservado ao sufixo ("-123456") quando o slug ocupa todo o campo
+SUFFIX_ROOM = 7
+
+# Prefixos distintos por consulta em allocate_slugs
+BATCH_SIZE = 500
+
+# Tentativas de gravação em save_with_slug antes de desistir
+SAVE_ATTEMPTS = 3
+
+
+def slug_base(model, value, field="slug"):
+    """
+    Retorna (base, stem) para o valor: `base` é o slug sem sufixo e `stem` o
+    prefixo usado com os sufixos numéricos (igual à base, exceto quando é
+    preciso cortar a base para caber o sufixo no campo).
+    """
+    max_length = model._meta.get_field(field).max_length
+    base = slugify(value)[:max_length].strip("-") or model._meta.model_name
+    stem = base[: max_length - SUFFIX_ROOM].rstrip("-") or base
+    return base, stem
+
+
+def _split_suffix(slug):
+    """
+    Divide "prefixo-123" em ("prefixo", 123); retorna (slug, None) sem sufixo.
+    """
+    stem, _, suffix = slug.rpartition("-")
+    if stem and suffix.isdigit():
+        return stem, int(suffix)
+    return slug, None
+
+
+def allocate_slug(model, value, field="slug"):
+    """
+    Retorna um slug livre para `value` numa única consulta.
+
+    Args:
+        model: Modelo com o campo de slug único
+        value: Texto de origem (normalmente o nome)
+        field: Nome do campo de slug
+    """
+    base, stem = slug_base(model, value, field)
+    suffixed = Q(**{f"{field}__regex": rf"^{stem}-[0-9]+$"})
+    result = (
+        model._default_manager.filter(
+            Q(**{field: base}) | Q(**{f"{field}__startswith": f"{stem}-"})
+        )
+        .order_by()
+        .aggregate(
+            taken=Count("pk", filter=Q(**{field: base})),
+            suffix=Max(
+                Cast(Substr(field, len(stem) + 2), IntegerField()), filter=suffixed
+            ),
+        )
+    )
+    if not result["taken"]:
+        return base
+    return f"{stem}-{(result['suffix'] or 0) + 1}"
+
+
+def allocate_slugs(model, values, field="slug"):
+    """
+    Aloca slugs únicos para um lote de valores, sem colisões entre si nem
+    com os já gravados.
+
+    Args:
+        model: Modelo com o campo de slug único
+        values: Textos de origem, pela ordem das linhas a criar
+        field: Nome do campo de slug
+
+    Returns:
+        list: Slugs na mesma ordem de `values`
+    """
+    pairs = [slug_base(model, value, field) for value in values]
+    taken = set()
+    suffixes = {}
+
+    def note(slug):
+        taken.add(slug)
+        stem, suffix = _split_suffix(slug)
+        if suffix is not None and suffix > suffixes.get(stem, 0):
+            suffixes[stem] = suffix
+
+    distinct = list(dict.fromkeys(pairs))
+    for start in range(0, len(distinct), BATCH_SIZE):
+        chunk = distinct[start : start + BATCH_SIZE]
+        query = reduce(
+            or_,
+            (Q(**{f"{field}__startswith": f"{stem}-"}) for _, stem in chunk),
+            Q(**{f"{field}__in": [base for base, _ in chunk]}),
+        )
+        existing = model._default_manager.filter(query).values_list(field, flat=True)
+        for slug in existing.iterator():
+            note(slug)
+
+    slugs = []
+    for base, stem in pairs:
+        slug = base
+        if slug in taken:
+            slug = f"{stem}-{suffixes.get(stem, 0) + 1}"
+        note(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def save_with_slug(instance, save, value, field="slug"):
+    """
+    Salva `instance`, gerando antes o slug a partir de `value` se estiver
+    vazio. Se outro processo gravar o mesmo slug entre a alocação e o
+    INSERT, a violação de unicidade é apanhada e o slug é realocado.
+
+    Args:
+        instance: Objeto a salvar
+        save: Função sem argumentos que grava o objeto (o save() original)
+        value: Texto de origem do slug
+        field: Nome do campo de slug
+    """
+    if getattr(instance, field):
+        return save()
+
+    model = type(instance)
+    for attempt in range(SAVE_ATTEMPTS):
+        slug = allocate_slug(model, value, field)
+        setattr(instance, field, slug)
+        try:
+            with transaction.atomic(using=instance._state.db):
+                return save()
+        except IntegrityError:
+            setattr(instance, field, "")
+            collided = model._default_manager.filter(**{field: slug}).exists()
+            if not collided or attempt == SAVE_ATTEMPTS - 1:
+                raise
@@ -0,0 +1,37 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryCountMixin:
+    """
+    Asserções de número de queries para TestCase/APITestCase.
+    """
+
+    def count_queries(self, func):
+        """
+        Executa `func` e retorna o número de queries feitas.
+        """
+        with CaptureQueriesContext(connection) as context:
+            func()
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, request, add_rows, sizes=(1, 5)):
+        """
+        Verifica que `request` faz o mesmo número de queries
+        independentemente da quantidade de linhas.
+
+        Args:
+            request: função que executa o pedido a medir
+            add_rows: função add_rows(n) que cria mais n linhas
+            sizes: quantidades de linhas a acrescentar entre medições
+        """
+        counts = []
+        for size in sizes:
+            add_rows(size)
+            counts.append(self.count_queries(request))
+        self.assertEqual(
+            len(set(counts)),
+            1,
+            f"Número de queries varia com o número de linhas: {counts}",
+        )
+        return counts[0]
@@ -0,0 +1,549 @@
+import datetime
+import gzip
+import io
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock, skipIf
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from apps.accounts.models import Store
+from apps.cart.models import Cart, CartItem
+from apps.cart.serializers import CartItemSerializer, CartSerializer
+from apps.orders.models import Order, OrderItem
+from apps.orders.serializers import OrderSerializer
+from apps.products.serializers import ProductListSerializer
+from apps.reviews.models import Review
+from apps.reviews.serializers import ReviewSerializer
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from PIL import Image
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from apps.products.models import Category, Product
+from . import fastpath, images, middleware, renderers, slugs
+from .renderers import FastJSONParser, FastJSONRenderer
+from .serializers import EXPANDED, build_plan, parse_fieldsets
+from .testing import QueryCountMixin
+
+User = get_user_model()
+
+
+class QuerysetPlanTest(TestCase):
+    """Testes para a composição dos planos de queries dos serializers"""
+
+    def test_nested_foreign_keys_are_selected(self):
+        """Testa que as FKs dos serializers aninhados entram no select_related"""
+        plan = build_plan(CartSerializer)
+        self.assertEqual(plan.select, [])
+        self.assertEqual([path for path, _ in plan.prefetch], ["cartitems"])
+
+        child_plan = build_plan(CartItemSerializer)
+        self.assertIn("product", child_plan.select)
+        self.assertIn("product__store", child_plan.select)
+
+    def test_plan_is_cached_per_class(self):
+        """Testa que o plano é calculado uma única vez por serializer"""
+        self.assertIs(build_plan(OrderSerializer), build_plan(OrderSerializer))
+
+
+class QuerysetShapingMixinTest(TestCase):
+    """Testes para o carregamento automático das relações"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        self.cart = Cart.objects.create(cart_code="TEST12345678")
+        category = Category.objects.create(name="Test Category")
+        for i in range(3):
+            seller = User.objects.create_user(
+                username=f"seller{i}",
+                email=f"seller{i}@example.com",
+                password="testpass123",
+                user_type="seller",
+            )
+            store = Store.objects.create(name=f"Store {i}", owner=seller)
+            product = Product.objects.create(
+                name=f"Product {i}", price=10, category=category, store=store
+            )
+            CartItem.objects.create(cart=self.cart, product=product, quantity=1)
+
+    def test_single_instance_is_prefetched(self):
+        """Testa que um objeto único é serializado com queries constantes"""
+        cart = Cart.objects.get(pk=self.cart.pk)
+        with CaptureQueriesContext(connection) as context:
+            data = CartSerializer(cart).data
+        self.assertEqual(len(data["cartitems"]), 3)
+        self.assertEqual(len(context.captured_queries), 1)
+
+    def test_queryset_is_shaped(self):
+        """Testa que um queryset é otimizado antes de ser avaliado"""
+        with CaptureQueriesContext(connection) as context:
+            data = CartSerializer(Cart.objects.all(), many=True).data
+        self.assertEqual(len(data[0]["cartitems"]), 3)
+        self.assertEqual(len(context.captured_queries), 2)
+
+
+class SlugAllocationTest(QueryCountMixin, TestCase):
+    """Testes para a alocação de slugs únicos"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        seller = User.objects.create_user(
+            username="seller",
+            email="seller@example.com",
+            password="testpass123",
+            user_type="seller",
+        )
+        self.store = Store.objects.create(name="Test Store", owner=seller)
+
+    def create(self, name):
+        """Cria um produto com o nome dado"""
+        return Product.objects.create(name=name, price=10, store=self.store)
+
+    def test_suffixes_follow_highest_existing(self):
+        """Testa que o sufixo seguinte é o maior existente + 1"""
+        self.assertEqual(self.create("Camiseta").slug, "camiseta")
+        self.assertEqual(self.create("Camiseta").slug, "camiseta-1")
+        Product.objects.filter(slug="camiseta-1").update(slug="camiseta-7")
+        self.assertEqual(self.create("Camiseta").slug, "camiseta-8")
+        self.assertEqual(self.create("Camiseta Azul").slug, "camiseta-azul")
+
+    def test_allocation_uses_one_query(self):
+        """Testa que a alocação custa uma query, com qualquer número de slugs"""
+        for _ in range(5):
+            self.create("Camiseta")
+        queries = self.count_queries(lambda: slugs.allocate_slug(Product, "Camiseta"))
+        self.assertEqual(queries, 1)
+        self.assertEqual(slugs.allocate_slug(Product, "Camiseta"), "camiseta-5")
+
+    def test_long_names_fit_the_field(self):
+        """Testa que os slugs de nomes longos cabem no campo"""
+        name = "Produto " * 20
+        first, second = self.create(name), self.create(name)
+        self.assertLessEqual(len(first.slug), 50)
+        self.assertLessEqual(len(second.slug), 50)
+        self.assertTrue(second.slug.endswith("-1"))
+
+    def test_batch_allocation(self):
+        """Testa a alocação em lote sem colisões entre si nem com o banco"""
+        self.create("Camiseta")
+        self.create("Boné")
+        with self.assertNumQueries(1):
+            allocated = slugs.allocate_slugs(
+                Product, ["Camiseta", "Camiseta", "Camiseta 1", "Calça", "Boné"]
+            )
+        self.assertEqual(
+            allocated, ["camiseta-1", "camiseta-2", "camiseta-1-1", "calca", "bone-1"]
+        )
+
+    def test_retry_on_race(self):
+        """Testa que uma colisão no INSERT realoca o slug"""
+        self.create("Camiseta")
+        # Simula outro processo que gravou "camiseta" depois da alocação
+        with mock.patch.object(
+            slugs, "allocate_slug", side_effect=["camiseta", "camiseta-1"]
+        ) as allocate:
+            product = self.create("Camiseta")
+        self.assertEqual(product.slug, "camiseta-1")
+        self.assertEqual(allocate.call_count, 2)
+
+
+class SparseFieldsetTest(TestCase):
+    """Testes para a seleção de campos (?fields= / ?expand=)"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        seller = User.objects.create_user(
+            username="seller",
+            email="seller@example.com",
+            password="testpass123",
+            user_type="seller",
+        )
+        store = Store.objects.create(name="Test Store", owner=seller)
+        self.cart = Cart.objects.create(cart_code="TEST12345678")
+        for i in range(3):
+            product = Product.objects.create(name=f"Product {i}", price=10, store=store)
+            CartItem.objects.create(cart=self.cart, product=product, quantity=2)
+
+    def test_parse(self):
+        """Testa a conversão dos parâmetros numa seleção"""
+        self.assertIsNone(parse_fieldsets("", "items"))
+        self.assertEqual(
+            parse_fieldsets("id,items.quantity", "items.product"),
+            {"id": None, "items": {"quantity": None, "product": EXPANDED}},
+        )
+        self.assertEqual(parse_fieldsets("items", "items"), {"items": EXPANDED})
+
+    def test_fields_are_trimmed(self):
+        """Testa que só os campos pedidos são serializados"""
+        fields = parse_fieldsets("id,name,price")
+        data = ProductListSerializer(Product.objects.all(), many=True, fields=fields)
+        self.assertEqual(list(data.data[0]), ["id", "name", "price"])
+
+    def test_projection_is_pushed_down(self):
+        """Testa que só as colunas usadas são lidas, sem JOINs desnecessários"""
+        fields = parse_fieldsets("id,name,price")
+        with CaptureQueriesContext(connection) as context:
+            ProductListSerializer(Product.objects.all(), many=True, fields=fields).data
+        sql = context.captured_queries[0]["sql"]
+        self.assertNotIn("JOIN", sql)
+        self.assertNotIn("description", sql)
+
+    def test_collapsed_relation_is_primary_key(self):
+        """Testa que uma relação sem subcampos é devolvida como chave primária"""
+        cart = Cart.objects.get(pk=self.cart.pk)
+        with CaptureQueriesContext(connection) as context:
+            data = CartSerializer(cart, fields=parse_fieldsets("cartitems")).data
+        self.assertEqual(
+            data["cartitems"], list(self.cart.cartitems.values_list("id", flat=True))
+        )
+        self.assertEqual(len(context.captured_queries), 1)
+
+    def test_method_field_dependencies(self):
+        """Testa que campos calculados carregam o que declaram, sem N+1"""
+        cart = Cart.objects.get(pk=self.cart.pk)
+        with CaptureQueriesContext(connection) as context:
+            data = CartSerializer(cart, fields=parse_fieldsets("cart_total")).data
+        self.assertEqual(data, {"cart_total": 60})
+        self.assertEqual(len(context.captured_queries), 1)
+
+
+class FastPathTest(QueryCountMixin, TestCase):
+    """Testes para a serialização a partir de values() (fast path)"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        seller = User.objects.create_user(
+            username="seller",
+            email="seller@example.com",
+            password="testpass123",
+            user_type="seller",
+        )
+        store = Store.objects.create(name="Test Store", owner=seller)
+        self.products = [
+            Product.objects.create(name="Camiseta", price="10.5", store=store),
+            Product.objects.create(
+                name="Boné", price=7, store=store, image="products/bone.png"
+            ),
+        ]
+        for i in range(2):
+            order = Order.objects.create(
+                user=seller, total_amount="17.50", shipping_address=f"Rua {i}"
+            )
+            for product in self.products[: i + 1]:
+                OrderItem.objects.create(
+                    order=order, product=product, quantity=i + 1, price=product.price
+                )
+        Review.objects.create(
+            product=self.products[0], user=seller, rating=4, comment="Bom"
+        )
+
+    def assertSameJSON(self, serializer_class, queryset, fields=None):
+        """Verifica que os dois caminhos produzem o mesmo JSON, byte a byte"""
+        projection = fastpath.get_projection(serializer_class, fields)
+        self.assertIsNotNone(projection)
+        expected = serializer_class(queryset, many=True, fields=fields).data
+        actual = projection.render(projection.values(queryset))
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+    def test_products(self):
+        """Testa a listagem de produtos"""
+        self.assertSameJSON(ProductListSerializer, Product.objects.order_by("id"))
+        self.assertSameJSON(
+            ProductListSerializer,
+            Product.objects.order_by("id"),
+            parse_fieldsets("id,price,image"),
+        )
+
+    def test_orders_with_nested_items(self):
+        """Testa pedidos com itens e produtos aninhados, em queries constantes"""
+        orders = Order.objects.order_by("-created_at")
+        self.assertSameJSON(OrderSerializer, orders)
+        projection = fastpath.get_projection(OrderSerializer)
+        queries = self.count_queries(
+            lambda: projection.render(projection.values(orders))
+        )
+        self.assertEqual(queries, 2)
+
+    def test_reviews_with_method_field(self):
+        """Testa avaliações (campo calculado e get_rating_display)"""
+        self.assertSameJSON(ReviewSerializer, Review.objects.all())
+
+    def test_unsupported_serializer_falls_back(self):
+        """Testa que serializers sem projeção usam o caminho normal"""
+        self.assertIsNone(fastpath.get_projection(CartSerializer))
+        with override_settings(FAST_SERIALIZATION=True):
+            data = fastpath.serialize(CartSerializer, Cart.objects.all())
+        self.assertEqual(data, [])
+
+
+class FastJSONTest(TestCase):
+    """Testes para o renderer e o parser JSON com orjson"""
+
+    data = {
+        "price": "10.00",
+        "cart_total": Decimal("21.98"),
+        "created_at": timezone.make_aware(datetime.datetime(2024, 1, 2, 3, 4, 5, 6)),
+        "day": datetime.date(2024, 1, 2),
+        "name": "Camiseta \u2028 Ação",
+        "label": gettext_lazy("Pendente"),
+        "items": [{"id": 1, "quantity": 2, "big": 2**70}],
+        "empty": None,
+    }
+
+    def test_same_output_as_drf(self):
+        """Testa que a saída é idêntica à do JSONRenderer do DRF"""
+        self.assertEqual(
+            FastJSONRenderer().render(self.data), JSONRenderer().render(self.data)
+        )
+        self.assertEqual(
+            FastJSONRenderer().render({1: "a"}), JSONRenderer().render({1: "a"})
+        )
+
+    def test_edge_cases_same_output_as_drf(self):
+        """Testa floats, Decimals, datas e chaves não textuais"""
+        values = [
+            1e16,
+            1e15,
+            -1.5e-05,
+            0.0001,
+            0.1 + 0.2,
+            123456.789,
+            5e-324,
+            Decimal("1E+16"),
+            Decimal("0.00001"),
+            Decimal("21.98"),
+            timezone.make_aware(datetime.datetime(2024, 1, 2, 3, 4, 5)),
+            datetime.date(2024, 1, 2),
+            datetime.time(3, 4, 5, 6),
+            {1: "a", -2: "b", 2.5: "c", 1e16: "d", False: "e", None: "f"},
+        ]
+        for value in values:
+            data = {"value": value, "values": [value], "text": "2e5 e 0.00001"}
+            with self.subTest(value=value):
+                self.assertEqual(
+                    FastJSONRenderer().render(data), JSONRenderer().render(data)
+                )
+
+    @skipIf(renderers.orjson is None, "orjson não está instalado")
+    def test_orjson_renders_common_data(self):
+        """Testa que dados sem casos especiais não passam pelo DRF"""
+        data = {**self.data, "items": [{"id": 1, "quantity": 2}], 7: "chave"}
+        expected = JSONRenderer().render(data)
+        with mock.patch.object(JSONRenderer, "render") as drf_render:
+            self.assertEqual(FastJSONRenderer().render(data), expected)
+        drf_render.assert_not_called()
+
+    def test_indent_uses_drf(self):
+        """Testa a indentação pedida no media type"""
+        media_type = "application/json; indent=2"
+        self.assertEqual(
+            FastJSONRenderer().render(self.data, media_type),
+            JSONRenderer().render(self.data, media_type),
+        )
+
+    def test_parse(self):
+        """Testa que o parser devolve os mesmos dados e erros do DRF"""
+        content = JSONRenderer().render(self.data)
+        self.assertEqual(
+            FastJSONParser().parse(io.BytesIO(content)),
+            JSONParser().parse(io.BytesIO(content)),
+        )
+        with self.assertRaisesMessage(ParseError, "JSON parse error"):
+            FastJSONParser().parse(io.BytesIO(b'{"a": NaN}'))
+
+
+@override_settings(COMPRESSION_MIN_SIZE=200)
+class CompressionTest(TestCase):
+    """Testes para a compressão das respostas da API"""
+
+    url = "/api/v1/products/categories/"
+
+    def setUp(self):
+        cache.clear()
+        for index in range(10):
+            Category.objects.create(name=f"Categoria {index}")
+
+    def test_choose_encoding(self):
+        """Testa a negociação pelo Accept-Encoding"""
+        with mock.patch.object(middleware, "brotli", None):
+            self.assertEqual(middleware.choose_encoding("gzip, deflate, br"), "gzip")
+            self.assertEqual(middleware.choose_encoding("*"), "gzip")
+            self.assertIsNone(middleware.choose_encoding("gzip;q=0, deflate"))
+            self.assertIsNone(middleware.choose_encoding(""))
+        with mock.patch.object(middleware, "brotli", mock.Mock()):
+            self.assertEqual(middleware.choose_encoding("gzip, br"), "br")
+            self.assertEqual(middleware.choose_encoding("gzip, br;q=0.5"), "gzip")
+
+    def test_gzip_response(self):
+        """Testa que a resposta comprimida descomprime no mesmo conteúdo"""
+        plain = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertNotIn("Content-Encoding", plain)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_unmarked_response_is_not_compressed(self):
+        """Testa que respostas não marcadas (tokens, conta, carrinho) não são
+        comprimidas"""
+        User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        response = self.client.post(
+            reverse("token_obtain_pair"),
+            {"username": "testuser", "password": "testpass123"},
+            content_type="application/json",
+            HTTP_ACCEPT_ENCODING="gzip",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(len(response.content), 200)
+        self.assertNotIn("Content-Encoding", response)
+
+        cart = Cart.objects.create(cart_code="TEST12345678")
+        product = Product.objects.create(
+            name="Produto",
+            price=10,
+            store=Store.objects.create(
+                name="Test Store",
+                owner=User.objects.create_user(
+                    username="seller", email="s@example.com", password="x"
+                ),
+            ),
+        )
+        CartItem.objects.create(cart=cart, product=product, quantity=1)
+        response = self.client.get(
+            reverse("get_cart", kwargs={"cart_code": cart.cart_code}),
+            HTTP_ACCEPT_ENCODING="gzip",
+        )
+        self.assertGreater(len(response.content), 200)
+        self.assertNotIn("Content-Encoding", response)
+
+    def test_small_response_is_not_compressed(self):
+        """Testa o tamanho mínimo para comprimir"""
+        with self.settings(COMPRESSION_MIN_SIZE=100000):
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertNotIn("Content-Encoding", response)
+
+    def test_cached_response_reuses_compressed_bytes(self):
+        """Testa que respostas do cache do catálogo não são recomprimidas"""
+        with mock.patch.object(
+            middleware, "compress", wraps=middleware.compress
+        ) as compress:
+            first = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+            second = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+            self.assertEqual(compress.call_count, 1)
+            self.assertEqual(second.content, first.content)
+
+            # Uma categoria nova muda a resposta e a versão comprimida
+            Category.objects.create(name="Categoria nova")
+            third = self.client.get(self.url, HTTP_ACCEPT_ENCODING="gzip")
+            self.assertEqual(compress.call_count, 2)
+        self.assertIn(b"Categoria nova", gzip.decompress(third.content))
+
+
+class ImageVariantTest(TestCase):
+    """Testes para a geração das variantes das imagens"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings = self.settings(MEDIA_ROOT=media_root, IMAGE_VARIANTS_ASYNC=False)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        seller = User.objects.create_user(
+            username="seller",
+            email="seller@example.com",
+            password="testpass123",
+            user_type="seller",
+        )
+        self.store = Store.objects.create(name="Test Store", owner=seller)
+
+    def upload(self, name, color, mode="RGB", size=(1200, 900)):
+        buffer = io.BytesIO()
+        Image.new(mode, size, color).save(buffer, "PNG")
+        return SimpleUploadedFile(name, buffer.getvalue(), "image/png")
+
+    def create_product(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(
+                name="Camiseta", price=10, store=self.store, image=image
+            )
+
+    def test_variants_generated_after_upload(self):
+        """Testa as variantes geradas após o commit e o srcset do serializer"""
+        product = self.create_product(self.upload("foto.png", "red"))
+        product.refresh_from_db()
+
+        manifest = product.image_variants
+        self.assertEqual(manifest["source"], product.image.name)
+        self.assertEqual(set(manifest["files"]), {images.WEBP, images.JPEG})
+        self.assertEqual(set(manifest["files"][images.WEBP]), {"300w", "800w"})
+        for name in images.manifest_files(manifest):
+            self.assertTrue(default_storage.exists(name))
+        with default_storage.open(manifest["files"][images.JPEG]["300w"]) as file:
+            self.assertEqual(Image.open(file).size, (300, 225))
+
+        srcset = ProductListSerializer(product).data["image_srcset"]
+        self.assertTrue(srcset[images.WEBP]["800w"].startswith("/media/variants/"))
+
+    def test_transparent_image_falls_back_to_png(self):
+        """Testa que imagens com transparência usam PNG em vez de JPEG"""
+        image = self.upload("logo.png", (0, 0, 0, 0), "RGBA", (100, 50))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.store.logo = image
+            self.store.save()
+        self.store.refresh_from_db()
+
+        files = self.store.logo_variants["files"]
+        self.assertEqual(set(files), {images.WEBP, images.PNG})
+        # O original é menor que os tamanhos pedidos: uma só largura
+        self.assertEqual(set(files[images.PNG]), {"100w"})
+
+    def test_unchanged_content_is_not_regenerated(self):
+        """Testa que as variantes só são refeitas quando o conteúdo muda"""
+        product = self.create_product(self.upload("foto.png", "red"))
+        product.refresh_from_db()
+        manifest = product.image_variants
+
+        with mock.patch.object(images, "schedule") as schedule:
+            product.price = 12
+            product.save()
+        schedule.assert_not_called()
+
+        with mock.patch.object(images, "render_variants") as render:
+            with self.captureOnCommitCallbacks(execute=True):
+                product.image = self.upload("copia.png", "red")
+                product.save()
+        render.assert_not_called()
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants["files"], manifest["files"])
+        self.assertEqual(product.image_variants["source"], product.image.name)
+
+    def test_new_content_replaces_variants(self):
+        """Testa que um original novo gera variantes novas e apaga as antigas"""
+        product = self.create_product(self.upload("foto.png", "red"))
+        product.refresh_from_db()
+        previous = images.manifest_files(product.image_variants)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.image = self.upload("foto.png", "blue")
+            product.save()
+        product.refresh_from_db()
+
+        current = images.manifest_files(product.image_variants)
+        self.assertFalse(set(previous) & set(current))
+        for name in previous:
+            self.assertFalse(default_storage.exists(name))
+        for name in current:
+            self.assertTrue(default_storage.exists(name))
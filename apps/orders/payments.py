@@ -1,4 +1,5 @@
 from django.conf import settings
+from django.db import transaction
 import random
 import string
 from .models import Order, Payment
@@ -99,13 +100,14 @@ class AOAPaymentProcessor:
             if success:
                 # Gerar ID de transação de reembolso
                 refund_id = f"REF-{"".join(random.choices(string.ascii_uppercase + string.digits, k=16))}"
-                payment.payment_status = "refunded"
-                payment.save()
-
-                # Atualizar status do pedido
-                order.payment_status = "refunded"
-                order.status = "cancelled"
-                order.save()
+                with transaction.atomic():
+                    payment.payment_status = "refunded"
+                    payment.save()
+
+                    # Atualizar status do pedido
+                    order.payment_status = "refunded"
+                    order.status = "cancelled"
+                    order.save()
 
                 return (
                     True,
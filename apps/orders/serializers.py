@@ -1,9 +1,10 @@
 from rest_framework import serializers
+from apps.core.serializers import QuerysetShapingMixin
 from .models import Order, OrderItem, Payment
 from apps.products.serializers import ProductListSerializer
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(QuerysetShapingMixin, serializers.ModelSerializer):
     """
     Serializer para itens de pedido.
     Inclui informações do produto.
@@ -16,7 +17,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = ["id", "product", "quantity", "price"]
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(QuerysetShapingMixin, serializers.ModelSerializer):
     """
     Serializer para pedidos.
     Inclui todos os itens do pedido.
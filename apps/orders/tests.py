@@ -1,4 +1,5 @@
-from django.test import TestCase
+from unittest import mock
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework import status
@@ -7,7 +8,9 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from .models import Order, OrderItem, Payment
 from apps.products.models import Category, Product
 from apps.accounts.models import Store
+from apps.cart import guest
 from apps.cart.models import Cart, CartItem
+from apps.core.testing import QueryCountMixin
 
 User = get_user_model()
 
@@ -132,6 +135,31 @@ class OrderAPITest(APITestCase):
             quantity=2,
         )
 
+    @override_settings(GUEST_CART_BACKEND="local")
+    @mock.patch(
+        "apps.orders.views.AOAPaymentProcessor.process_payment",
+        return_value=(True, "TXN-1", "Pagamento processado."),
+    )
+    def test_create_order_from_guest_cart(self, process_payment):
+        """Testa que o pedido grava no banco o carrinho anónimo"""
+        store = guest.get_store()
+        store.create("GUEST123456")
+        store.add_many("GUEST123456", {self.product.id: 3})
+
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+        data = {
+            "cart_code": "GUEST123456",
+            "shipping_address": "Test Address",
+            "payment_method": "reference",
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("create_order"), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get(user=self.user)
+        self.assertEqual(order.items.get().quantity, 3)
+        self.assertFalse(store.exists("GUEST123456"))
+
     def test_create_order(self):
         """Testa a criação de um pedido"""
 
@@ -406,3 +434,44 @@ class OrderAPITest(APITestCase):
         response = self.client.put(url, data, format="json")
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("error", response.data)
+
+
+class OrderQueryCountTest(QueryCountMixin, APITestCase):
+    """Testes do número de queries dos endpoints de pedidos"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.category = Category.objects.create(name="Test Category")
+        self.created = 0
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+    def add_orders(self, count):
+        """Acrescenta pedidos, cada um com um produto de outra loja"""
+        for _ in range(count):
+            self.created += 1
+            seller = User.objects.create_user(
+                username=f"seller{self.created}",
+                email=f"seller{self.created}@example.com",
+                password="sellerpass123",
+                user_type="seller",
+            )
+            store = Store.objects.create(name=f"Store {self.created}", owner=seller)
+            product = Product.objects.create(
+                name=f"Product {self.created}",
+                price=10,
+                category=self.category,
+                store=store,
+            )
+            order = Order.objects.create(
+                user=self.user, total_amount=10, shipping_address="Test Address"
+            )
+            OrderItem.objects.create(order=order, product=product, quantity=1, price=10)
+
+    def test_user_orders_constant_queries(self):
+        """Testa que listar os pedidos não faz uma query por pedido ou item"""
+        url = reverse("user_orders")
+        self.assertConstantQueries(lambda: self.client.get(url), self.add_orders)
@@ -3,7 +3,10 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from apps.cart import guest
 from apps.cart.models import Cart
+from apps.core import fastpath
+from apps.core.serializers import requested_fields
 from .payments import AOAPaymentProcessor
 from .models import Order, OrderItem
 from .serializers import CreateOrderSerializer, OrderSerializer
@@ -25,8 +28,8 @@ def create_order(request):
     reference_number = serializer.validated_data.get("reference_number")
 
     try:
-        # Obter carrinho
-        cart = Cart.objects.get(cart_code=cart_code)
+        # Obter carrinho (um carrinho anónimo fora do banco é gravado agora)
+        cart = guest.persist(cart_code) or Cart.objects.get(cart_code=cart_code)
 
         # Verificar se o carrinho tem itens
         if not cart.cartitems.exists():
@@ -84,6 +87,7 @@ def create_order(request):
         if success:
             # Limpar carrinho após pedido bem-sucedido
             cart.cartitems.all().delete()
+            Cart.refresh_summaries([cart.pk])
 
             # Retornar dados do pedido
             order_serializer = OrderSerializer(order)
@@ -113,12 +117,14 @@ def create_order(request):
 @permission_classes([IsAuthenticated])
 def get_user_orders(request):
     """
-    Obtém todos os pedidos do usuário
+    Obtém todos os pedidos do usuário.
+    Aceita fields/expand para escolher os campos devolvidos
+    (ex.: fields=order_number,status,total_amount).
     """
 
     orders = Order.objects.filter(user=request.user).order_by("-created_at")
-    serializer = OrderSerializer(orders, many=True)
-    return Response(serializer.data)
+    data = fastpath.serialize(OrderSerializer, orders, requested_fields(request))
+    return Response(data)
 
 
 @api_view(["GET"])
@@ -130,7 +136,7 @@ def get_order_detail(request, order_number):
 
     try:
         order = Order.objects.get(order_number=order_number, user=request.user)
-        serializer = OrderSerializer(order)
+        serializer = OrderSerializer(order, fields=requested_fields(request))
         return Response(serializer.data)
     except Order.DoesNotExist:
         return Response(
@@ -198,7 +204,7 @@ def get_store_orders(request):
     order_ids = order_items.values_list("order_id", flat=True).distinct()
     orders = Order.objects.filter(id__in=order_ids).order_by("-created_at")
 
-    serializer = OrderSerializer(orders, many=True)
+    serializer = OrderSerializer(orders, many=True, fields=requested_fields(request))
     return Response(serializer.data)
 
 
@@ -253,9 +259,10 @@ def update_order_status(request, order_number):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Atualizar status
+        # Atualizar status (numa transação, ver recommendations.adjust_order)
         order.status = new_status
-        order.save()
+        with transaction.atomic():
+            order.save()
 
         serializer = OrderSerializer(order)
         return Response(serializer.data)
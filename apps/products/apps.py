@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ProductsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.products"
+
+    def ready(self):
+        """
+        Importar os signals que mantêm o índice de busca sincronizado.
+        """
+        import apps.products.signals
@@ -0,0 +1,114 @@
+"""
+Atualização de preço e estoque em lote.
+
+A posse dos produtos é verificada com uma única consulta à loja do
+vendedor; as alterações são aplicadas em blocos de CHUNK_SIZE produtos,
+cada um com um único UPDATE ... CASE na sua própria transação. O cache do
+catálogo é invalidado uma vez no fim (a versão da loja cobre o detalhe de
+todos os seus produtos).
+"""
+
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+from apps.accounts.models import Store
+from . import cache as catalog_cache
+from .models import Category, Product
+from .serializers import ProductStockPriceSerializer
+from .signals import prices_changed
+
+CHUNK_SIZE = 500
+
+# Número máximo de entradas por pedido
+MAX_ENTRIES = 10000
+
+
+def _case(field, changes):
+    """
+    Expressão CASE que atribui o novo valor aos produtos alterados e mantém o
+    atual nos restantes.
+    """
+    whens = [
+        When(pk=pk, then=Value(values[field]))
+        for pk, values in changes.items()
+        if field in values
+    ]
+    return Case(*whens, default=F(field), output_field=Product._meta.get_field(field))
+
+
+def update_stock_and_prices(store, entries):
+    """
+    Aplica as entradas {id|slug, price, stock_quantity, in_stock} aos
+    produtos da loja.
+
+    Returns:
+        dict: {"updated", "error_count", "errors"}, com os erros indexados
+        pela posição da entrada no pedido
+    """
+    errors = []
+    valid = []
+    for index, entry in enumerate(entries):
+        serializer = ProductStockPriceSerializer(data=entry)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            errors.append({"index": index, "errors": serializer.errors})
+
+    # Verificação de posse numa única consulta
+    ids = [data["id"] for _, data in valid if "id" in data]
+    slugs = [data["slug"] for _, data in valid if "id" not in data]
+    owned = Product.objects.filter(store=store).filter(
+        Q(pk__in=ids) | Q(slug__in=slugs)
+    )
+    by_id = {}
+    by_slug = {}
+    for pk, slug, category_id in owned.values_list("pk", "slug", "category_id"):
+        by_id[pk] = by_slug[slug] = (pk, category_id)
+
+    # Entradas repetidas para o mesmo produto são combinadas (a última vence)
+    changes = {}
+    category_ids = set()
+    for index, data in valid:
+        product = by_id.get(data["id"]) if "id" in data else by_slug.get(data["slug"])
+        if product is None:
+            errors.append(
+                {"index": index, "errors": {"product": ["Produto não encontrado."]}}
+            )
+            continue
+        pk, category_id = product
+        changes.setdefault(pk, {}).update(
+            (field, data[field])
+            for field in ProductStockPriceSerializer.UPDATE_FIELDS
+            if field in data
+        )
+        if category_id:
+            category_ids.add(category_id)
+
+    now = timezone.now()
+    items = list(changes.items())
+    for start in range(0, len(items), CHUNK_SIZE):
+        chunk = dict(items[start : start + CHUNK_SIZE])
+        fields = {
+            field: _case(field, chunk)
+            for field in ProductStockPriceSerializer.UPDATE_FIELDS
+            if any(field in values for values in chunk.values())
+        }
+        with transaction.atomic():
+            Product.objects.filter(pk__in=chunk).update(updated_at=now, **fields)
+
+    if changes:
+        # Mesmo efeito dos signals de Product, uma vez por pedido
+        Store.objects.filter(pk=store.pk).update(updated_at=now)
+        categories = Category.objects.filter(pk__in=category_ids)
+        category_slugs = list(categories.values_list("slug", flat=True))
+        categories.update(updated_at=now)
+        catalog_cache.invalidate(
+            [catalog_cache.FEATURED, catalog_cache.store_key(store.slug)]
+            + [catalog_cache.category_key(slug) for slug in category_slugs]
+        )
+        repriced = [pk for pk, values in changes.items() if "price" in values]
+        if repriced:
+            prices_changed.send(sender=Product, product_ids=repriced)
+
+    errors.sort(key=lambda error: error["index"])
+    return {"updated": len(changes), "error_count": len(errors), "errors": errors}
@@ -0,0 +1,128 @@
+"""
+Cache versionado das respostas públicas do catálogo.
+
+Cada entrada guarda, junto com os dados, as versões das suas dependências
+(produto, loja, categoria, ...) no momento em que foi gerada. Invalidar é
+apenas incrementar a versão de uma dependência (O(1)); as entradas antigas
+deixam de ser servidas na leitura seguinte e expiram sozinhas, sem nunca ser
+preciso procurar chaves.
+
+As versões são incrementadas pelos signals de Product, Category e Store
+(ver signals.py).
+"""
+
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_PREFIX = "catalog:v"
+ENTRY_PREFIX = "catalog:r"
+
+# Dependências globais
+FEATURED = f"{VERSION_PREFIX}:featured"
+CATEGORIES = f"{VERSION_PREFIX}:categories"
+# Nomes de produtos e categorias visíveis (índice de sugestões, ver suggest.py)
+NAMES = f"{VERSION_PREFIX}:names"
+
+
+def product_key(slug):
+    return f"{VERSION_PREFIX}:product:{slug}"
+
+
+def store_key(slug):
+    return f"{VERSION_PREFIX}:store:{slug}"
+
+
+def category_key(slug):
+    return f"{VERSION_PREFIX}:category:{slug}"
+
+
+def get_timeout():
+    return getattr(settings, "CATALOG_CACHE_TIMEOUT", 300)
+
+
+def _initial_version():
+    # Uma versão inicial baseada no relógio evita que uma chave de versão
+    # despejada do cache volte a um valor já visto por entradas antigas.
+    return time.time_ns()
+
+
+def snapshot(keys):
+    """
+    Retorna as versões atuais das dependências, criando as que faltam.
+
+    Args:
+        keys: Lista de chaves de versão
+
+    Returns:
+        dict: {chave: versão}
+    """
+    keys = [key for key in keys if key]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, _initial_version(), timeout=None)
+        versions.update(cache.get_many(missing))
+    return {key: versions.get(key) for key in keys}
+
+
+def bump(keys):
+    """
+    Incrementa as versões das dependências indicadas.
+    """
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_version(), timeout=None)
+
+
+def invalidate(keys):
+    """
+    Invalida as dependências agora e novamente após o commit da transação,
+    para que leitores concorrentes não guardem dados anteriores ao commit.
+    """
+    keys = [key for key in set(keys) if key]
+    if not keys:
+        return
+    bump(keys)
+    transaction.on_commit(lambda: bump(keys))
+
+
+def response_key(name, request):
+    """
+    Chave de uma resposta, derivada do nome da view e da URL absoluta
+    (os links de paginação incluem o host).
+    """
+    url = request.build_absolute_uri()
+    digest = hashlib.md5(url.encode()).hexdigest()
+    return f"{ENTRY_PREFIX}:{name}:{digest}"
+
+
+def get_entry(key):
+    """
+    Retorna os dados guardados em `key`, ou None se não existirem ou se
+    alguma dependência tiver mudado de versão.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    versions, data = entry
+    if snapshot(list(versions)) != versions:
+        return None
+    return data
+
+
+def set_entry(key, data, versions):
+    """
+    Guarda os dados com as versões das dependências.
+
+    Args:
+        key: Chave da resposta (ver response_key)
+        data: Dados serializados
+        versions: Versões obtidas com snapshot() antes de consultar o banco
+    """
+    cache.set(key, (versions, data), get_timeout())
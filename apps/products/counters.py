@@ -0,0 +1,215 @@
+"""
+Contador de visualizações dos produtos com escrita diferida (write-behind).
+
+Cada visualização só incrementa um buffer (em memória no processo ou num
+hash do Redis, ver VIEW_COUNTER_BACKEND); a cada
+VIEW_COUNTER_FLUSH_INTERVAL segundos uma thread despeja o buffer no banco
+com um UPDATE ... SET view_count = view_count + n por valor de n, em lotes.
+Se o processo terminar sem despejar, perdem-se no máximo as visualizações
+de um intervalo (no Redis, só as do lote a ser gravado).
+
+A thread é iniciada pelo servidor da aplicação (ver ecommerce/wsgi.py);
+comandos e testes não a iniciam e podem chamar flush() diretamente.
+"""
+
+import atexit
+import functools
+import logging
+import os
+import threading
+import uuid
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+# Produtos por UPDATE
+BATCH_SIZE = 500
+
+REDIS_KEY = "catalog:views"
+
+
+def get_flush_interval():
+    return getattr(settings, "VIEW_COUNTER_FLUSH_INTERVAL", 10)
+
+
+class LocalBuffer:
+    """
+    Buffer em memória, por processo.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+
+    def add(self, counts):
+        with self.lock:
+            self.counts.update(counts)
+
+    def drain(self):
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+        return counts
+
+
+class RedisBuffer:
+    """
+    Buffer partilhado por todos os processos num hash do Redis.
+    """
+
+    def __init__(self):
+        from django_redis import get_redis_connection
+
+        self.client = get_redis_connection("default")
+
+    def add(self, counts):
+        pipeline = self.client.pipeline(transaction=False)
+        for slug, n in counts.items():
+            pipeline.hincrby(REDIS_KEY, slug, n)
+        pipeline.execute()
+
+    def drain(self):
+        from redis.exceptions import ResponseError
+
+        # RENAME é atómico: visualizações registadas durante o despejo vão
+        # para um hash novo
+        name = f"{REDIS_KEY}:flush:{uuid.uuid4().hex}"
+        try:
+            self.client.rename(REDIS_KEY, name)
+        except ResponseError:
+            # Hash inexistente: nada a despejar
+            return Counter()
+        counts = self.client.hgetall(name)
+        self.client.delete(name)
+        return Counter({slug.decode(): int(n) for slug, n in counts.items()})
+
+
+def write_counts(counts):
+    """
+    Soma as visualizações {slug: n} ao banco, com um UPDATE por valor de n
+    (e por lote de BATCH_SIZE produtos).
+    """
+    by_increment = defaultdict(list)
+    for slug, n in counts.items():
+        if n > 0:
+            by_increment[n].append(slug)
+    for n, slugs in by_increment.items():
+        for start in range(0, len(slugs), BATCH_SIZE):
+            Product.objects.filter(slug__in=slugs[start : start + BATCH_SIZE]).update(
+                view_count=F("view_count") + n
+            )
+
+
+class ViewCounter:
+    """
+    Regista visualizações e despeja-as periodicamente no banco.
+    """
+
+    def __init__(self):
+        self.buffer = None
+        self.lock = threading.Lock()
+        self.started = False
+        self.thread = None
+        self.pid = None
+        self.stopping = threading.Event()
+
+    def get_buffer(self):
+        if self.buffer is None:
+            backend = getattr(settings, "VIEW_COUNTER_BACKEND", "local")
+            self.buffer = RedisBuffer() if backend == "redis" else LocalBuffer()
+        return self.buffer
+
+    def record(self, slug, n=1):
+        """
+        Regista `n` visualizações do produto.
+        """
+        self.get_buffer().add({slug: n})
+        # Processos criados por fork (gunicorn --preload) não herdam a thread
+        if self.started and self.pid != os.getpid():
+            self.start()
+
+    def flush(self):
+        """
+        Grava no banco as visualizações acumuladas.
+
+        Returns:
+            int: Número de visualizações gravadas
+        """
+        buffer = self.get_buffer()
+        counts = buffer.drain()
+        if not counts:
+            return 0
+        try:
+            write_counts(counts)
+        except Exception:
+            # Devolve ao buffer para a próxima tentativa
+            buffer.add(counts)
+            raise
+        return sum(counts.values())
+
+    def start(self):
+        """
+        Inicia a thread que despeja o buffer a cada intervalo.
+        """
+        with self.lock:
+            if self.pid == os.getpid() and self.thread and self.thread.is_alive():
+                return
+            if not self.started:
+                atexit.register(self.stop)
+            self.started = True
+            self.pid = os.getpid()
+            self.stopping.clear()
+            self.thread = threading.Thread(
+                target=self.run, name="view-counter", daemon=True
+            )
+            self.thread.start()
+
+    def stop(self):
+        """
+        Para a thread e grava o que ficou no buffer.
+        """
+        self.stopping.set()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Erro ao gravar as visualizações dos produtos")
+
+    def run(self):
+        while not self.stopping.wait(get_flush_interval()):
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Erro ao gravar as visualizações dos produtos")
+            finally:
+                close_old_connections()
+
+
+view_counter = ViewCounter()
+
+
+def record_view(slug):
+    """
+    Regista uma visualização do produto (sem escrita no banco).
+    """
+    view_counter.record(slug)
+
+
+def counts_views(view):
+    """
+    Conta uma visualização por cada resposta 200 ou 304 da view de detalhe.
+    Aplicado por fora de @conditional, para que as revalidações (304), que
+    não chegam a executar a view, também contem.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if request.method == "GET" and response.status_code in (200, 304):
+            record_view(kwargs["slug"])
+        return response
+
+    return wrapper
@@ -0,0 +1,125 @@
+"""
+Exportação do catálogo em streaming (CSV ou NDJSON, opcionalmente gzip).
+
+As linhas são lidas com values() e QuerySet.iterator(), sem instanciar
+modelos, e escritas em blocos à medida que são geradas; a memória usada não
+depende do número de produtos. As colunas do CSV são compatíveis com a
+importação (ver importer.py).
+"""
+
+import csv
+import zlib
+from django.core.serializers.json import DjangoJSONEncoder
+from .models import Product
+
+FORMATS = ("csv", "ndjson")
+
+CONTENT_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# Colunas exportadas: (nome no ficheiro, campo em values())
+COLUMNS = [
+    ("id", "id"),
+    ("slug", "slug"),
+    ("name", "name"),
+    ("description", "description"),
+    ("price", "price"),
+    ("stock_quantity", "stock_quantity"),
+    ("in_stock", "in_stock"),
+    ("featured", "featured"),
+    ("category", "category__slug"),
+    ("store", "store__slug"),
+    ("created_at", "created_at"),
+    ("updated_at", "updated_at"),
+]
+
+# Linhas lidas do banco por vez
+CHUNK_SIZE = 2000
+
+# Tamanho aproximado de cada bloco enviado ao cliente
+BLOCK_SIZE = 64 * 1024
+
+
+class _Echo:
+    """
+    Objeto "ficheiro" que devolve o que lhe é escrito (para csv.writer).
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset):
+    """
+    Gera os produtos do queryset como tuplas na ordem de COLUMNS.
+    """
+    fields = [field for _, field in COLUMNS]
+    return queryset.order_by("id").values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+
+
+def _csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in COLUMNS])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _ndjson_lines(rows):
+    names = [name for name, _ in COLUMNS]
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(dict(zip(names, row))) + "\n"
+
+
+def _blocks(lines):
+    """
+    Agrupa as linhas em blocos de bytes de ~BLOCK_SIZE.
+    """
+    buffer = []
+    size = 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= BLOCK_SIZE:
+            yield b"".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def gzip_stream(blocks):
+    """
+    Comprime os blocos em formato gzip à medida que são gerados.
+    """
+    compressor = zlib.compressobj(wbits=31)
+    for block in blocks:
+        data = compressor.compress(block)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(queryset, file_format="csv", compress=False):
+    """
+    Gera o conteúdo do ficheiro de exportação em blocos de bytes.
+
+    Args:
+        queryset: Produtos a exportar
+        file_format: "csv" ou "ndjson"
+        compress: Comprime a saída com gzip
+    """
+    rows = export_rows(queryset)
+    lines = _csv_lines(rows) if file_format == "csv" else _ndjson_lines(rows)
+    blocks = _blocks(lines)
+    return gzip_stream(blocks) if compress else blocks
+
+
+def export_queryset(store=None):
+    """
+    Produtos a exportar: os de uma loja ou todos.
+    """
+    products = Product.objects.all()
+    if store is not None:
+        products = products.filter(store=store)
+    return products
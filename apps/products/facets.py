@@ -0,0 +1,92 @@
+"""
+Contagens de facetas da listagem de produtos.
+
+Todas as facetas (categoria, loja e faixa de preço) saem de uma única
+consulta agrupada por (categoria, loja, faixa de preço); os totais de cada
+faceta são somados em Python a partir dessas linhas.
+"""
+
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, Value, When
+
+# Limites inferiores das faixas de preço, em Kwanzas
+DEFAULT_PRICE_BUCKETS = [0, 5000, 10000, 25000, 50000, 100000]
+
+
+def get_price_buckets():
+    return getattr(settings, "CATALOG_PRICE_BUCKETS", DEFAULT_PRICE_BUCKETS)
+
+
+def price_bucket(bounds):
+    """
+    Expressão com o índice da faixa de preço de cada produto: a faixa i vai
+    de bounds[i] (inclusive) a bounds[i + 1] (exclusive); a última não tem
+    limite superior.
+    """
+    whens = [
+        When(price__lt=upper, then=Value(index))
+        for index, upper in enumerate(bounds[1:])
+    ]
+    return Case(*whens, default=Value(len(bounds) - 1), output_field=IntegerField())
+
+
+def _sorted(facet):
+    return sorted(facet.values(), key=lambda item: (-item["count"], item["name"]))
+
+
+def facet_counts(queryset):
+    """
+    Calcula as facetas dos produtos do queryset numa única consulta.
+
+    Returns:
+        dict: {"categories": [...], "stores": [...], "price": [...]}, com as
+        categorias e lojas ordenadas por contagem decrescente
+    """
+    bounds = get_price_buckets()
+    rows = (
+        queryset.order_by()
+        .annotate(price_bucket=price_bucket(bounds))
+        .values(
+            "category__slug",
+            "category__name",
+            "store__slug",
+            "store__name",
+            "price_bucket",
+        )
+        .annotate(count=Count("id"))
+    )
+
+    categories = {}
+    stores = {}
+    prices = [0] * len(bounds)
+    for row in rows:
+        count = row["count"]
+        if row["category__slug"] is not None:
+            category = categories.setdefault(
+                row["category__slug"],
+                {
+                    "slug": row["category__slug"],
+                    "name": row["category__name"],
+                    "count": 0,
+                },
+            )
+            category["count"] += count
+        store = stores.setdefault(
+            row["store__slug"],
+            {"slug": row["store__slug"], "name": row["store__name"], "count": 0},
+        )
+        store["count"] += count
+        prices[row["price_bucket"]] += count
+
+    return {
+        "categories": _sorted(categories),
+        "stores": _sorted(stores),
+        "price": [
+            {
+                "min": lower,
+                "max": bounds[index + 1] if index + 1 < len(bounds) else None,
+                "count": prices[index],
+            }
+            for index, lower in enumerate(bounds)
+        ],
+    }
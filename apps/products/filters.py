@@ -0,0 +1,31 @@
+import django_filters
+from .models import Product
+
+
+class ProductFilter(django_filters.FilterSet):
+    """
+    Filtros da listagem de produtos.
+
+    Parâmetros de query:
+    - category: slug da categoria
+    - store: slug da loja
+    - min_price, max_price: faixa de preço (inclusiva)
+    - in_stock, featured: true/false
+    """
+
+    category = django_filters.CharFilter(field_name="category__slug")
+    store = django_filters.CharFilter(field_name="store__slug")
+    min_price = django_filters.NumberFilter(field_name="price", lookup_expr="gte")
+    max_price = django_filters.NumberFilter(field_name="price", lookup_expr="lte")
+    in_stock = django_filters.BooleanFilter()
+    featured = django_filters.BooleanFilter()
+
+    class Meta:
+        model = Product
+        fields = ["category", "store", "min_price", "max_price", "in_stock", "featured"]
+
+    def has_filters(self):
+        """
+        Indica se algum filtro foi fornecido no pedido.
+        """
+        return any(self.data.get(name) not in (None, "") for name in self.filters)
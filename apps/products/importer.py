@@ -0,0 +1,227 @@
+"""
+Importação de produtos em lote (CSV ou NDJSON).
+
+O ficheiro é lido linha a linha e processado em lotes de `batch_size`
+linhas: cada lote é validado (com uma única consulta às categorias),
+recebe slugs pré-alocados (ver apps.core.slugs.allocate_slugs) e é gravado
+com bulk_create numa transação própria. A memória usada depende do tamanho
+do lote e não do ficheiro.
+
+Como bulk_create não envia signals, o índice de busca é atualizado a cada
+lote e as contagens das categorias e o cache do catálogo no fim.
+"""
+
+import codecs
+import csv
+import json
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from apps.accounts.models import Store
+from apps.core.slugs import allocate_slugs
+from . import cache as catalog_cache
+from . import search
+from .models import Category, Product
+from .serializers import ProductImportSerializer
+from .utils import normalize_search_text
+
+FORMATS = ("csv", "ndjson")
+
+DEFAULT_BATCH_SIZE = 500
+
+# Limite de erros detalhados no relatório (os restantes só são contados)
+MAX_REPORTED_ERRORS = 1000
+
+
+def detect_format(filename, content_type=""):
+    """
+    Deduz o formato a partir do nome do ficheiro ou do content type.
+    """
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in (content_type or ""):
+        return "ndjson"
+    return "csv"
+
+
+def read_rows(fileobj, file_format):
+    """
+    Gera (número da linha, dados) a partir de um ficheiro binário, sem o
+    carregar inteiro em memória.
+    """
+    text = codecs.getreader("utf-8-sig")(fileobj)
+    if file_format == "csv":
+        reader = csv.DictReader(text)
+        for number, row in enumerate(reader, start=1):
+            # Células vazias usam o valor padrão do campo
+            yield number, {
+                key: value for key, value in row.items() if key and value != ""
+            }
+        return
+
+    for number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row
+
+
+class ProductImporter:
+    """
+    Importa produtos para uma loja.
+
+    Uso:
+        report = ProductImporter(store).run(fileobj, "csv")
+    """
+
+    def __init__(self, store, batch_size=DEFAULT_BATCH_SIZE):
+        self.store = store
+        self.batch_size = batch_size
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+        self.category_ids = set()
+
+    def run(self, fileobj, file_format):
+        """
+        Importa todas as linhas do ficheiro.
+
+        Returns:
+            dict: {"created", "error_count", "errors"}, em que "errors" lista
+            até MAX_REPORTED_ERRORS linhas rejeitadas com os seus erros; se
+            o ficheiro não puder ser lido até ao fim (codificação que não é
+            UTF-8, CSV malformado) inclui também "file_error"
+        """
+        batch = []
+        number = 0
+        file_error = None
+        try:
+            for number, row in read_rows(fileobj, file_format):
+                batch.append((number, row))
+                if len(batch) >= self.batch_size:
+                    self.import_batch(batch)
+                    batch = []
+        except (UnicodeDecodeError, csv.Error) as exc:
+            file_error = exc
+        # As linhas lidas antes de um erro de leitura também são importadas
+        if batch:
+            self.import_batch(batch)
+
+        self.finish()
+        report = {
+            "created": self.created,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+        if file_error is not None:
+            report["file_error"] = self.describe_file_error(file_error, number + 1)
+        return report
+
+    def describe_file_error(self, exc, number):
+        """
+        Mensagem do erro de leitura, indicando o que foi mantido.
+        """
+        if isinstance(exc, UnicodeDecodeError):
+            reason = "O ficheiro não está em UTF-8"
+        else:
+            reason = f"CSV inválido ({exc})"
+        kept = (
+            f"os {self.created} produto(s) das linhas anteriores foram mantidos"
+            if self.created
+            else "nenhum produto foi importado"
+        )
+        return f"{reason}: leitura interrompida perto da linha {number}; {kept}."
+
+    def add_error(self, number, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": number, "errors": errors})
+
+    def validate(self, batch):
+        """
+        Valida um lote e retorna a lista de (número, dados validados).
+        """
+        valid = []
+        for number, row in batch:
+            if not isinstance(row, dict):
+                self.add_error(number, {"non_field_errors": ["Linha inválida."]})
+                continue
+            serializer = ProductImportSerializer(data=row)
+            if serializer.is_valid():
+                valid.append((number, serializer.validated_data))
+            else:
+                self.add_error(number, serializer.errors)
+
+        slugs = {data.get("category") for _, data in valid} - {None, ""}
+        categories = dict(
+            Category.objects.filter(slug__in=slugs).values_list("slug", "id")
+        )
+        resolved = []
+        for number, data in valid:
+            slug = data.pop("category", "")
+            if slug and slug not in categories:
+                self.add_error(number, {"category": ["Categoria não encontrada."]})
+                continue
+            data["category_id"] = categories.get(slug)
+            resolved.append((number, data))
+        return resolved
+
+    def import_batch(self, batch):
+        """
+        Valida e grava um lote de linhas.
+        """
+        rows = self.validate(batch)
+        if not rows:
+            return
+
+        # Uma segunda tentativa cobre slugs gravados por outro processo
+        # entre a alocação e o INSERT
+        for attempt in range(2):
+            slugs = allocate_slugs(Product, [data["name"] for _, data in rows])
+            products = [
+                Product(
+                    store=self.store,
+                    slug=slug,
+                    search_key=normalize_search_text(data["name"])[:255],
+                    **data,
+                )
+                for (_, data), slug in zip(rows, slugs)
+            ]
+            try:
+                with transaction.atomic():
+                    Product.objects.bulk_create(products)
+                break
+            except IntegrityError:
+                if attempt:
+                    for number, _ in rows:
+                        self.add_error(
+                            number, {"non_field_errors": ["Erro ao gravar o produto."]}
+                        )
+                    return
+
+        search.index_products(Product.objects.filter(slug__in=slugs))
+        self.created += len(products)
+        self.category_ids.update(
+            product.category_id for product in products if product.category_id
+        )
+
+    def finish(self):
+        """
+        Atualiza o que os signals de Product fariam em cada save().
+        """
+        if not self.created:
+            return
+        Category.refresh_product_counts(self.category_ids)
+        Store.objects.filter(pk=self.store.pk).update(updated_at=timezone.now())
+        category_slugs = Category.objects.filter(pk__in=self.category_ids).values_list(
+            "slug", flat=True
+        )
+        catalog_cache.invalidate(
+            [
+                catalog_cache.FEATURED,
+                catalog_cache.NAMES,
+                catalog_cache.store_key(self.store.slug),
+            ]
+            + [catalog_cache.category_key(slug) for slug in category_slugs]
+        )
@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+from apps.products import search
+from apps.products.models import Category, Product
+from apps.products.utils import normalize_search_text
+
+
+class Command(BaseCommand):
+    help = (
+        "Preenche search_key de produtos e categorias existentes, em lotes por "
+        "intervalo de chave primária, e reconstrói o índice de busca."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Número de ids processados por lote (padrão: 1000).",
+        )
+        parser.add_argument(
+            "--skip-index",
+            action="store_true",
+            help="Não reconstruir o índice de busca no final.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        for model in (Category, Product):
+            updated = self.backfill(model, batch_size)
+            self.stdout.write(f"{model.__name__}: {updated} registros atualizados.")
+
+        if not options["skip_index"]:
+            search.rebuild_index()
+            self.stdout.write("Índice de busca reconstruído.")
+
+        self.stdout.write(self.style.SUCCESS("Backfill concluído."))
+
+    def backfill(self, model, batch_size):
+        """
+        Atualiza search_key de um modelo percorrendo intervalos de ids, com uma
+        transação curta por lote.
+        """
+        bounds = model.objects.aggregate(low=Min("pk"), high=Max("pk"))
+        if bounds["low"] is None:
+            return 0
+
+        updated = 0
+        start = bounds["low"]
+        while start <= bounds["high"]:
+            end = start + batch_size
+            with transaction.atomic():
+                rows = list(
+                    model.objects.filter(pk__gte=start, pk__lt=end).only(
+                        "pk", "name", "search_key"
+                    )
+                )
+                changed = []
+                for row in rows:
+                    key = normalize_search_text(row.name)[:255]
+                    if row.search_key != key:
+                        row.search_key = key
+                        changed.append(row)
+                model.objects.bulk_update(changed, ["search_key"])
+            updated += len(changed)
+            start = end
+        return updated
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from apps.products import recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        'Atualiza a tabela de coocorrências ("comprados juntos") com os '
+        "pedidos novos desde a última execução."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=recommendations.CHUNK_SIZE,
+            help=f"Pedidos por lote (padrão: {recommendations.CHUNK_SIZE}).",
+        )
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Apaga a tabela e processa todos os pedidos de novo.",
+        )
+
+    def handle(self, *args, **options):
+        if options["rebuild"]:
+            processed = recommendations.rebuild_cooccurrences(options["chunk_size"])
+        else:
+            processed = recommendations.build_cooccurrences(options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"{processed} pedido(s) processado(s)."))
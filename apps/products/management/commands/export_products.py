@@ -0,0 +1,50 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from apps.accounts.models import Store
+from apps.products import exporter
+
+
+class Command(BaseCommand):
+    help = "Exporta os produtos de uma loja, ou de toda a plataforma, em CSV ou NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--store", help="Slug da loja (padrão: todas).")
+        parser.add_argument(
+            "--format",
+            choices=exporter.FORMATS,
+            default="csv",
+            help="Formato do ficheiro (padrão: csv).",
+        )
+        parser.add_argument(
+            "--gzip", action="store_true", help="Comprime a saída com gzip."
+        )
+        parser.add_argument(
+            "--output", help="Caminho do ficheiro de saída (padrão: saída padrão)."
+        )
+
+    def handle(self, *args, **options):
+        store = None
+        if options["store"]:
+            try:
+                store = Store.objects.get(slug=options["store"])
+            except Store.DoesNotExist:
+                raise CommandError(f"Loja não encontrada: {options['store']}")
+
+        stream = exporter.export_stream(
+            exporter.export_queryset(store), options["format"], options["gzip"]
+        )
+        if options["output"]:
+            with open(options["output"], "wb") as fileobj:
+                for block in stream:
+                    fileobj.write(block)
+            self.stderr.write(
+                self.style.SUCCESS(f"Exportado para {options['output']}.")
+            )
+        elif options["gzip"]:
+            for block in stream:
+                sys.stdout.buffer.write(block)
+            sys.stdout.buffer.flush()
+        else:
+            # Os blocos terminam sempre no fim de uma linha
+            for block in stream:
+                self.stdout.write(block.decode(), ending="")
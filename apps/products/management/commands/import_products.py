@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.accounts.models import Store
+from apps.products.importer import (
+    DEFAULT_BATCH_SIZE,
+    FORMATS,
+    ProductImporter,
+    detect_format,
+)
+
+
+class Command(BaseCommand):
+    help = "Importa produtos de um ficheiro CSV ou NDJSON para uma loja."
+
+    def add_arguments(self, parser):
+        parser.add_argument("store", help="Slug da loja.")
+        parser.add_argument("path", help="Caminho do ficheiro a importar.")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="Formato do ficheiro (padrão: deduzido da extensão).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Linhas por lote (padrão: {DEFAULT_BATCH_SIZE}).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            store = Store.objects.get(slug=options["store"])
+        except Store.DoesNotExist:
+            raise CommandError(f"Loja não encontrada: {options['store']}")
+
+        file_format = options["format"] or detect_format(options["path"])
+        importer = ProductImporter(store, batch_size=options["batch_size"])
+        try:
+            with open(options["path"], "rb") as fileobj:
+                report = importer.run(fileobj, file_format)
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        for error in report["errors"]:
+            self.stderr.write(f"Linha {error['row']}: {error['errors']}")
+        if report["error_count"] > len(report["errors"]):
+            self.stderr.write(
+                f"... e mais {report['error_count'] - len(report['errors'])} erros."
+            )
+        if "file_error" in report:
+            self.stderr.write(self.style.ERROR(report["file_error"]))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{report['created']} produtos importados, "
+                f"{report['error_count']} linhas com erros."
+            )
+        )
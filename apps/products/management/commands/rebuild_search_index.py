@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from apps.products import search
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o índice de busca de produtos a partir da base de dados."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--database",
+            default=DEFAULT_DB_ALIAS,
+            help="Alias do banco de dados (padrão: default).",
+        )
+
+    def handle(self, *args, **options):
+        using = options["database"]
+        backend = search.get_backend(using)
+        if not backend.supports_index:
+            self.stdout.write(
+                self.style.WARNING(
+                    "O banco de dados não suporta busca full-text; nada a fazer."
+                )
+            )
+            return
+
+        search.rebuild_index(using)
+        self.stdout.write(self.style.SUCCESS("Índice de busca reconstruído."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from apps.products.models import Category
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula a contagem de produtos (product_count) das categorias "
+        "a partir da tabela de produtos."
+    )
+
+    def handle(self, *args, **options):
+        Category.refresh_product_counts()
+        self.stdout.write(self.style.SUCCESS("Contagens de produtos recalculadas."))
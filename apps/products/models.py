@@ -1,36 +1,84 @@
+from functools import partial
 from django.db import models
-from django.utils.text import slugify
+from django.utils import timezone
+from apps.core.slugs import save_with_slug
+from .utils import normalize_search_text
+
+
+def _with_search_key(kwargs):
+    """
+    Garante que search_key é gravado junto com o nome em save(update_fields=...).
+    """
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and "name" in update_fields:
+        kwargs["update_fields"] = {*update_fields, "search_key"}
+    return kwargs
 
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
     slug = models.SlugField(unique=True)
     image = models.ImageField(upload_to="category_img", blank=True, null=True)
+    # Manifesto das variantes da imagem (ver apps/core/images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Nome sem acentos e em minúsculas, usado na busca
+    search_key = models.CharField(
+        max_length=255, blank=True, db_index=True, editable=False
+    )
+    # Número de produtos de lojas ativas, mantido pelos signals (ver signals.py)
+    product_count = models.PositiveIntegerField(default=0, editable=False)
+    # Também atualizado quando um produto sai da categoria (ver signals.py)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def refresh_product_counts(cls, category_ids=None):
+        """
+        Recalcula product_count a partir da tabela de produtos.
+
+        Args:
+            category_ids: ids das categorias a recalcular (todas se None)
+        """
+        categories = cls.objects.all()
+        if category_ids is not None:
+            categories = categories.filter(pk__in=category_ids)
+        counts = dict(
+            Product.objects.filter(category__in=categories, store__is_active=True)
+            .values("category_id")
+            .annotate(count=models.Count("id"))
+            .values_list("category_id", "count")
+        )
+        now = timezone.now()
+        for pk in categories.values_list("pk", flat=True):
+            cls.objects.filter(pk=pk).update(
+                product_count=counts.get(pk, 0), updated_at=now
+            )
+
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)
-            unique_slug = self.slug
-            counter = 1
-            while Category.objects.filter(slug=unique_slug).exists():
-                unique_slug = f"{self.slug}-{counter}"
-                counter += 1
-            self.slug = unique_slug
-        super().save(*args, **kwargs)
+        self.search_key = normalize_search_text(self.name)[:255]
+        save = partial(super().save, *args, **_with_search_key(kwargs))
+        save_with_slug(self, save, self.name)
 
 
 class Product(models.Model):
     name = models.CharField(max_length=100)
+    # Nome sem acentos e em minúsculas, usado na busca
+    search_key = models.CharField(
+        max_length=255, blank=True, db_index=True, editable=False
+    )
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     slug = models.SlugField(unique=True, blank=True)
     image = models.ImageField(upload_to="product_img", blank=True, null=True)
+    # Manifesto das variantes da imagem (ver apps/core/images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     featured = models.BooleanField(default=False)
     in_stock = models.BooleanField(default=True)
     stock_quantity = models.PositiveIntegerField(default=1)
+    # Visualizações do detalhe, gravadas em lote (ver counters.py)
+    view_count = models.PositiveIntegerField(default=0, editable=False)
     category = models.ForeignKey(
         Category,
         related_name="products",
@@ -46,16 +94,61 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Índices das ordenações da paginação keyset
+            models.Index(fields=["-created_at", "-id"]),
+            models.Index(fields=["price", "id"]),
+            models.Index(fields=["-view_count", "-id"]),
+            models.Index(fields=["store", "-created_at", "-id"]),
+            models.Index(fields=["category", "-created_at", "-id"]),
+            # Filtros e facetas da listagem de produtos
+            models.Index(fields=["category", "price"]),
+            models.Index(fields=["store", "featured"]),
+            models.Index(fields=["in_stock", "created_at"]),
+        ]
+
     def __str__(self):
         return self.name
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            self.slug = slugify(self.name)
-            unique_slug = self.slug
-            counter = 1
-            while Product.objects.filter(slug=unique_slug).exists():
-                unique_slug = f"{self.slug}-{counter}"
-                counter += 1
-            self.slug = unique_slug
-        super().save(*args, **kwargs)
+        self.search_key = normalize_search_text(self.name)[:255]
+        save = partial(super().save, *args, **_with_search_key(kwargs))
+        save_with_slug(self, save, self.name)
+
+
+class ProductCooccurrence(models.Model):
+    """
+    Número de pedidos em que `product` e `other` foram comprados juntos.
+
+    Tabela esparsa (só pares que ocorreram), mantida nos dois sentidos e
+    atualizada de forma incremental (ver recommendations.py).
+    """
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="cooccurrences"
+    )
+    other = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="cooccurring"
+    )
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "other"], name="unique_product_cooccurrence"
+            )
+        ]
+        indexes = [
+            # Recomendações de um produto: uma leitura ordenada do índice
+            models.Index(fields=["product", "-count", "other"]),
+        ]
+
+
+class CooccurrenceWatermark(models.Model):
+    """
+    Último pedido processado na tabela de coocorrências (uma só linha).
+    """
+
+    last_order_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,272 @@
+import base64
+import binascii
+import json
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class BaseCursorPagination:
+    """
+    Base comum às paginações do catálogo: tamanho de página limitado,
+    cursores opacos e o formato de resposta {next, previous, results}.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    invalid_cursor_message = "Cursor inválido."
+
+    def get_page_size(self, request):
+        default = settings.REST_FRAMEWORK.get("PAGE_SIZE", 20)
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param))
+        except (TypeError, ValueError):
+            return default
+        if page_size < 1:
+            return default
+        return min(page_size, self.max_page_size)
+
+    def get_paginated_data(self, data):
+        return {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def encode_payload(self, payload):
+        raw = json.dumps(payload, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_payload(self, request):
+        """
+        Retorna o conteúdo do cursor ou None quando não foi fornecido.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (binascii.Error, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(payload, dict):
+            raise NotFound(self.invalid_cursor_message)
+        return payload
+
+    def cursor_link(self, payload, **params):
+        url = self.request.build_absolute_uri()
+        for key, value in params.items():
+            url = replace_query_param(url, key, value)
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_payload(payload)
+        )
+
+
+class KeysetPagination(BaseCursorPagination):
+    """
+    Paginação por chave (keyset) para as listagens do catálogo.
+
+    Em vez de OFFSET, cada página filtra a partir da posição (valor, id) do
+    último item entregue, pelo que o custo de cada pedido é o mesmo na
+    primeira página ou na milésima. O cursor devolvido ao cliente é opaco.
+
+    Parâmetros de query:
+    - cursor: cursor devolvido em "next"/"previous"
+    - page_size: tamanho da página (limitado a max_page_size)
+    - ordering: uma das chaves de `orderings`
+    """
+
+    ordering_query_param = "ordering"
+
+    # Cada ordenação termina em "id" para garantir uma posição única
+    orderings = {
+        "-created_at": ("-created_at", "-id"),
+        "created_at": ("created_at", "id"),
+        "-price": ("-price", "-id"),
+        "price": ("price", "id"),
+        # Mais vistos primeiro (ver counters.py)
+        "popular": ("-view_count", "-id"),
+    }
+    default_ordering = "-created_at"
+
+    def get_ordering_key(self, request):
+        ordering = request.query_params.get(self.ordering_query_param)
+        if ordering in self.orderings:
+            return ordering
+        return self.default_ordering
+
+    def paginate_queryset(self, queryset, request):
+        """
+        Retorna a lista de objetos da página pedida.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering_key = self.get_ordering_key(request)
+        self.ordering = self.orderings[self.ordering_key]
+        self.model = queryset.model
+
+        position = self.decode_cursor(request)
+        reverse = bool(position and position["r"])
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(self._invert(field) for field in ordering)
+
+        queryset = queryset.order_by(*ordering)
+        # Com only() ou values(), os campos da ordenação têm de ser carregados
+        # para o cursor
+        names = [*map(self._field_name, ordering), "id"]
+        fields, defer = queryset.query.deferred_loading
+        if queryset._fields:
+            queryset = queryset.values(*dict.fromkeys([*queryset._fields, *names]))
+        elif fields and not defer:
+            queryset = queryset.only(*fields, *names)
+        if position:
+            queryset = queryset.filter(self._after(ordering, position))
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.page = results
+        return results
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            url = self.request.build_absolute_uri()
+            return remove_query_param(url, self.cursor_query_param)
+        return self._link(self.page[0], reverse=True)
+
+    def encode_cursor(self, item, reverse):
+        field = self._field_name(self.ordering[0])
+        value = self._value(item, field)
+        return {
+            "o": self.ordering_key,
+            "v": None if value is None else self._to_text(value),
+            "id": self._value(item, "id"),
+            "r": 1 if reverse else 0,
+        }
+
+    def decode_cursor(self, request):
+        payload = self.decode_payload(request)
+        if payload is None:
+            return None
+
+        try:
+            if payload["o"] != self.ordering_key:
+                raise ValueError
+            field = self.model._meta.get_field(self._field_name(self.ordering[0]))
+            return {
+                "v": field.to_python(payload["v"]),
+                "id": int(payload["id"]),
+                "r": bool(payload.get("r")),
+            }
+        except (DjangoValidationError, KeyError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _link(self, item, reverse):
+        return self.cursor_link(
+            self.encode_cursor(item, reverse),
+            **{self.ordering_query_param: self.ordering_key},
+        )
+
+    def _after(self, ordering, position):
+        """
+        Constrói o filtro "depois de (valor, id)" para a ordenação dada.
+        """
+        first, tiebreaker = ordering
+        field = self._field_name(first)
+        op = "lt" if first.startswith("-") else "gt"
+        id_op = "lt" if tiebreaker.startswith("-") else "gt"
+        return Q(**{f"{field}__{op}": position["v"]}) | Q(
+            **{field: position["v"], f"id__{id_op}": position["id"]}
+        )
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    @staticmethod
+    def _field_name(field):
+        return field.lstrip("-")
+
+    @staticmethod
+    def _value(item, field):
+        if isinstance(item, dict):
+            return item[field]
+        return getattr(item, field)
+
+    @staticmethod
+    def _to_text(value):
+        if hasattr(value, "isoformat"):
+            return value.isoformat()
+        return str(value)
+
+
+class RankedPagination(BaseCursorPagination):
+    """
+    Paginação para resultados ordenados por relevância (busca).
+
+    A relevância não é uma coluna da tabela, por isso o cursor guarda a
+    posição no ranking devolvido pelo índice de busca.
+    """
+
+    def paginate(self, fetch, request):
+        """
+        Retorna a página de resultados.
+
+        Args:
+            fetch: função fetch(offset, limit) que devolve a lista ordenada
+            request: objeto de requisição
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        payload = self.decode_payload(request) or {"p": 0}
+        try:
+            self.offset = int(payload["p"])
+        except (KeyError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if self.offset < 0:
+            raise NotFound(self.invalid_cursor_message)
+
+        results = list(fetch(self.offset, self.page_size + 1))
+        self.has_next = len(results) > self.page_size
+        return results[: self.page_size]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.cursor_link({"p": self.offset + self.page_size})
+
+    def get_previous_link(self):
+        if self.offset <= 0:
+            return None
+        previous = max(self.offset - self.page_size, 0)
+        if previous == 0:
+            url = self.request.build_absolute_uri()
+            return remove_query_param(url, self.cursor_query_param)
+        return self.cursor_link({"p": previous})
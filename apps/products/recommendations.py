@@ -0,0 +1,201 @@
+"""
+Recomendações "comprados juntos" a partir de uma tabela de coocorrências.
+
+ProductCooccurrence guarda, para cada par de produtos comprados no mesmo
+pedido, o número de pedidos em que isso aconteceu (nos dois sentidos). A
+tabela é atualizada de forma incremental por build_cooccurrences(): só os
+pedidos com id acima da marca (CooccurrenceWatermark) são lidos, em lotes
+de `chunk_size` pedidos, e cada lote soma os seus pares e avança a marca na
+mesma transação. Corre periodicamente com o comando build_bought_together.
+
+Pedidos cancelados ou reembolsados não contam. Quando um pedido já
+processado deixa de contar (ou volta a contar) ou é excluído, os seus pares
+são subtraídos (ou somados) por adjust_order(), chamado pelos signals de
+Order (ver signals.py).
+
+Servir as recomendações de um produto é uma leitura do índice
+(product, -count) da tabela, sem agregação no pedido.
+"""
+
+from collections import Counter, defaultdict
+from datetime import timedelta
+from itertools import permutations
+from django.db import transaction
+from django.utils import timezone
+from apps.orders.models import Order, OrderItem
+from .models import CooccurrenceWatermark, Product, ProductCooccurrence
+
+DEFAULT_LIMIT = 6
+MAX_LIMIT = 20
+
+# Pedidos por lote
+CHUNK_SIZE = 1000
+
+# Produtos distintos considerados por pedido (os pares crescem com o
+# quadrado; pedidos enormes dizem pouco sobre afinidade entre produtos)
+MAX_ORDER_PRODUCTS = 50
+
+# Pedidos mais recentes ficam para a execução seguinte, para não saltar
+# pedidos com id menor cuja transação ainda não terminou
+SETTLE_DELAY = timedelta(minutes=5)
+
+# Produtos por consulta ao ler as linhas existentes
+LOOKUP_BATCH_SIZE = 500
+
+
+def is_counted(order):
+    """
+    Indica se o pedido entra nas coocorrências (não cancelado nem
+    reembolsado).
+    """
+    return order.status != "cancelled" and order.payment_status != "refunded"
+
+
+def pair_counts(items):
+    """
+    Conta os pares de produtos comprados juntos.
+
+    Args:
+        items: Iterável de (id do pedido, id do produto)
+
+    Returns:
+        Counter: {(produto, outro): número de pedidos}
+    """
+    orders = defaultdict(set)
+    for order_id, product_id in items:
+        orders[order_id].add(product_id)
+    counts = Counter()
+    for products in orders.values():
+        products = sorted(products)[:MAX_ORDER_PRODUCTS]
+        counts.update(permutations(products, 2))
+    return counts
+
+
+def apply_counts(counts):
+    """
+    Soma os pares à tabela: atualiza as linhas existentes e cria as novas.
+    Contagens negativas subtraem; linhas que chegam a zero são apagadas.
+    """
+    by_product = defaultdict(dict)
+    for (product_id, other_id), n in counts.items():
+        by_product[product_id][other_id] = n
+
+    existing = []
+    product_ids = list(by_product)
+    for start in range(0, len(product_ids), LOOKUP_BATCH_SIZE):
+        batch = product_ids[start : start + LOOKUP_BATCH_SIZE]
+        others = {other for pk in batch for other in by_product[pk]}
+        for row in ProductCooccurrence.objects.filter(
+            product_id__in=batch, other_id__in=others
+        ):
+            n = by_product[row.product_id].pop(row.other_id, None)
+            if n is not None:
+                row.count = max(row.count + n, 0)
+                existing.append(row)
+
+    ProductCooccurrence.objects.bulk_update(
+        [row for row in existing if row.count],
+        ["count"],
+        batch_size=LOOKUP_BATCH_SIZE,
+    )
+    empty = [row.pk for row in existing if not row.count]
+    if empty:
+        ProductCooccurrence.objects.filter(pk__in=empty).delete()
+    ProductCooccurrence.objects.bulk_create(
+        [
+            ProductCooccurrence(product_id=product_id, other_id=other_id, count=n)
+            for product_id, others in by_product.items()
+            for other_id, n in others.items()
+            if n > 0
+        ],
+        batch_size=LOOKUP_BATCH_SIZE,
+    )
+
+
+def build_cooccurrences(chunk_size=CHUNK_SIZE, until=None):
+    """
+    Processa os pedidos novos desde a última execução.
+
+    Args:
+        chunk_size: Pedidos por lote (uma transação cada)
+        until: Só processa pedidos criados antes deste instante
+            (padrão: agora menos SETTLE_DELAY)
+
+    Returns:
+        int: Número de pedidos processados
+    """
+    cutoff = until or timezone.now() - SETTLE_DELAY
+    CooccurrenceWatermark.objects.get_or_create(pk=1)
+    processed = 0
+    while True:
+        with transaction.atomic():
+            # O bloqueio da marca impede duas execuções simultâneas de
+            # contarem os mesmos pedidos
+            watermark = CooccurrenceWatermark.objects.select_for_update().get(pk=1)
+            order_ids = list(
+                Order.objects.filter(
+                    pk__gt=watermark.last_order_id, created_at__lt=cutoff
+                )
+                .order_by("pk")
+                .values_list("pk", flat=True)[:chunk_size]
+            )
+            if not order_ids:
+                return processed
+
+            # Pedidos cancelados ou reembolsados avançam a marca mas não
+            # contam (ver is_counted)
+            items = (
+                OrderItem.objects.filter(order_id__in=order_ids)
+                .exclude(order__status="cancelled")
+                .exclude(order__payment_status="refunded")
+            )
+            apply_counts(pair_counts(items.values_list("order_id", "product_id")))
+            watermark.last_order_id = order_ids[-1]
+            watermark.save(update_fields=["last_order_id", "updated_at"])
+
+        processed += len(order_ids)
+        if len(order_ids) < chunk_size:
+            return processed
+
+
+def adjust_order(order_id, sign):
+    """
+    Soma (sign=1) ou subtrai (sign=-1) os pares de um pedido que passou a
+    contar (ou deixou de contar). Pedidos acima da marca são ignorados:
+    build_cooccurrences lê-os depois com o estado atual.
+
+    Deve correr na mesma transação que grava o novo estado do pedido: o
+    bloqueio da marca garante que build_cooccurrences viu o pedido ou com o
+    estado anterior (e a marca já o inclui) ou com o novo.
+    """
+    with transaction.atomic():
+        watermark = (
+            CooccurrenceWatermark.objects.select_for_update().filter(pk=1).first()
+        )
+        if watermark is None or order_id > watermark.last_order_id:
+            return
+        items = OrderItem.objects.filter(order_id=order_id)
+        counts = pair_counts(items.values_list("order_id", "product_id"))
+        apply_counts(Counter({pair: sign * n for pair, n in counts.items()}))
+
+
+def rebuild_cooccurrences(chunk_size=CHUNK_SIZE, until=None):
+    """
+    Apaga a tabela e processa todos os pedidos de novo.
+    """
+    with transaction.atomic():
+        ProductCooccurrence.objects.all().delete()
+        CooccurrenceWatermark.objects.update_or_create(
+            pk=1, defaults={"last_order_id": 0}
+        )
+    return build_cooccurrences(chunk_size, until)
+
+
+def bought_together(product_id):
+    """
+    Produtos (de lojas ativas) mais comprados com o produto `product_id`,
+    por número de pedidos em comum.
+    """
+    return Product.objects.filter(
+        cooccurring__product_id=product_id, store__is_active=True
+    ).order_by("-cooccurring__count", "id")
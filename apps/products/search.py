@@ -0,0 +1,302 @@
+"""
+Motor de busca de produtos baseado em índice invertido.
+
+- SQLite: tabela virtual FTS5 (tokenizer unicode61 sem acentos), ranking bm25
+- PostgreSQL: tabela auxiliar com coluna tsvector + índice GIN, ranking ts_rank
+- Outros bancos (ou SQLite sem FTS5): varredura da tabela de produtos
+
+Tanto os documentos como os termos de busca passam por normalize_search_text
+(sem acentos, casefold), pelo que "eletronicos" encontra "Eletrônicos" em
+qualquer backend.
+
+O índice é mantido em sincronia pelos signals de Product e Category
+(ver signals.py) e pode ser reconstruído com `manage.py rebuild_search_index`.
+"""
+
+import re
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+from .models import Product
+from .utils import normalize_search_text
+
+# Tamanho dos lotes de escrita no índice
+INDEX_BATCH_SIZE = 500
+
+# Pesos das colunas no ranking: nome, descrição, categoria
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+CATEGORY_WEIGHT = 5.0
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+_backends = {}
+
+
+def tokenize(query):
+    """
+    Divide o termo de busca em tokens normalizados, seguros para as sintaxes
+    FTS5 e tsquery.
+    """
+    return TOKEN_RE.findall(normalize_search_text(query))
+
+
+def document_rows(queryset):
+    """
+    Projeção mínima usada para indexar produtos, sem instanciar modelos.
+    Retorna tuplas (id, nome, descrição, categoria) já normalizadas.
+    """
+    rows = queryset.values_list(
+        "id", "search_key", "description", "category__search_key"
+    ).iterator(chunk_size=INDEX_BATCH_SIZE)
+    for pk, name, description, category in rows:
+        yield pk, name, normalize_search_text(description), category or ""
+
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= INDEX_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class ScanSearchBackend:
+    """
+    Busca sem índice full-text, usada quando o banco não suporta FTS.
+    Compara prefixos de palavras nas chaves normalizadas (search_key) do
+    produto e da categoria; a descrição continua a ser comparada por icontains.
+
+    É uma varredura completa: prefixos de palavras no meio do nome
+    (LIKE '% termo%') e o icontains da descrição não usam o índice de
+    search_key, por isso o custo cresce com o catálogo. Serve apenas como
+    último recurso; em produção use PostgreSQL ou SQLite com FTS5.
+    """
+
+    supports_index = False
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+
+    def ensure_index(self):
+        pass
+
+    def index_rows(self, rows):
+        pass
+
+    def remove(self, product_ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def search(self, query, offset, limit):
+        products = Product.objects.using(self.using).filter(store__is_active=True)
+        for token in tokenize(query):
+            products = products.filter(
+                Q(search_key__startswith=token)
+                | Q(search_key__contains=f" {token}")
+                | Q(category__search_key__startswith=token)
+                | Q(category__search_key__contains=f" {token}")
+                | Q(description__icontains=token)
+            )
+        ids = products.order_by("-created_at", "-id").values_list("id", flat=True)
+        return list(ids[offset : offset + limit])
+
+
+class SQLiteSearchBackend(ScanSearchBackend):
+    """
+    Índice FTS5 com o rowid igual ao id do produto.
+    """
+
+    supports_index = True
+    table = "products_product_fts"
+
+    def ensure_index(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+                "USING fts5(name, description, category, "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+
+    def index_rows(self, rows):
+        with connections[self.using].cursor() as cursor:
+            for batch in _batches(rows):
+                self._delete(cursor, [row[0] for row in batch])
+                cursor.executemany(
+                    f"INSERT INTO {self.table} (rowid, name, description, category) "
+                    "VALUES (%s, %s, %s, %s)",
+                    batch,
+                )
+
+    def remove(self, product_ids):
+        with connections[self.using].cursor() as cursor:
+            self._delete(cursor, list(product_ids))
+
+    def clear(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+
+    def _delete(self, cursor, product_ids):
+        if not product_ids:
+            return
+        placeholders = ", ".join(["%s"] * len(product_ids))
+        cursor.execute(
+            f"DELETE FROM {self.table} WHERE rowid IN ({placeholders})", product_ids
+        )
+
+    def search(self, query, offset, limit):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        match = " ".join(f'"{token}"*' for token in tokens)
+        product_table = Product._meta.db_table
+        store_table = Product._meta.get_field("store").related_model._meta.db_table
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"SELECT f.rowid FROM {self.table} f "
+                f"JOIN {product_table} p ON p.id = f.rowid "
+                f"JOIN {store_table} s ON s.id = p.store_id "
+                f"WHERE {self.table} MATCH %s AND s.is_active "
+                f"ORDER BY bm25({self.table}, %s, %s, %s), f.rowid DESC "
+                "LIMIT %s OFFSET %s",
+                [
+                    match,
+                    NAME_WEIGHT,
+                    DESCRIPTION_WEIGHT,
+                    CATEGORY_WEIGHT,
+                    limit,
+                    offset,
+                ],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgreSQLSearchBackend(ScanSearchBackend):
+    """
+    Índice tsvector (com pesos A/B/C) numa tabela auxiliar com índice GIN.
+    """
+
+    supports_index = True
+    table = "products_product_search"
+    config = "portuguese"
+
+    def ensure_index(self):
+        product_table = Product._meta.db_table
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                f"product_id bigint PRIMARY KEY REFERENCES {product_table} (id) "
+                "ON DELETE CASCADE, "
+                "document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_document_gin "
+                f"ON {self.table} USING GIN (document)"
+            )
+
+    def index_rows(self, rows):
+        with connections[self.using].cursor() as cursor:
+            for batch in _batches(rows):
+                cursor.executemany(
+                    f"INSERT INTO {self.table} (product_id, document) VALUES (%s, "
+                    f"setweight(to_tsvector('{self.config}', %s), 'A') || "
+                    f"setweight(to_tsvector('{self.config}', %s), 'B') || "
+                    f"setweight(to_tsvector('{self.config}', %s), 'C')) "
+                    "ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+                    [(pk, name, cat, desc) for pk, name, desc, cat in batch],
+                )
+
+    def remove(self, product_ids):
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE product_id = ANY(%s)", [product_ids]
+            )
+
+    def clear(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f"TRUNCATE {self.table}")
+
+    def search(self, query, offset, limit):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        tsquery = " & ".join(f"{token}:*" for token in tokens)
+        product_table = Product._meta.db_table
+        store_table = Product._meta.get_field("store").related_model._meta.db_table
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"SELECT d.product_id FROM {self.table} d "
+                f"JOIN {product_table} p ON p.id = d.product_id "
+                f"JOIN {store_table} s ON s.id = p.store_id, "
+                f"to_tsquery('{self.config}', %s) q "
+                "WHERE d.document @@ q AND s.is_active "
+                "ORDER BY ts_rank(d.document, q) DESC, d.product_id DESC "
+                "LIMIT %s OFFSET %s",
+                [tsquery, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+def _sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def get_backend(using=DEFAULT_DB_ALIAS):
+    """
+    Retorna o backend de busca adequado ao banco de dados configurado.
+    """
+    if using not in _backends:
+        connection = connections[using]
+        if connection.vendor == "postgresql":
+            backend = PostgreSQLSearchBackend(using)
+        elif connection.vendor == "sqlite" and _sqlite_has_fts5(connection):
+            backend = SQLiteSearchBackend(using)
+        else:
+            backend = ScanSearchBackend(using)
+        _backends[using] = backend
+    return _backends[using]
+
+
+def index_products(queryset):
+    """
+    Indexa (ou reindexa) os produtos do queryset, em lotes.
+    """
+    backend = get_backend(queryset.db)
+    if backend.supports_index:
+        backend.index_rows(document_rows(queryset))
+
+
+def remove_products(product_ids, using=DEFAULT_DB_ALIAS):
+    """
+    Remove produtos do índice.
+    """
+    get_backend(using).remove(product_ids)
+
+
+def rebuild_index(using=DEFAULT_DB_ALIAS):
+    """
+    Reconstrói o índice completo a partir da tabela de produtos.
+    """
+    backend = get_backend(using)
+    backend.ensure_index()
+    backend.clear()
+    index_products(Product.objects.using(using).all())
+
+
+def search_products(query, offset, limit, using=DEFAULT_DB_ALIAS):
+    """
+    Retorna os ids dos produtos de lojas ativas que correspondem à busca,
+    ordenados por relevância.
+    """
+    return get_backend(using).search(query, offset, limit)
@@ -1,8 +1,11 @@
 from rest_framework import serializers
+from apps.core.images import SrcsetField
+from apps.core.serializers import QuerysetShapingMixin
 from .models import Category, Product
+from .pagination import KeysetPagination
 
 
-class ProductListSerializer(serializers.ModelSerializer):
+class ProductListSerializer(QuerysetShapingMixin, serializers.ModelSerializer):
     """
     Serializer para listagem de produtos.
     Inclui informações básicas e o nome da loja.
@@ -11,13 +14,37 @@ class ProductListSerializer(serializers.ModelSerializer):
     store_name = serializers.CharField(
         source="store.name", read_only=True, help_text="Nome da loja"
     )
+    image_srcset = SrcsetField(
+        source="image_variants",
+        help_text="URLs das variantes da imagem por tipo e largura",
+    )
 
     class Meta:
         model = Product
-        fields = ["id", "name", "slug", "image", "price", "store_name", "in_stock"]
+        fields = [
+            "id",
+            "name",
+            "slug",
+            "image",
+            "image_srcset",
+            "price",
+            "store_name",
+            "in_stock",
+        ]
+        select_related_fields = ["store"]
+        only_fields = [
+            "id",
+            "name",
+            "slug",
+            "image",
+            "image_variants",
+            "price",
+            "in_stock",
+            "store__name",
+        ]
 
 
-class ProductDetailSerializer(serializers.ModelSerializer):
+class ProductDetailSerializer(QuerysetShapingMixin, serializers.ModelSerializer):
     """
     Serializer para detalhes de produtos.
     Inclui todas as informações do produto.
@@ -27,6 +54,10 @@ class ProductDetailSerializer(serializers.ModelSerializer):
     category = serializers.StringRelatedField(
         read_only=True, help_text="Nome da categoria"
     )
+    image_srcset = SrcsetField(
+        source="image_variants",
+        help_text="URLs das variantes da imagem por tipo e largura",
+    )
 
     class Meta:
         model = Product
@@ -36,6 +67,7 @@ class ProductDetailSerializer(serializers.ModelSerializer):
             "slug",
             "description",
             "image",
+            "image_srcset",
             "price",
             "store",
             "category",
@@ -43,6 +75,7 @@ class ProductDetailSerializer(serializers.ModelSerializer):
             "stock_quantity",
             "created_at",
         ]
+        select_related_fields = ["store", "category"]
 
 
 class CategoryListSerializer(serializers.ModelSerializer):
@@ -51,24 +84,51 @@ class CategoryListSerializer(serializers.ModelSerializer):
     Inclui informações básicas da categoria.
     """
 
+    image_srcset = SrcsetField(
+        source="image_variants",
+        help_text="URLs das variantes da imagem por tipo e largura",
+    )
+
     class Meta:
         model = Category
-        fields = ["id", "name", "image", "slug"]
+        fields = ["id", "name", "image", "image_srcset", "slug"]
 
 
 class CategoryDetailSerializer(serializers.ModelSerializer):
     """
     Serializer para detalhes de categorias.
-    Inclui a lista de produtos da categoria.
+    Inclui a contagem pré-calculada de produtos e uma página dos produtos de
+    lojas ativas (ver KeysetPagination), lida a partir do request no contexto.
     """
 
-    products = ProductListSerializer(
-        many=True, read_only=True, help_text="Produtos da categoria"
+    products = serializers.SerializerMethodField(
+        help_text="Página de produtos da categoria"
+    )
+    image_srcset = SrcsetField(
+        source="image_variants",
+        help_text="URLs das variantes da imagem por tipo e largura",
     )
 
     class Meta:
         model = Category
-        fields = ["id", "name", "image", "products"]
+        fields = ["id", "name", "image", "image_srcset", "product_count", "products"]
+
+    def get_products(self, category):
+        """
+        Retorna a página de produtos pedida em request (cursor, page_size,
+        ordering), com o custo de uma página independentemente do tamanho
+        da categoria.
+        """
+        request = self.context.get("request")
+        if request is None:
+            return None
+
+        products = ProductListSerializer.optimize_queryset(
+            Product.objects.filter(category=category, store__is_active=True)
+        )
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(products, request)
+        return paginator.get_paginated_data(ProductListSerializer(page, many=True).data)
 
 
 class ProductCreateSerializer(serializers.ModelSerializer):
@@ -102,3 +162,53 @@ class ProductCreateSerializer(serializers.ModelSerializer):
 
         validated_data["store"] = user.store
         return super().create(validated_data)
+
+
+class ProductImportSerializer(serializers.ModelSerializer):
+    """
+    Validação de uma linha da importação.
+    A categoria é indicada pelo slug e resolvida por lote.
+    """
+
+    category = serializers.CharField(
+        required=False, allow_blank=True, help_text="Slug da categoria"
+    )
+
+    class Meta:
+        model = Product
+        fields = [
+            "name",
+            "description",
+            "price",
+            "featured",
+            "in_stock",
+            "stock_quantity",
+            "category",
+        ]
+
+
+class ProductStockPriceSerializer(serializers.Serializer):
+    """
+    Serializer de uma entrada da atualização de preço e estoque em lote.
+    O produto é indicado pelo id ou pelo slug.
+    """
+
+    UPDATE_FIELDS = ["price", "stock_quantity", "in_stock"]
+
+    id = serializers.IntegerField(required=False, help_text="ID do produto")
+    slug = serializers.SlugField(required=False, help_text="Slug do produto")
+    price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, min_value=0, required=False
+    )
+    stock_quantity = serializers.IntegerField(min_value=0, required=False)
+    in_stock = serializers.BooleanField(required=False)
+
+    def validate(self, attrs):
+        """
+        Exige a identificação do produto e pelo menos um campo a alterar.
+        """
+        if "id" not in attrs and "slug" not in attrs:
+            raise serializers.ValidationError("Informe o id ou o slug do produto.")
+        if not any(field in attrs for field in self.UPDATE_FIELDS):
+            raise serializers.ValidationError("Nenhum campo para atualizar.")
+        return attrs
@@ -0,0 +1,332 @@
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+from apps.accounts.models import Store
+from apps.core import images
+from apps.orders.models import Order
+from . import cache as catalog_cache
+from . import recommendations, search
+from .models import Category, Product
+
+
+def product_cache_keys(queryset):
+    """
+    Chaves de versão do cache que dependem dos produtos do queryset.
+    """
+    keys = [catalog_cache.FEATURED, catalog_cache.NAMES]
+    for slug, store_slug, category_slug in queryset.values_list(
+        "slug", "store__slug", "category__slug"
+    ):
+        keys.append(catalog_cache.product_key(slug))
+        keys.append(catalog_cache.store_key(store_slug))
+        if category_slug:
+            keys.append(catalog_cache.category_key(category_slug))
+    return keys
+
+
+# Enviado com product_ids quando o preço de produtos muda (em save() ou em
+# lote, ver bulk.py), para quem guarda totais calculados com o preço
+prices_changed = Signal()
+
+# Variantes das imagens geradas após o upload (ver apps/core/images.py)
+images.register(Product, "image", "image_variants")
+images.register(Category, "image", "image_variants")
+images.register(Store, "logo", "logo_variants")
+
+
+def touch_containers(store_ids=(), category_ids=()):
+    """
+    Atualiza updated_at das lojas e categorias cujos produtos mudaram
+    (criados, alterados, movidos ou removidos), para que os validadores das
+    suas listagens se calculem só a partir da própria linha.
+    """
+    now = timezone.now()
+    store_ids = {pk for pk in store_ids if pk}
+    category_ids = {pk for pk in category_ids if pk}
+    if store_ids:
+        Store.objects.filter(pk__in=store_ids).update(updated_at=now)
+    if category_ids:
+        Category.objects.filter(pk__in=category_ids).update(updated_at=now)
+
+
+def adjust_product_count(product, delta):
+    """
+    Soma `delta` ao product_count da categoria do produto, se o produto
+    pertence a uma loja ativa.
+    """
+    if not product.category_id or not product.store.is_active:
+        return
+    categories = Category.objects.filter(pk=product.category_id)
+    if delta < 0:
+        categories = categories.filter(product_count__gte=-delta)
+    categories.update(product_count=F("product_count") + delta)
+
+
+@receiver(post_migrate)
+def create_search_index(sender, using, **kwargs):
+    """
+    Cria o índice de busca após as migrações da app de produtos.
+
+    Args:
+        sender: Configuração da app que terminou de migrar
+        using: Alias do banco de dados
+    """
+    if sender.name == "apps.products":
+        search.get_backend(using).ensure_index()
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_dependencies(sender, instance, **kwargs):
+    """
+    Guarda as dependências de cache anteriores do produto (loja, categoria e
+    slug podem mudar no save).
+    """
+    instance._cache_previous = []
+    instance._previous_containers = None
+    instance._previous_price = None
+    if instance.pk is not None:
+        previous = Product.objects.filter(pk=instance.pk)
+        instance._cache_previous = product_cache_keys(previous)
+        row = previous.values_list("store_id", "category_id", "price").first()
+        if row:
+            instance._previous_containers = row[:2]
+            instance._previous_price = row[2]
+
+
+@receiver(post_save, sender=Product)
+def sync_product_on_save(sender, instance, created, using, **kwargs):
+    """
+    Atualiza o produto no índice de busca, a contagem de produtos das
+    categorias e invalida o cache do catálogo quando é salvo.
+
+    Args:
+        sender: Modelo que enviou o sinal (Product)
+        instance: Instância do modelo que foi salva
+    """
+    product = Product.objects.using(using).filter(pk=instance.pk)
+    search.index_products(product)
+
+    store_ids = [instance.store_id]
+    category_ids = [instance.category_id]
+    previous = getattr(instance, "_previous_containers", None)
+    if created:
+        adjust_product_count(instance, 1)
+    elif previous and previous != (instance.store_id, instance.category_id):
+        store_ids.append(previous[0])
+        category_ids.append(previous[1])
+        Category.refresh_product_counts([pk for pk in category_ids if pk])
+    touch_containers(store_ids, category_ids)
+    catalog_cache.invalidate(
+        getattr(instance, "_cache_previous", []) + product_cache_keys(product)
+    )
+    previous_price = getattr(instance, "_previous_price", None)
+    if previous_price is not None and previous_price != instance.price:
+        prices_changed.send(sender=Product, product_ids=[instance.pk])
+
+
+@receiver(pre_delete, sender=Product)
+def remember_deleted_product_dependencies(sender, instance, **kwargs):
+    """
+    Guarda as dependências de cache do produto antes da exclusão.
+    """
+    instance._cache_previous = product_cache_keys(
+        Product.objects.filter(pk=instance.pk)
+    )
+
+
+@receiver(post_delete, sender=Product)
+def sync_product_on_delete(sender, instance, using, **kwargs):
+    """
+    Remove o produto do índice de busca, atualiza a contagem de produtos da
+    categoria e invalida o cache do catálogo quando é excluído.
+
+    Args:
+        sender: Modelo que enviou o sinal (Product)
+        instance: Instância do modelo que foi excluída
+    """
+    search.remove_products([instance.pk], using=using)
+    adjust_product_count(instance, -1)
+    touch_containers([instance.store_id], [instance.category_id])
+    catalog_cache.invalidate(getattr(instance, "_cache_previous", []))
+
+
+@receiver(pre_save, sender=Category)
+def detect_category_rename(sender, instance, **kwargs):
+    """
+    Marca a categoria quando o nome muda, para reindexar os seus produtos.
+    """
+    instance._search_renamed = False
+    instance._previous_slug = None
+    if instance.pk is None:
+        return
+    previous = Category.objects.filter(pk=instance.pk).values("name", "slug").first()
+    if previous:
+        instance._search_renamed = previous["name"] != instance.name
+        instance._previous_slug = previous["slug"]
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, **kwargs):
+    """
+    Reindexa os produtos de uma categoria renomeada e invalida o cache.
+
+    Args:
+        sender: Modelo que enviou o sinal (Category)
+        instance: Instância do modelo que foi salva
+    """
+    if not created and getattr(instance, "_search_renamed", False):
+        search.index_products(instance.products.all())
+
+    previous_slug = getattr(instance, "_previous_slug", None)
+    catalog_cache.invalidate(
+        [
+            catalog_cache.CATEGORIES,
+            catalog_cache.NAMES,
+            catalog_cache.category_key(instance.slug),
+            previous_slug and catalog_cache.category_key(previous_slug),
+        ]
+    )
+
+
+@receiver(post_delete, sender=Category)
+def invalidate_deleted_category(sender, instance, **kwargs):
+    """
+    Invalida o cache quando uma categoria é excluída.
+    """
+    catalog_cache.invalidate(
+        [
+            catalog_cache.CATEGORIES,
+            catalog_cache.NAMES,
+            catalog_cache.category_key(instance.slug),
+        ]
+    )
+
+
+@receiver(pre_save, sender=Store)
+def remember_store_slug(sender, instance, **kwargs):
+    """
+    Guarda o slug e o estado (ativa/inativa) anteriores da loja.
+    """
+    instance._previous_slug = None
+    instance._previous_is_active = None
+    if instance.pk is not None:
+        previous = (
+            Store.objects.filter(pk=instance.pk)
+            .values_list("slug", "is_active")
+            .first()
+        )
+        if previous:
+            instance._previous_slug, instance._previous_is_active = previous
+
+
+@receiver(post_save, sender=Store)
+def sync_store_categories(sender, instance, created, **kwargs):
+    """
+    Marca como alteradas as categorias onde a loja tem produtos (o nome da
+    loja aparece nas listagens) e recalcula a contagem de produtos quando a
+    loja é ativada ou desativada.
+    """
+    if created:
+        return
+    category_ids = Product.objects.filter(store=instance).values("category_id")
+    previous = getattr(instance, "_previous_is_active", None)
+    if previous is not None and previous != instance.is_active:
+        Category.refresh_product_counts(category_ids)
+    else:
+        Category.objects.filter(pk__in=category_ids).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Store)
+@receiver(post_delete, sender=Store)
+def invalidate_store(sender, instance, **kwargs):
+    """
+    Invalida o cache de uma loja, dos destaques e das categorias onde a loja
+    tem produtos (ativar/desativar a loja muda essas listagens).
+
+    Args:
+        sender: Modelo que enviou o sinal (Store)
+        instance: Instância do modelo que foi salva ou excluída
+    """
+    previous_slug = getattr(instance, "_previous_slug", None)
+    keys = [
+        catalog_cache.FEATURED,
+        catalog_cache.NAMES,
+        catalog_cache.store_key(instance.slug),
+        previous_slug and catalog_cache.store_key(previous_slug),
+    ]
+    category_slugs = (
+        Category.objects.filter(products__store_id=instance.pk)
+        .values_list("slug", flat=True)
+        .distinct()
+    )
+    keys.extend(catalog_cache.category_key(slug) for slug in category_slugs)
+    catalog_cache.invalidate(keys)
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_counted(sender, instance, **kwargs):
+    """
+    Guarda se o pedido contava nas coocorrências antes do save.
+    """
+    instance._previously_counted = None
+    if instance.pk is not None:
+        previous = (
+            Order.objects.filter(pk=instance.pk)
+            .only("status", "payment_status")
+            .first()
+        )
+        if previous:
+            instance._previously_counted = recommendations.is_counted(previous)
+
+
+@receiver(post_save, sender=Order)
+def adjust_cooccurrences_on_status(sender, instance, created, **kwargs):
+    """
+    Subtrai os pares de um pedido cancelado ou reembolsado (ou soma-os de
+    novo se volta a contar) na tabela de coocorrências. Quem muda o estado
+    deve gravar o pedido numa transação (ver recommendations.adjust_order).
+    """
+    previous = getattr(instance, "_previously_counted", None)
+    counted = recommendations.is_counted(instance)
+    if created or previous is None or previous == counted:
+        return
+    recommendations.adjust_order(instance.pk, 1 if counted else -1)
+
+
+@receiver(pre_delete, sender=Order)
+def remove_deleted_order_cooccurrences(sender, instance, **kwargs):
+    """
+    Subtrai os pares de um pedido excluído (os itens ainda existem).
+    """
+    if recommendations.is_counted(instance):
+        recommendations.adjust_order(instance.pk, -1)
+
+
+@receiver(images.variants_generated, sender=Product)
+def invalidate_product_images(sender, pk, **kwargs):
+    """
+    Invalida o cache do produto quando as variantes da imagem mudam.
+    """
+    product = Product.objects.filter(pk=pk)
+    containers = product.values_list("store_id", "category_id").first()
+    if containers:
+        touch_containers([containers[0]], [containers[1]])
+    catalog_cache.invalidate(product_cache_keys(product))
+
+
+@receiver(images.variants_generated, sender=Category)
+def invalidate_category_images(sender, pk, **kwargs):
+    """
+    Invalida o cache da categoria quando as variantes da imagem mudam.
+    """
+    slug = Category.objects.filter(pk=pk).values_list("slug", flat=True).first()
+    catalog_cache.invalidate(
+        [catalog_cache.CATEGORIES, slug and catalog_cache.category_key(slug)]
+    )
@@ -0,0 +1,211 @@
+"""
+Sugestões de pesquisa (autocomplete) a partir de um índice de prefixos em
+memória, por processo.
+
+O índice é uma lista ordenada de chaves normalizadas (ver
+normalize_search_text), uma por início de palavra do nome ("camiseta azul"
+gera "camiseta azul" e "azul"); um prefixo é procurado com bisect, sem
+consultar o banco.
+
+Cada pedido compara a versão catalog_cache.NAMES (incrementada pelos signals
+sempre que um produto, uma categoria ou uma loja muda) com a versão do
+índice. Quando difere, só as linhas alteradas desde a última atualização
+(updated_at) são lidas e aplicadas; exclusões são detetadas comparando o
+número de entradas com o do banco, caso em que o índice é reconstruído.
+"""
+
+import threading
+from bisect import bisect_left, insort
+from datetime import timedelta
+from django.db.models import Q
+from django.utils import timezone
+from . import cache as catalog_cache
+from .models import Category, Product
+from .utils import normalize_search_text
+
+CATEGORY = "category"
+PRODUCT = "product"
+
+DEFAULT_LIMIT = 5
+MAX_LIMIT = 10
+
+# Chaves examinadas por pedido (prefixos muito curtos, como "a")
+MAX_SCAN = 500
+
+# Margem para alterações gravadas por transações que terminaram depois de
+# começarem (updated_at anterior ao início da última atualização)
+REFRESH_OVERLAP = timedelta(seconds=5)
+
+# Acima deste número de entradas alteradas a lista é reordenada de uma vez
+# em vez de atualizada entrada a entrada
+RESORT_THRESHOLD = 1000
+
+
+def name_keys(name):
+    """
+    Chaves de um nome: o nome normalizado a partir de cada palavra.
+    """
+    words = normalize_search_text(name).split(" ")
+    return [" ".join(words[i:]) for i in range(len(words)) if words[i]]
+
+
+class SuggestIndex:
+    """
+    Índice de prefixos dos nomes de produtos (de lojas ativas) e de
+    categorias (com produtos de lojas ativas).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        # (tipo, id) -> (nome, slug, chaves)
+        self.entries = {}
+        # (chave, tipo, id), ordenada
+        self.keys = []
+        self.version = None
+        self.watermark = None
+
+    def product_rows(self, since=None):
+        products = Product.objects.all()
+        if since is None:
+            products = products.filter(store__is_active=True)
+        else:
+            products = products.filter(
+                Q(updated_at__gte=since) | Q(store__updated_at__gte=since)
+            )
+        for pk, name, slug, active in products.values_list(
+            "id", "name", "slug", "store__is_active"
+        ).iterator():
+            yield (PRODUCT, pk), (name, slug) if active else None
+
+    def category_rows(self, since=None):
+        categories = Category.objects.all()
+        if since is None:
+            categories = categories.filter(product_count__gt=0)
+        else:
+            categories = categories.filter(updated_at__gte=since)
+        for pk, name, slug, count in categories.values_list(
+            "id", "name", "slug", "product_count"
+        ):
+            yield (CATEGORY, pk), (name, slug) if count else None
+
+    def rebuild(self):
+        # Montado à parte para que os pedidos em curso continuem a ler o
+        # índice anterior
+        entries = {}
+        for entry, value in self.category_rows():
+            entries[entry] = (*value, name_keys(value[0]))
+        for entry, value in self.product_rows():
+            entries[entry] = (*value, name_keys(value[0]))
+        self.entries = entries
+        self.resort()
+
+    def resort(self):
+        self.keys = sorted(
+            (key, *entry)
+            for entry, (_, _, keys) in self.entries.items()
+            for key in keys
+        )
+
+    def apply(self, changes):
+        """
+        Aplica as alterações {(tipo, id): (nome, slug) ou None para remover}.
+        """
+        resort = len(changes) > RESORT_THRESHOLD
+        for entry, value in changes.items():
+            previous = self.entries.pop(entry, None)
+            if previous and not resort:
+                for key in previous[2]:
+                    index = bisect_left(self.keys, (key, *entry))
+                    if index < len(self.keys) and self.keys[index] == (key, *entry):
+                        del self.keys[index]
+            if value is None:
+                continue
+            keys = name_keys(value[0])
+            self.entries[entry] = (*value, keys)
+            if not resort:
+                for key in keys:
+                    insort(self.keys, (key, *entry))
+        if resort:
+            self.resort()
+
+    def is_complete(self):
+        """
+        Confere o número de entradas com o do banco (deteta exclusões).
+        """
+        products = Product.objects.filter(store__is_active=True).count()
+        categories = Category.objects.filter(product_count__gt=0).count()
+        indexed = sum(1 for kind, _ in self.entries if kind == PRODUCT)
+        return (products, categories) == (indexed, len(self.entries) - indexed)
+
+    def refresh(self):
+        """
+        Atualiza o índice se a versão dos nomes do catálogo mudou.
+        """
+        version = catalog_cache.snapshot([catalog_cache.NAMES])[catalog_cache.NAMES]
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            started = timezone.now()
+            if self.watermark is None:
+                self.rebuild()
+            else:
+                since = self.watermark - REFRESH_OVERLAP
+                changes = dict(self.category_rows(since))
+                changes.update(self.product_rows(since))
+                self.apply(changes)
+                if not self.is_complete():
+                    self.rebuild()
+            self.version = version
+            self.watermark = started
+
+    def lookup(self, query, limit=DEFAULT_LIMIT):
+        """
+        Retorna {"categories": [...], "products": [...]} com até `limit`
+        nomes de cada tipo que começam (numa palavra) por `query`. Nomes que
+        começam pelo termo e nomes mais curtos aparecem primeiro.
+        """
+        prefix = normalize_search_text(query)
+        results = {CATEGORY: {}, PRODUCT: {}}
+        if prefix:
+            keys = self.keys
+            start = bisect_left(keys, (prefix,))
+            for key, kind, pk in keys[start : start + MAX_SCAN]:
+                if not key.startswith(prefix):
+                    break
+                entry = self.entries.get((kind, pk))
+                if entry is None:
+                    continue
+                name, slug, entry_keys = entry
+                rank = (key != entry_keys[0], len(name), name, pk)
+                best = results[kind].get(pk)
+                if best is None or rank < best[0]:
+                    results[kind][pk] = (rank, {"name": name, "slug": slug})
+
+        def top(kind):
+            ranked = sorted(results[kind].values(), key=lambda item: item[0])
+            return [item for _, item in ranked[:limit]]
+
+        return {"categories": top(CATEGORY), "products": top(PRODUCT)}
+
+
+_index = SuggestIndex()
+
+
+def get_index():
+    """
+    Retorna o índice deste processo, atualizado.
+    """
+    _index.refresh()
+    return _index
+
+
+def suggest(query, limit=DEFAULT_LIMIT):
+    """
+    Sugestões de nomes de categorias e produtos para o termo digitado.
+    """
+    return get_index().lookup(query, limit)
@@ -1,11 +1,34 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
-from .models import Category, Product
+from . import cache as catalog_cache
+from . import counters, recommendations
+from .facets import facet_counts
+from .importer import ProductImporter
+from .models import Category, Product, ProductCooccurrence
+from .serializers import ProductListSerializer
+from .search import ScanSearchBackend
+from .suggest import _index as suggest_index
+from .utils import normalize_search_text
 from apps.accounts.models import Store
+from apps.orders.models import Order, OrderItem
+from apps.core.testing import QueryCountMixin
 
 User = get_user_model()
 
@@ -108,16 +131,16 @@ class ProductAPITest(APITestCase):
         url = reverse("product_list")
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["name"], "Test Product")
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["name"], "Test Product")
 
     def test_products_list_by_store(self):
         """Testa a listagem de produtos de uma loja específica"""
         url = reverse("product_list")
         response = self.client.get(url, {"store": self.store.slug})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["name"], "Test Product")
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["name"], "Test Product")
 
     def test_product_detail(self):
         """Testa a obtenção de detalhes de um produto"""
@@ -147,7 +170,7 @@ class ProductAPITest(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["name"], "Test Category")
-        self.assertEqual(len(response.data["products"]), 1)
+        self.assertEqual(len(response.data["products"]["results"]), 1)
 
     def test_create_product_as_seller(self):
         """Testa a criação de um produto por um vendedor"""
@@ -293,19 +316,20 @@ class ProductAPITest(APITestCase):
         url = reverse("search")
         response = self.client.get(url, {"query": "Product"})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)  # "Test Product" e "Another Product"
+        # "Test Product" e "Another Product"
+        self.assertEqual(len(response.data["results"]), 2)
 
         # Busca por descrição
         url = reverse("search")
         response = self.client.get(url, {"query": "different"})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)  # Apenas "Different Item"
+        self.assertEqual(len(response.data["results"]), 1)  # Apenas "Different Item"
 
         # Busca por categoria
         url = reverse("search")
         response = self.client.get(url, {"query": "Test Category"})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 3)  # Todos os produtos
+        self.assertEqual(len(response.data["results"]), 3)  # Todos os produtos
 
     def test_store_products(self):
         """Testa a listagem de produtos de uma loja"""
@@ -322,10 +346,1207 @@ class ProductAPITest(APITestCase):
         url = reverse("store_products", kwargs={"slug": self.store.slug})
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)  # "Test Product" e "Another Product"
+        # "Test Product" e "Another Product"
+        self.assertEqual(len(response.data["results"]), 2)
 
     def test_store_products_not_found(self):
         """Testa a tentativa de obter produtos de uma loja inexistente"""
         url = reverse("store_products", kwargs={"slug": "nonexistent-store"})
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class KeysetPaginationTest(APITestCase):
+    """Testes para a paginação keyset das listagens do catálogo"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        self.seller = User.objects.create_user(
+            username="seller",
+            email="seller@example.com",
+            password="sellerpass123",
+            user_type="seller",
+            is_approved_seller=True,
+        )
+        self.store = Store.objects.create(name="Test Store", owner=self.seller)
+        for i in range(5):
+            Product.objects.create(
+                name=f"Product {i}",
+                description="A test product",
+                price=10 + (i % 2),
+                store=self.store,
+            )
+
+    def walk(self, params):
+        """Percorre todas as páginas seguindo o link "next" """
+        url = reverse("store_products", kwargs={"slug": self.store.slug})
+        response = self.client.get(url, params)
+        names = []
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            names.extend(item["name"] for item in response.data["results"])
+            if not response.data["next"]:
+                return names, response
+            response = self.client.get(response.data["next"])
+
+    def test_pages_cover_all_products_once(self):
+        """Testa que as páginas cobrem todos os produtos sem repetições"""
+        names, _ = self.walk({"page_size": 2})
+        self.assertEqual(names, [f"Product {i}" for i in reversed(range(5))])
+
+    def test_ordering_by_price(self):
+        """Testa a ordenação por preço com desempate por id"""
+        names, _ = self.walk({"page_size": 2, "ordering": "price"})
+        self.assertEqual(
+            names, ["Product 0", "Product 2", "Product 4", "Product 1", "Product 3"]
+        )
+
+    def test_previous_link(self):
+        """Testa a navegação para a página anterior"""
+        url = reverse("store_products", kwargs={"slug": self.store.slug})
+        first = self.client.get(url, {"page_size": 2})
+        self.assertIsNone(first.data["previous"])
+        second = self.client.get(first.data["next"])
+        back = self.client.get(second.data["previous"])
+        self.assertEqual(back.data["results"], first.data["results"])
+
+    def test_page_size_is_capped(self):
+        """Testa o limite máximo do tamanho da página"""
+        for i in range(110):
+            Product.objects.create(
+                name=f"Extra {i}", description="x", price=1, store=self.store
+            )
+        url = reverse("store_products", kwargs={"slug": self.store.slug})
+        response = self.client.get(url, {"page_size": 1000})
+        self.assertEqual(len(response.data["results"]), 100)
+
+    def test_invalid_cursor(self):
+        """Testa a rejeição de um cursor inválido"""
+        url = reverse("store_products", kwargs={"slug": self.store.slug})
+        response = self.client.get(url, {"cursor": "invalido"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ProductSearchIndexTest(APITestCase):
+    """Testes para o índice de busca full-text"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        self.seller = User.objects.create_user(
+            username="seller",
+            email="seller@example.com",
+            password="sellerpass123",
+            user_type="seller",
+            is_approved_seller=True,
+        )
+        self.store = Store.objects.create(name="Test Store", owner=self.seller)
+        self.category = Category.objects.create(name="Eletrônicos")
+        self.url = reverse("search")
+
+    def create_product(self, name, description="Produto de teste", **kwargs):
+        return Product.objects.create(
+            name=name,
+            description=description,
+            price=100,
+            store=self.store,
+            **kwargs,
+        )
+
+    def search(self, query, **params):
+        response = self.client.get(self.url, {"query": query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item["name"] for item in response.data["results"]]
+
+    def test_name_match_ranks_first(self):
+        """Testa que correspondências no nome aparecem antes da descrição"""
+        self.create_product("Capa", description="Capa para telemóvel")
+        self.create_product("Telemóvel Samsung")
+        self.assertEqual(self.search("telemóvel"), ["Telemóvel Samsung", "Capa"])
+
+    def test_prefix_and_accent_insensitive(self):
+        """Testa a busca por prefixo e sem acentos"""
+        self.create_product("Telemóvel Samsung")
+        self.assertEqual(self.search("telemov"), ["Telemóvel Samsung"])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Testa a sincronização do índice com save() e delete()"""
+        product = self.create_product("Cadeira")
+        product.name = "Mesa"
+        product.save()
+        self.assertEqual(self.search("cadeira"), [])
+        self.assertEqual(self.search("mesa"), ["Mesa"])
+
+        product.delete()
+        self.assertEqual(self.search("mesa"), [])
+
+    def test_category_rename_reindexes_products(self):
+        """Testa a reindexação dos produtos quando a categoria muda de nome"""
+        self.create_product("Rádio", category=self.category)
+        self.category.name = "Áudio"
+        self.category.save()
+        self.assertEqual(self.search("audio"), ["Rádio"])
+        self.assertEqual(self.search("eletronicos"), [])
+
+    def test_inactive_store_is_excluded(self):
+        """Testa que produtos de lojas inativas não aparecem"""
+        self.create_product("Cadeira")
+        self.store.is_active = False
+        self.store.save()
+        self.assertEqual(self.search("cadeira"), [])
+
+    def test_paging(self):
+        """Testa a paginação dos resultados"""
+        for i in range(3):
+            self.create_product(f"Cadeira {i}")
+        response = self.client.get(self.url, {"query": "cadeira", "page_size": 2})
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertIsNone(response.data["previous"])
+        following = self.client.get(response.data["next"])
+        self.assertEqual(len(following.data["results"]), 1)
+        self.assertIsNone(following.data["next"])
+        self.assertIsNotNone(following.data["previous"])
+
+
+class SearchKeyTest(TestCase):
+    """Testes para a chave de busca normalizada"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        seller = User.objects.create_user(
+            username="seller",
+            email="seller@example.com",
+            password="sellerpass123",
+            user_type="seller",
+        )
+        self.store = Store.objects.create(name="Test Store", owner=seller)
+        self.category = Category.objects.create(name="Eletrônicos")
+        self.product = Product.objects.create(
+            name="Telemóvel  ÁGUA",
+            description="Descrição",
+            price=10,
+            store=self.store,
+            category=self.category,
+        )
+
+    def test_normalize_search_text(self):
+        """Testa a remoção de acentos, casefold e espaços"""
+        self.assertEqual(
+            normalize_search_text("  Eletrônicos   e Móveis "), "eletronicos e moveis"
+        )
+        self.assertEqual(normalize_search_text(None), "")
+
+    def test_save_sets_search_key(self):
+        """Testa o preenchimento de search_key em save()"""
+        self.assertEqual(self.category.search_key, "eletronicos")
+        self.assertEqual(self.product.search_key, "telemovel agua")
+
+    def test_save_with_update_fields(self):
+        """Testa que search_key acompanha o nome em save(update_fields=...)"""
+        self.product.name = "Cadeira Acolchoada"
+        self.product.save(update_fields=["name"])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.search_key, "cadeira acolchoada")
+
+    def test_backfill_command(self):
+        """Testa o preenchimento em lotes de registros existentes"""
+        Product.objects.update(search_key="")
+        Category.objects.update(search_key="")
+        out = StringIO()
+        call_command("backfill_search_keys", batch_size=1, stdout=out)
+        self.product.refresh_from_db()
+        self.category.refresh_from_db()
+        self.assertEqual(self.product.search_key, "telemovel agua")
+        self.assertEqual(self.category.search_key, "eletronicos")
+        self.assertIn("Product: 1 registros atualizados.", out.getvalue())
+
+    def test_scan_backend_uses_search_key(self):
+        """Testa a busca sem índice full-text pelas chaves normalizadas"""
+        backend = ScanSearchBackend()
+        self.assertEqual(backend.search("AGUA", 0, 10), [self.product.id])
+        self.assertEqual(backend.search("eletrônic", 0, 10), [self.product.id])
+        self.assertEqual(backend.search("elemovel", 0, 10), [])
+
+
+class CatalogCacheTest(APITestCase):
+    """Testes para o cache versionado do catálogo"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        cache.clear()
+        self.seller = User.objects.create_user(
+            username="seller",
+            email="seller@example.com",
+            password="sellerpass123",
+            user_type="seller",
+        )
+        self.store = Store.objects.create(name="Test Store", owner=self.seller)
+        self.category = Category.objects.create(name="Test Category")
+        self.product = Product.objects.create(
+            name="Test Product",
+            description="A test product",
+            price=10,
+            store=self.store,
+            category=self.category,
+            featured=True,
+        )
+
+    def test_cached_detail_hits_no_database(self):
+        """Testa que uma resposta em cache só consulta os validadores"""
+        url = reverse("product_detail", kwargs={"slug": self.product.slug})
+        self.client.get(url)
+        # Apenas a consulta de ETag / Last-Modified do GET condicional
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.data["name"], "Test Product")
+
+    def test_detail_versions_snapshotted_before_read(self):
+        """Testa que as versões do produto, loja e categoria são lidas antes
+        da consulta do produto"""
+        url = reverse("product_detail", kwargs={"slug": self.product.slug})
+        snapshots = []
+        real_snapshot = catalog_cache.snapshot
+
+        def snapshot(keys):
+            snapshots.append(list(keys))
+            return real_snapshot(keys)
+
+        with mock.patch.object(catalog_cache, "snapshot", side_effect=snapshot):
+            self.client.get(url)
+        # Um único snapshot com as três dependências (get_entry também faz
+        # snapshot, mas só das chaves de entradas existentes)
+        self.assertIn(
+            [
+                catalog_cache.product_key(self.product.slug),
+                catalog_cache.store_key(self.store.slug),
+                catalog_cache.category_key(self.category.slug),
+            ],
+            snapshots,
+        )
+
+    def test_cached_list_hits_no_database(self):
+        """Testa que uma listagem em cache não consulta o banco"""
+        url = reverse("product_list")
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.data["results"][0]["name"], "Test Product")
+
+    def test_product_save_invalidates_detail_and_lists(self):
+        """Testa a invalidação ao salvar um produto"""
+        detail = reverse("product_detail", kwargs={"slug": self.product.slug})
+        category = reverse("category_detail", kwargs={"slug": self.category.slug})
+        self.client.get(detail)
+        self.client.get(reverse("product_list"))
+        self.client.get(category)
+
+        self.product.price = 25
+        self.product.save()
+
+        self.assertEqual(self.client.get(detail).data["price"], "25.00")
+        listed = self.client.get(reverse("product_list")).data["results"]
+        self.assertEqual(listed[0]["price"], "25.00")
+        products = self.client.get(category).data["products"]["results"]
+        self.assertEqual(products[0]["price"], "25.00")
+
+    def test_store_deactivation_invalidates(self):
+        """Testa a invalidação ao desativar a loja"""
+        detail = reverse("product_detail", kwargs={"slug": self.product.slug})
+        self.client.get(detail)
+        self.store.is_active = False
+        self.store.save()
+        response = self.client.get(detail)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse("product_list")).data["results"], [])
+
+    def test_category_rename_invalidates_category_list(self):
+        """Testa a invalidação da lista de categorias"""
+        url = reverse("category_list")
+        self.client.get(url)
+        self.category.name = "Renamed"
+        self.category.save()
+        self.assertEqual(self.client.get(url).data[0]["name"], "Renamed")
+
+    def test_other_store_does_not_invalidate(self):
+        """Testa que alterações noutra loja não invalidam esta loja"""
+        other_seller = User.objects.create_user(
+            username="other", email="other@example.com", password="otherpass123"
+        )
+        other_store = Store.objects.create(name="Other Store", owner=other_seller)
+        key = catalog_cache.store_key(self.store.slug)
+        before = catalog_cache.snapshot([key])
+        Product.objects.create(
+            name="Other Product", description="x", price=1, store=other_store
+        )
+        self.assertEqual(catalog_cache.snapshot([key]), before)
+
+
+class ProductQueryCountTest(QueryCountMixin, APITestCase):
+    """Testes do número de queries das listagens de produtos"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        cache.clear()
+        self.category = Category.objects.create(name="Test Category")
+        self.created = 0
+
+    def add_products(self, count):
+        """Acrescenta produtos em destaque de lojas diferentes"""
+        for _ in range(count):
+            self.created += 1
+            seller = User.objects.create_user(
+                username=f"seller{self.created}",
+                email=f"seller{self.created}@example.com",
+                password="sellerpass123",
+                user_type="seller",
+            )
+            store = Store.objects.create(name=f"Store {self.created}", owner=seller)
+            Product.objects.create(
+                name=f"Product {self.created}",
+                price=10,
+                category=self.category,
+                store=store,
+                featured=True,
+            )
+
+    def test_products_list_constant_queries(self):
+        """Testa que a listagem não faz uma query por produto"""
+        url = reverse("product_list")
+        self.assertConstantQueries(lambda: self.client.get(url), self.add_products)
+
+    def test_category_detail_constant_queries(self):
+        """Testa que o detalhe da categoria não faz uma query por produto"""
+        url = reverse("category_detail", kwargs={"slug": self.category.slug})
+        self.assertConstantQueries(lambda: self.client.get(url), self.add_products)
+
+    def test_list_defers_unused_fields(self):
+        """Testa que a listagem não carrega a descrição dos produtos"""
+        self.add_products(1)
+        response = self.client.get(reverse("product_list"))
+        self.assertEqual(response.data["results"][0]["store_name"], "Store 1")
+        products = ProductListSerializer.optimize_queryset(Product.objects.all())
+        self.assertIn("description", products.first().get_deferred_fields())
+
+    def test_list_sparse_fields(self):
+        """Testa a listagem só com os campos pedidos, sem ler a loja"""
+        self.add_products(2)
+        url = reverse("product_list")
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {"fields": "id,name,price,image"})
+        self.assertEqual(
+            list(response.data["results"][0]), ["id", "name", "image", "price"]
+        )
+        page_sql = [
+            query["sql"]
+            for query in context.captured_queries
+            if '"products_product"."name"' in query["sql"]
+        ]
+        self.assertEqual(len(page_sql), 1)
+        self.assertNotIn('"accounts_store"."name"', page_sql[0])
+
+    def test_list_fast_path_is_identical(self):
+        """Testa que o fast path devolve exatamente o mesmo JSON, com cursor"""
+        self.add_products(3)
+        url = reverse("product_list")
+        params = {"page_size": 2, "ordering": "price"}
+        responses = []
+        for enabled in (False, True):
+            cache.clear()
+            with self.settings(FAST_SERIALIZATION=enabled):
+                first = self.client.get(url, params)
+                second = self.client.get(first.data["next"])
+            responses.append((first.content, second.content))
+        self.assertEqual(responses[0], responses[1])
+
+
+class ConditionalGetTest(APITestCase):
+    """Testes para o GET condicional (ETag / Last-Modified) do catálogo"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        cache.clear()
+        self.seller = User.objects.create_user(
+            username="seller",
+            email="seller@example.com",
+            password="sellerpass123",
+            user_type="seller",
+        )
+        self.store = Store.objects.create(name="Test Store", owner=self.seller)
+        self.category = Category.objects.create(name="Test Category")
+        self.product = Product.objects.create(
+            name="Test Product",
+            description="A test product",
+            price=10,
+            category=self.category,
+            store=self.store,
+        )
+
+    def test_product_detail_not_modified(self):
+        """Testa a resposta 304 quando o ETag do produto não mudou"""
+        url = reverse("product_detail", kwargs={"slug": self.product.slug})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+        self.assertTrue(response.has_header("Last-Modified"))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.product.price = 12
+        self.product.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_if_modified_since(self):
+        """Testa a resposta 304 com If-Modified-Since"""
+        url = reverse("product_detail", kwargs={"slug": self.product.slug})
+        last_modified = self.client.get(url)["Last-Modified"]
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_category_detail_changes_on_delete(self):
+        """Testa que remover um produto muda os validadores da categoria"""
+        url = reverse("category_detail", kwargs={"slug": self.category.slug})
+        before = self.client.get(url)
+        updated_at = Category.objects.get(pk=self.category.pk).updated_at
+
+        self.product.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=before["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["products"]["results"], [])
+        self.assertGreater(
+            Category.objects.get(pk=self.category.pk).updated_at, updated_at
+        )
+
+    def test_store_products_not_modified(self):
+        """Testa a resposta 304 na listagem de produtos da loja"""
+        url = reverse("store_products", kwargs={"slug": self.store.slug})
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_missing_product_has_no_validators(self):
+        """Testa que um produto inexistente responde 404 sem ETag"""
+        url = reverse("product_detail", kwargs={"slug": "inexistente"})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(response.has_header("ETag"))
+
+
+class CategoryProductCountTest(APITestCase):
+    """Testes para a contagem de produtos e a página de produtos da categoria"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        cache.clear()
+        self.seller = User.objects.create_user(
+            username="seller",
+            email="seller@example.com",
+            password="sellerpass123",
+            user_type="seller",
+        )
+        self.store = Store.objects.create(name="Test Store", owner=self.seller)
+        self.category = Category.objects.create(name="Test Category")
+        self.other = Category.objects.create(name="Other Category")
+        self.products = [
+            Product.objects.create(
+                name=f"Product {i}",
+                description="x",
+                price=10,
+                category=self.category,
+                store=self.store,
+            )
+            for i in range(3)
+        ]
+
+    def count(self, category):
+        """Retorna o product_count gravado da categoria"""
+        return Category.objects.get(pk=category.pk).product_count
+
+    def test_count_follows_create_move_and_delete(self):
+        """Testa a atualização da contagem ao criar, mover e excluir produtos"""
+        self.assertEqual(self.count(self.category), 3)
+
+        product = self.products[0]
+        product.category = self.other
+        product.save()
+        self.assertEqual(self.count(self.category), 2)
+        self.assertEqual(self.count(self.other), 1)
+
+        product.delete()
+        self.assertEqual(self.count(self.other), 0)
+
+    def test_count_follows_store_activation(self):
+        """Testa que desativar a loja retira os seus produtos da contagem"""
+        self.store.is_active = False
+        self.store.save()
+        self.assertEqual(self.count(self.category), 0)
+
+        self.store.is_active = True
+        self.store.save()
+        self.assertEqual(self.count(self.category), 3)
+
+    def test_detail_pages_active_products(self):
+        """Testa que o detalhe pagina só os produtos de lojas ativas"""
+        seller = User.objects.create_user(
+            username="inactive",
+            email="inactive@example.com",
+            password="sellerpass123",
+            user_type="seller",
+        )
+        store = Store.objects.create(
+            name="Inactive Store", owner=seller, is_active=False
+        )
+        Product.objects.create(
+            name="Hidden", description="x", price=1, category=self.category, store=store
+        )
+
+        url = reverse("category_detail", kwargs={"slug": self.category.slug})
+        response = self.client.get(url, {"page_size": 2})
+        self.assertEqual(response.data["product_count"], 3)
+        self.assertEqual(len(response.data["products"]["results"]), 2)
+
+        response = self.client.get(response.data["products"]["next"])
+        names = [item["name"] for item in response.data["products"]["results"]]
+        self.assertEqual(names, ["Product 0"])
+
+    def test_refresh_command(self):
+        """Testa o comando que recalcula as contagens"""
+        Category.objects.update(product_count=0)
+        call_command("refresh_category_counts", stdout=StringIO())
+        self.assertEqual(self.count(self.category), 3)
+
+
+class ProductFacetTest(QueryCountMixin, APITestCase):
+    """Testes para os filtros e as facetas da listagem de produtos"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        cache.clear()
+        self.phones = Category.objects.create(name="Telemóveis")
+        self.books = Category.objects.create(name="Livros")
+        stores = []
+        for i in range(2):
+            seller = User.objects.create_user(
+                username=f"seller{i}",
+                email=f"seller{i}@example.com",
+                password="sellerpass123",
+                user_type="seller",
+            )
+            stores.append(Store.objects.create(name=f"Store {i}", owner=seller))
+        self.store, self.other_store = stores
+        for name, price, category, store, in_stock in [
+            ("Phone A", 80000, self.phones, self.store, True),
+            ("Phone B", 120000, self.phones, self.other_store, False),
+            ("Book A", 3000, self.books, self.store, True),
+            ("Book B", 7000, self.books, self.store, True),
+        ]:
+            Product.objects.create(
+                name=name,
+                description="x",
+                price=price,
+                category=category,
+                store=store,
+                in_stock=in_stock,
+            )
+        self.url = reverse("product_list")
+
+    def names(self, response):
+        """Retorna os nomes dos produtos da resposta"""
+        return sorted(item["name"] for item in response.data["results"])
+
+    def test_filters(self):
+        """Testa os filtros por categoria, loja, preço e estoque"""
+        response = self.client.get(self.url, {"category": self.books.slug})
+        self.assertEqual(self.names(response), ["Book A", "Book B"])
+
+        response = self.client.get(
+            self.url, {"store": self.store.slug, "max_price": 10000}
+        )
+        self.assertEqual(self.names(response), ["Book A", "Book B"])
+
+        response = self.client.get(self.url, {"min_price": 5000, "in_stock": "true"})
+        self.assertEqual(self.names(response), ["Book B", "Phone A"])
+
+    def test_invalid_filter(self):
+        """Testa a rejeição de um filtro inválido"""
+        response = self.client.get(self.url, {"min_price": "abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("min_price", response.data)
+
+    def test_facet_counts(self):
+        """Testa as contagens por categoria, loja e faixa de preço"""
+        facets = self.client.get(self.url, {"min_price": 0}).data["facets"]
+        self.assertEqual(
+            [(item["slug"], item["count"]) for item in facets["categories"]],
+            [(self.books.slug, 2), (self.phones.slug, 2)],
+        )
+        self.assertEqual(
+            [(item["name"], item["count"]) for item in facets["stores"]],
+            [("Store 0", 3), ("Store 1", 1)],
+        )
+        self.assertEqual(
+            [item["count"] for item in facets["price"]], [1, 1, 0, 0, 1, 1]
+        )
+        self.assertIsNone(facets["price"][-1]["max"])
+
+    def test_facets_follow_filters(self):
+        """Testa que as facetas contam só os produtos filtrados"""
+        facets = self.client.get(self.url, {"store": self.other_store.slug}).data[
+            "facets"
+        ]
+        self.assertEqual(len(facets["categories"]), 1)
+        self.assertEqual(facets["categories"][0]["slug"], self.phones.slug)
+
+    def test_facets_use_one_query(self):
+        """Testa que as facetas saem de uma única consulta"""
+        queries = self.count_queries(lambda: facet_counts(Product.objects.all()))
+        self.assertEqual(queries, 1)
+
+
+class ProductImportTest(APITestCase):
+    """Testes para a importação de produtos em lote"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        cache.clear()
+        self.seller = User.objects.create_user(
+            username="seller",
+            email="seller@example.com",
+            password="sellerpass123",
+            user_type="seller",
+            is_approved_seller=True,
+        )
+        self.store = Store.objects.create(name="Test Store", owner=self.seller)
+        self.category = Category.objects.create(name="Vestuário")
+        self.url = reverse("import_products")
+        refresh = RefreshToken.for_user(self.seller)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+    def upload(self, name, content):
+        """Envia um ficheiro para o endpoint de importação"""
+        upload = SimpleUploadedFile(name, content.encode())
+        return self.client.post(self.url, {"file": upload}, format="multipart")
+
+    def test_csv_import_with_error_report(self):
+        """Testa a importação de CSV com relatório de erros por linha"""
+        content = (
+            "name,description,price,stock_quantity,category\n"
+            f"Camiseta,Algodão,2500,10,{self.category.slug}\n"
+            f"Camiseta,Algodão,2600,,{self.category.slug}\n"
+            "Sem preço,x,,5,\n"
+            "Boné,x,1500,3,inexistente\n"
+        )
+        response = self.upload("produtos.csv", content)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(response.data["error_count"], 2)
+        self.assertEqual(
+            [
+                (error["row"], list(error["errors"]))
+                for error in response.data["errors"]
+            ],
+            [(3, ["price"]), (4, ["category"])],
+        )
+
+        products = Product.objects.filter(store=self.store).order_by("id")
+        self.assertEqual(
+            [product.slug for product in products], ["camiseta", "camiseta-1"]
+        )
+        self.assertEqual(products[1].stock_quantity, 1)
+        self.assertEqual(Category.objects.get(pk=self.category.pk).product_count, 2)
+
+    def test_non_utf8_file_is_rejected(self):
+        """Testa que um CSV em Latin-1 devolve um erro de ficheiro (400)"""
+        upload = SimpleUploadedFile(
+            "produtos.csv", "name,price\nCafé,10\n".encode("latin-1")
+        )
+        response = self.client.post(self.url, {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("UTF-8", response.data["file_error"])
+        self.assertFalse(Product.objects.filter(store=self.store).exists())
+
+    def test_read_error_keeps_previous_batches(self):
+        """Testa que um erro de leitura a meio mantém os lotes anteriores"""
+        content = "name,description,price\n" + "".join(
+            f"Produto {i},x,10\n" for i in range(300)
+        )
+        fileobj = BytesIO(content.encode() + "Café,x,10\n".encode("latin-1"))
+        report = ProductImporter(self.store, batch_size=50).run(fileobj, "csv")
+        # O texto é descodificado por blocos: as linhas do último bloco
+        # anterior ao erro podem não chegar a ser lidas
+        self.assertGreaterEqual(report["created"], 250)
+        self.assertIn("foram mantidos", report["file_error"])
+        self.assertEqual(
+            Product.objects.filter(store=self.store).count(), report["created"]
+        )
+
+    def test_imported_products_are_searchable(self):
+        """Testa que os produtos importados entram no índice de busca"""
+        content = '{"name": "Capulana", "description": "Tecido", "price": 900}\n'
+        response = self.upload("produtos.ndjson", content)
+        self.assertEqual(response.data["created"], 1)
+
+        response = self.client.get(reverse("search"), {"query": "capulana"})
+        self.assertEqual(response.data["results"][0]["name"], "Capulana")
+
+    def test_import_requires_active_seller(self):
+        """Testa que só vendedores aprovados podem importar"""
+        self.seller.is_approved_seller = False
+        self.seller.save()
+        response = self.upload("produtos.csv", "name\n")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_import_command(self):
+        """Testa o comando de importação com lotes pequenos"""
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as fileobj:
+            fileobj.write("name,description,price\n")
+            for i in range(7):
+                fileobj.write(f"Produto {i},x,{100 + i}\n")
+        self.addCleanup(os.remove, fileobj.name)
+
+        out = StringIO()
+        call_command(
+            "import_products",
+            self.store.slug,
+            fileobj.name,
+            "--batch-size=3",
+            stdout=out,
+        )
+        self.assertIn("7 produtos importados", out.getvalue())
+        self.assertEqual(Product.objects.filter(store=self.store).count(), 7)
+
+
+class BulkUpdateProductsTest(QueryCountMixin, APITestCase):
+    """Testes para a atualização de preço e estoque em lote"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        cache.clear()
+        self.seller = User.objects.create_user(
+            username="seller",
+            email="seller@example.com",
+            password="sellerpass123",
+            user_type="seller",
+            is_approved_seller=True,
+        )
+        self.store = Store.objects.create(name="Test Store", owner=self.seller)
+        self.products = [
+            Product.objects.create(
+                name=f"Product {i}", description="x", price=10, store=self.store
+            )
+            for i in range(3)
+        ]
+        other_seller = User.objects.create_user(
+            username="other",
+            email="other@example.com",
+            password="sellerpass123",
+            user_type="seller",
+        )
+        other_store = Store.objects.create(name="Other Store", owner=other_seller)
+        self.foreign = Product.objects.create(
+            name="Foreign", description="x", price=10, store=other_store
+        )
+        self.url = reverse("bulk_update_products")
+        refresh = RefreshToken.for_user(self.seller)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+    def test_bulk_update(self):
+        """Testa a atualização por id e por slug com relatório de erros"""
+        first, second, third = self.products
+        entries = [
+            {"id": first.id, "price": "12.50"},
+            {"slug": second.slug, "stock_quantity": 0, "in_stock": False},
+            {"id": self.foreign.id, "price": "1.00"},
+            {"slug": third.slug},
+            {"id": first.id, "stock_quantity": 7},
+        ]
+        response = self.client.post(self.url, {"products": entries}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["updated"], 2)
+        self.assertEqual([error["index"] for error in response.data["errors"]], [2, 3])
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(str(first.price), "12.50")
+        self.assertEqual(first.stock_quantity, 7)
+        self.assertFalse(second.in_stock)
+        self.assertEqual(second.price, 10)
+        self.foreign.refresh_from_db()
+        self.assertEqual(self.foreign.price, 10)
+
+    def test_bulk_update_invalidates_cache(self):
+        """Testa que o detalhe em cache reflete o novo preço"""
+        product = self.products[0]
+        detail = reverse("product_detail", kwargs={"slug": product.slug})
+        self.client.get(detail)
+        self.client.post(
+            self.url, [{"id": product.id, "price": "99.00"}], format="json"
+        )
+        self.assertEqual(self.client.get(detail).data["price"], "99.00")
+
+    def test_query_count_does_not_grow_with_entries(self):
+        """Testa que o número de queries não cresce com o número de produtos"""
+        entries = [{"id": product.id, "price": "5.00"} for product in self.products]
+
+        def add_products(count):
+            for i in range(count):
+                product = Product.objects.create(
+                    name="Extra", description="x", price=1, store=self.store
+                )
+                entries.append({"slug": product.slug, "in_stock": False})
+
+        self.assertConstantQueries(
+            lambda: self.client.post(self.url, entries, format="json"), add_products
+        )
+
+
+class ProductExportTest(APITestCase):
+    """Testes para a exportação do catálogo em streaming"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        self.category = Category.objects.create(name="Vestuário")
+        self.stores = []
+        for i in range(2):
+            seller = User.objects.create_user(
+                username=f"seller{i}",
+                email=f"seller{i}@example.com",
+                password="sellerpass123",
+                user_type="seller",
+            )
+            store = Store.objects.create(name=f"Store {i}", owner=seller)
+            Product.objects.create(
+                name=f"Camiseta {i}",
+                description='Algodão, gola "V"',
+                price=2500,
+                category=self.category,
+                store=store,
+            )
+            self.stores.append(store)
+        self.url = reverse("export_products")
+
+    def authenticate(self, user):
+        """Autentica o usuário no cliente"""
+        refresh = RefreshToken.for_user(user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+    def test_seller_exports_own_store_as_csv(self):
+        """Testa que o vendedor exporta só a própria loja"""
+        self.authenticate(self.stores[0].owner)
+        response = self.client.get(self.url, {"store": self.stores[1].slug})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+
+        content = b"".join(response.streaming_content).decode()
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["name"], "Camiseta 0")
+        self.assertEqual(rows[0]["description"], 'Algodão, gola "V"')
+        self.assertEqual(rows[0]["category"], self.category.slug)
+
+    def test_admin_exports_platform_as_gzipped_ndjson(self):
+        """Testa a exportação de toda a plataforma em NDJSON comprimido"""
+        admin = User.objects.create_user(
+            username="admin",
+            email="admin@example.com",
+            password="adminpass123",
+            user_type="admin",
+        )
+        self.authenticate(admin)
+        response = self.client.get(self.url, {"output": "ndjson", "gzip": "true"})
+        self.assertEqual(response["Content-Type"], "application/gzip")
+
+        content = gzip.decompress(b"".join(response.streaming_content))
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual(
+            [row["store"] for row in rows], [store.slug for store in self.stores]
+        )
+        self.assertEqual(rows[0]["price"], "2500.00")
+
+    def test_buyer_cannot_export(self):
+        """Testa que compradores não podem exportar"""
+        buyer = User.objects.create_user(
+            username="buyer", email="buyer@example.com", password="buyerpass123"
+        )
+        self.authenticate(buyer)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_command_round_trips_with_import(self):
+        """Testa que o CSV exportado pode ser importado noutra loja"""
+        out = StringIO()
+        call_command("export_products", store=self.stores[0].slug, stdout=out)
+
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as fileobj:
+            fileobj.write(out.getvalue())
+        self.addCleanup(os.remove, fileobj.name)
+        call_command(
+            "import_products", self.stores[1].slug, fileobj.name, stdout=StringIO()
+        )
+        self.assertEqual(Product.objects.filter(store=self.stores[1]).count(), 2)
+
+
+class ProductSuggestTest(APITestCase):
+    """Testes para as sugestões de pesquisa (autocomplete)"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        suggest_index.clear()
+        seller = User.objects.create_user(
+            username="seller",
+            email="seller@example.com",
+            password="sellerpass123",
+            user_type="seller",
+        )
+        self.store = Store.objects.create(name="Loja", owner=seller)
+        self.category = Category.objects.create(name="Camisaria")
+        self.create("Camiseta Azul")
+        self.create("Calça Jeans")
+        self.url = reverse("suggest")
+
+    def create(self, name, store=None):
+        """Cria um produto na categoria de teste"""
+        return Product.objects.create(
+            name=name, price=10, category=self.category, store=store or self.store
+        )
+
+    def names(self, query):
+        """Retorna os nomes sugeridos para o termo"""
+        response = self.client.get(self.url, {"q": query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return (
+            [item["name"] for item in response.data["categories"]],
+            [item["name"] for item in response.data["products"]],
+        )
+
+    def test_prefix_matches_any_word(self):
+        """Testa prefixos no início de qualquer palavra, sem acentos"""
+        self.assertEqual(self.names("CAMI"), (["Camisaria"], ["Camiseta Azul"]))
+        self.assertEqual(self.names("azu"), ([], ["Camiseta Azul"]))
+        self.assertEqual(self.names("calca j"), ([], ["Calça Jeans"]))
+        self.assertEqual(self.names("eta"), ([], []))
+
+    def test_served_from_memory(self):
+        """Testa que, sem alterações no catálogo, não há consultas ao banco"""
+        self.names("ca")
+        with self.assertNumQueries(0):
+            self.names("cal")
+
+    def test_index_follows_catalog_changes(self):
+        """Testa que criações, renomeações e exclusões chegam ao índice"""
+        self.names("ca")
+        product = self.create("Casaco")
+        self.assertEqual(self.names("cas")[1], ["Casaco"])
+
+        product.name = "Blusa"
+        product.save()
+        self.assertEqual(self.names("cas")[1], [])
+        self.assertEqual(self.names("blu")[1], ["Blusa"])
+
+        product.delete()
+        self.assertEqual(self.names("blu")[1], [])
+
+    def test_inactive_store_is_hidden(self):
+        """Testa que os produtos de lojas inativas não são sugeridos"""
+        self.names("ca")
+        self.store.is_active = False
+        self.store.save()
+        self.assertEqual(self.names("ca"), ([], []))
+
+
+class ProductViewCounterTest(QueryCountMixin, APITestCase):
+    """Testes para o contador de visualizações com escrita diferida"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        cache.clear()
+        counters.view_counter.get_buffer().drain()
+        seller = User.objects.create_user(
+            username="seller",
+            email="seller@example.com",
+            password="sellerpass123",
+            user_type="seller",
+        )
+        self.store = Store.objects.create(name="Loja", owner=seller)
+        self.products = [
+            Product.objects.create(name=f"Produto {i}", price=10, store=self.store)
+            for i in range(3)
+        ]
+
+    def view(self, product, times=1):
+        url = reverse("product_detail", kwargs={"slug": product.slug})
+        for _ in range(times):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_views_are_flushed_in_batches(self):
+        """Testa que as visualizações só são gravadas no despejo, em lote"""
+        self.view(self.products[0], 3)
+        self.view(self.products[1], 3)
+        self.view(self.products[2])
+        self.assertEqual(sum(Product.objects.values_list("view_count", flat=True)), 0)
+
+        # Um UPDATE por valor de incremento (3 e 1)
+        with self.assertNumQueries(2):
+            self.assertEqual(counters.view_counter.flush(), 7)
+        self.assertEqual(
+            list(Product.objects.order_by("id").values_list("view_count", flat=True)),
+            [3, 3, 1],
+        )
+        self.assertEqual(counters.view_counter.flush(), 0)
+
+    def test_not_modified_responses_are_counted(self):
+        """Testa que as revalidações (304) também contam visualizações"""
+        url = reverse("product_detail", kwargs={"slug": self.products[0].slug})
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.client.get(reverse("product_detail", kwargs={"slug": "inexistente"}))
+        self.assertEqual(
+            counters.view_counter.get_buffer().drain(), {self.products[0].slug: 2}
+        )
+
+    def test_failed_flush_keeps_views(self):
+        """Testa que as visualizações voltam ao buffer se a gravação falhar"""
+        self.view(self.products[0], 2)
+        with mock.patch.object(counters, "write_counts", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                counters.view_counter.flush()
+        self.assertEqual(counters.view_counter.flush(), 2)
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].view_count, 2)
+
+    def test_popular_ordering(self):
+        """Testa a ordenação ?ordering=popular da listagem de produtos"""
+        for product, views in zip(self.products, [5, 9, 5]):
+            Product.objects.filter(pk=product.pk).update(view_count=views)
+        url = reverse("product_list")
+        params = {"store": self.store.slug, "ordering": "popular", "page_size": 2}
+        response = self.client.get(url, params)
+        names = [item["name"] for item in response.data["results"]]
+        response = self.client.get(response.data["next"])
+        names.extend(item["name"] for item in response.data["results"])
+        self.assertEqual(names, ["Produto 1", "Produto 2", "Produto 0"])
+
+
+class BoughtTogetherTest(QueryCountMixin, APITestCase):
+    """Testes para as recomendações de produtos comprados juntos"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        seller = User.objects.create_user(
+            username="seller",
+            email="seller@example.com",
+            password="sellerpass123",
+            user_type="seller",
+        )
+        self.buyer = User.objects.create_user(
+            username="buyer", email="buyer@example.com", password="buyerpass123"
+        )
+        store = Store.objects.create(name="Loja", owner=seller)
+        self.products = {
+            name: Product.objects.create(name=name, price=10, store=store)
+            for name in "ABCD"
+        }
+        for names in ["ABC", "AB", "AD", "BC"]:
+            self.order(names)
+        self.order("AC", status="cancelled")
+
+    def order(self, names, status="pending"):
+        """Cria um pedido com os produtos indicados"""
+        order = Order.objects.create(
+            user=self.buyer,
+            total_amount=10 * len(names),
+            shipping_address="Rua 1",
+            status=status,
+        )
+        for name in names:
+            OrderItem.objects.create(
+                order=order, product=self.products[name], quantity=1, price=10
+            )
+        return order
+
+    def counts(self, name):
+        """Retorna {outro produto: contagem} do produto"""
+        return {
+            row.other.name: row.count
+            for row in ProductCooccurrence.objects.filter(
+                product=self.products[name]
+            ).select_related("other")
+        }
+
+    def build(self, **kwargs):
+        return recommendations.build_cooccurrences(until=timezone.now(), **kwargs)
+
+    def test_incremental_build(self):
+        """Testa que cada execução só processa os pedidos novos"""
+        self.assertEqual(self.build(chunk_size=2), 5)
+        self.assertEqual(self.counts("A"), {"B": 2, "C": 1, "D": 1})
+        self.assertEqual(self.counts("C"), {"A": 1, "B": 2})
+
+        self.order("AC")
+        self.assertEqual(self.build(), 1)
+        self.assertEqual(self.counts("A"), {"B": 2, "C": 2, "D": 1})
+        self.assertEqual(self.build(), 0)
+
+        recommendations.rebuild_cooccurrences(chunk_size=1, until=timezone.now())
+        self.assertEqual(self.counts("A"), {"B": 2, "C": 2, "D": 1})
+
+    def test_recent_orders_wait_for_next_build(self):
+        """Testa que pedidos recentes ficam para a execução seguinte"""
+        self.assertEqual(recommendations.build_cooccurrences(), 0)
+        self.assertEqual(ProductCooccurrence.objects.count(), 0)
+
+    def test_cancelled_order_is_subtracted(self):
+        """Testa que um pedido já processado deixa de contar ao ser cancelado
+        ou reembolsado, e volta a contar se for reativado"""
+        order = self.order("ACD")
+        self.build()
+        self.assertEqual(self.counts("A"), {"B": 2, "C": 2, "D": 2})
+
+        order.status = "cancelled"
+        order.save()
+        self.assertEqual(self.counts("A"), {"B": 2, "C": 1, "D": 1})
+        self.assertEqual(self.counts("D"), {"A": 1})
+
+        order.status = "confirmed"
+        order.save()
+        self.assertEqual(self.counts("A"), {"B": 2, "C": 2, "D": 2})
+
+        order.payment_status = "refunded"
+        order.save()
+        self.assertEqual(self.counts("A"), {"B": 2, "C": 1, "D": 1})
+
+        other = self.order("CD")
+        self.build()
+        other.delete()
+        self.assertEqual(self.counts("D"), {"A": 1})
+
+    def test_order_cancelled_before_build(self):
+        """Testa que cancelar um pedido ainda não processado não subtrai"""
+        self.build()
+        order = self.order("AD")
+        order.status = "cancelled"
+        order.save()
+        self.assertEqual(self.counts("A"), {"B": 2, "C": 1, "D": 1})
+        self.build()
+        self.assertEqual(self.counts("A"), {"B": 2, "C": 1, "D": 1})
+
+    def test_endpoint_queries(self):
+        """Testa o endpoint: o id do produto e uma leitura pelo índice"""
+        self.build()
+        url = reverse("bought_together", kwargs={"slug": self.products["A"].slug})
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item["name"] for item in response.data["results"]], ["B", "C", "D"]
+        )
+
+        response = self.client.get(url, {"limit": 1, "fields": "name"})
+        self.assertEqual(response.data["results"], [{"name": "B"}])
+
+        url = reverse("bought_together", kwargs={"slug": "nao-existe"})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -7,9 +7,20 @@ urlpatterns = [
     path("", views.products_list, name="product_list"),
     path("categories/", views.category_list, name="category_list"),
     path("search/", views.product_search, name="search"),
+    path("suggest/", views.product_suggest, name="suggest"),
+    path("export/", views.export_products, name="export_products"),
     path("seller/create/", views.create_product, name="create_product"),
+    path("seller/import/", views.import_products, name="import_products"),
+    path(
+        "seller/bulk-update/", views.bulk_update_products, name="bulk_update_products"
+    ),
     path("categories/<slug:slug>", views.category_detail, name="category_detail"),
     path("stores/<slug:slug>/", views.store_products, name="store_products"),
     path("seller/<slug:slug>", views.manage_product, name="manage_product"),
+    path(
+        "<slug:slug>/bought-together/",
+        views.bought_together,
+        name="bought_together",
+    ),
     path("<slug:slug>", views.product_detail, name="product_detail"),
 ]
@@ -0,0 +1,17 @@
+import unicodedata
+
+
+def normalize_search_text(value):
+    """
+    Normaliza um texto para busca: remove acentos, aplica casefold e
+    colapsa espaços. "Eletrônicos  Móveis" -> "eletronicos moveis".
+
+    Args:
+        value: Texto original (pode ser None)
+
+    Returns:
+        str: Texto normalizado
+    """
+    decomposed = unicodedata.normalize("NFKD", value or "")
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.casefold().split())
@@ -1,10 +1,25 @@
+from django.http import StreamingHttpResponse
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from django.db.models import Q
 from .models import Category, Product
 from apps.accounts.models import Store
+from apps.core import fastpath
+from apps.core.conditional import conditional, latest
+from apps.core.middleware import mark_compressible
+from apps.core.serializers import requested_fields
+from . import bulk
+from . import cache as catalog_cache
+from . import exporter
+from .counters import counts_views
+from .facets import facet_counts
+from .filters import ProductFilter
+from .importer import FORMATS, ProductImporter, detect_format
+from .pagination import KeysetPagination, RankedPagination
+from . import recommendations
+from .search import search_products
+from .suggest import DEFAULT_LIMIT, MAX_LIMIT, suggest
 from .serializers import (
     CategoryDetailSerializer,
     CategoryListSerializer,
@@ -14,35 +29,128 @@ from .serializers import (
 )
 
 
+def product_detail_probe(request, slug):
+    """
+    Validadores do detalhe de produto: datas do produto, da loja e da categoria.
+    """
+    row = (
+        Product.objects.filter(slug=slug, store__is_active=True)
+        .values_list("updated_at", "store__updated_at", "category__updated_at")
+        .first()
+    )
+    if row is None:
+        return None
+    return row, latest(*row)
+
+
+def category_detail_probe(request, slug):
+    """
+    Validadores do detalhe de categoria, lidos só da linha da categoria
+    (updated_at é atualizado pelos signals sempre que um produto ou uma loja
+    da categoria muda).
+    """
+    row = (
+        Category.objects.filter(slug=slug)
+        .values_list("updated_at", "product_count")
+        .first()
+    )
+    if row is None:
+        return None
+    return row, row[0]
+
+
+def store_products_probe(request, slug):
+    """
+    Validadores dos produtos de uma loja, lidos só da linha da loja
+    (updated_at é atualizado pelos signals sempre que um produto da loja muda).
+    """
+    updated_at = (
+        Store.objects.filter(slug=slug, is_active=True)
+        .values_list("updated_at", flat=True)
+        .first()
+    )
+    if updated_at is None:
+        return None
+    return (updated_at,), updated_at
+
+
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def products_list(request):
     """
-    Endpoint para listar produtos.
-    Pode filtrar por loja se o parâmetro 'store' for fornecido.
+    Endpoint para listar produtos, com filtros e contagens de facetas.
+    Sem filtros, lista os produtos em destaque.
 
     Parâmetros:
-    - store: slug da loja (opcional)
+    - category, store: slugs da categoria e da loja (opcionais)
+    - min_price, max_price: faixa de preço (opcionais)
+    - in_stock, featured: true/false (opcionais)
+    - cursor, page_size, ordering: paginação (ver KeysetPagination;
+      ordering=popular ordena pelos mais vistos)
+    - fields, expand: campos a devolver (ex.: fields=id,name,price,image)
 
     Retorna:
-    - Lista de produtos
+    - Página de produtos; a primeira página inclui "facets" com as
+      contagens por categoria, loja e faixa de preço (ver facets.py)
     """
-    # Filtra por loja se fornecido
-    store_slug = request.query_params.get("store", None)
-    if store_slug:
-        products = Product.objects.filter(store__slug=store_slug, store__is_active=True)
+    cache_key = catalog_cache.response_key("products_list", request)
+    data = catalog_cache.get_entry(cache_key)
+    if data is not None:
+        return mark_compressible(Response(data), cache_key)
+
+    filterset = ProductFilter(
+        request.query_params,
+        queryset=Product.objects.filter(store__is_active=True),
+    )
+    if not filterset.is_valid():
+        return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    # Dependências de cache: a loja e/ou a categoria filtradas, ou qualquer
+    # produto (FEATURED é incrementada a cada alteração de produto ou loja)
+    filters = filterset.form.cleaned_data
+    dependencies = [catalog_cache.CATEGORIES]
+    if filters.get("store"):
+        dependencies.append(catalog_cache.store_key(filters["store"]))
+    if filters.get("category"):
+        dependencies.append(catalog_cache.category_key(filters["category"]))
+    if len(dependencies) == 1:
+        dependencies.append(catalog_cache.FEATURED)
+    versions = catalog_cache.snapshot(dependencies)
+
+    products = filterset.qs
+    if not filterset.has_filters():
+        products = products.filter(featured=True)
+
+    fields = requested_fields(request)
+    projection = None
+    if fastpath.enabled():
+        projection = fastpath.get_projection(ProductListSerializer, fields)
+    paginator = KeysetPagination()
+    if projection is not None:
+        page = paginator.paginate_queryset(projection.values(products), request)
+        results = projection.render(page)
     else:
-        products = Product.objects.filter(featured=True, store__is_active=True)
-
-    serializer = ProductListSerializer(products, many=True)
-    return Response(serializer.data)
+        page = paginator.paginate_queryset(
+            ProductListSerializer.optimize_queryset(products, fields), request
+        )
+        results = ProductListSerializer(page, many=True, fields=fields).data
+    data = paginator.get_paginated_data(results)
+    if paginator.cursor_query_param not in request.query_params:
+        data["facets"] = facet_counts(products)
+    catalog_cache.set_entry(cache_key, data, versions)
+    return mark_compressible(Response(data), cache_key)
 
 
+@counts_views
+@conditional(product_detail_probe)
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def product_detail(request, slug):
     """
     Endpoint para obter detalhes de um produto.
+    Suporta GET condicional (ETag / Last-Modified). A visualização é contada
+    por counts_views, também nas respostas 304 (gravada em lote, ver
+    counters.py).
 
     Parâmetros:
     - slug: slug do produto
@@ -50,10 +158,35 @@ def product_detail(request, slug):
     Retorna:
     - Detalhes do produto ou mensagem de erro
     """
+    cache_key = catalog_cache.response_key("product_detail", request)
+    data = catalog_cache.get_entry(cache_key)
+    if data is not None:
+        return mark_compressible(Response(data), cache_key)
+
     try:
-        product = Product.objects.get(slug=slug, store__is_active=True)
+        # As versões da loja e da categoria também têm de ser lidas antes da
+        # consulta completa: os slugs vêm de uma consulta leve
+        products = Product.objects.filter(slug=slug, store__is_active=True)
+        store_slug, category_slug = products.values_list(
+            "store__slug", "category__slug"
+        ).get()
+        dependencies = [
+            catalog_cache.product_key(slug),
+            catalog_cache.store_key(store_slug),
+        ]
+        if category_slug:
+            dependencies.append(catalog_cache.category_key(category_slug))
+        versions = catalog_cache.snapshot(dependencies)
+
+        product = products.select_related("store", "category").get()
         serializer = ProductDetailSerializer(product)
-        return Response(serializer.data)
+        # Se o produto mudou de loja ou categoria entre as duas consultas,
+        # as versões guardadas seriam das dependências erradas
+        category = product.category
+        resolved = (product.store.slug, category.slug if category else None)
+        if resolved == (store_slug, category_slug):
+            catalog_cache.set_entry(cache_key, serializer.data, versions)
+        return mark_compressible(Response(serializer.data), cache_key)
     except Product.DoesNotExist:
         return Response(
             {"error": "Produto não encontrado"}, status=status.HTTP_404_NOT_FOUND
@@ -69,16 +202,27 @@ def category_list(request):
     Retorna:
     - Lista de categorias
     """
+    cache_key = catalog_cache.response_key("category_list", request)
+    data = catalog_cache.get_entry(cache_key)
+    if data is not None:
+        return mark_compressible(Response(data), cache_key)
+
+    versions = catalog_cache.snapshot([catalog_cache.CATEGORIES])
     categories = Category.objects.all()
     serializer = CategoryListSerializer(categories, many=True)
-    return Response(serializer.data)
+    catalog_cache.set_entry(cache_key, serializer.data, versions)
+    return mark_compressible(Response(serializer.data), cache_key)
 
 
+@conditional(category_detail_probe)
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def category_detail(request, slug):
     """
     Endpoint para obter detalhes de uma categoria.
+    Suporta GET condicional (ETag / Last-Modified).
+
+    Os produtos da categoria são paginados (ver KeysetPagination).
 
     Parâmetros:
     - slug: slug da categoria
@@ -86,31 +230,30 @@ def category_detail(request, slug):
     Retorna:
     - Detalhes da categoria ou mensagem de erro
     """
+    cache_key = catalog_cache.response_key("category_detail", request)
+    data = catalog_cache.get_entry(cache_key)
+    if data is not None:
+        return mark_compressible(Response(data), cache_key)
+
     try:
+        versions = catalog_cache.snapshot([catalog_cache.category_key(slug)])
         category = Category.objects.get(slug=slug)
-        serializer = CategoryDetailSerializer(category)
-        return Response(serializer.data)
+        serializer = CategoryDetailSerializer(category, context={"request": request})
+        catalog_cache.set_entry(cache_key, serializer.data, versions)
+        return mark_compressible(Response(serializer.data), cache_key)
     except Category.DoesNotExist:
         return Response(
             {"error": "Categoria não encontrada"}, status=status.HTTP_404_NOT_FOUND
         )
 
 
-@api_view(["POST"])
-@permission_classes([IsAuthenticated])
-def create_product(request):
+def active_seller_error(user):
     """
-    Endpoint para criação de novos produtos.
-    Apenas vendedores aprovados com lojas ativas podem criar produtos.
-
-    Parâmetros:
-    - Dados do produto no corpo da requisição
-
-    Retorna:
-    - Dados do produto criado ou mensagem de erro
+    Retorna uma resposta 403 se o usuário não for um vendedor aprovado com
+    loja ativa, ou None.
     """
     # Verifica se o usuário é um vendedor
-    if request.user.user_type != "seller":
+    if user.user_type != "seller":
         return Response(
             {"error": "Apenas vendedores podem criar produtos."},
             status=status.HTTP_403_FORBIDDEN,
@@ -118,14 +261,33 @@ def create_product(request):
 
     # Verifica se o vendedor está aprovado e se a loja está ativa
     if (
-        not request.user.is_approved_seller
-        or not hasattr(request.user, "store")
-        or not request.user.store.is_active
+        not user.is_approved_seller
+        or not hasattr(user, "store")
+        or not user.store.is_active
     ):
         return Response(
             {"error": "Sua loja não está ativa ou não foi aprovada ainda."},
             status=status.HTTP_403_FORBIDDEN,
         )
+    return None
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def create_product(request):
+    """
+    Endpoint para criação de novos produtos.
+    Apenas vendedores aprovados com lojas ativas podem criar produtos.
+
+    Parâmetros:
+    - Dados do produto no corpo da requisição
+
+    Retorna:
+    - Dados do produto criado ou mensagem de erro
+    """
+    error = active_seller_error(request.user)
+    if error:
+        return error
 
     serializer = ProductCreateSerializer(
         data=request.data, context={"request": request}
@@ -136,6 +298,150 @@ def create_product(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def import_products(request):
+    """
+    Endpoint para importação de produtos em lote.
+    Apenas vendedores aprovados com lojas ativas podem importar produtos.
+
+    Parâmetros (multipart):
+    - file: ficheiro CSV (com cabeçalho) ou NDJSON (um objeto por linha) com
+      os campos name, description, price, featured, in_stock,
+      stock_quantity e category (slug)
+    - format: csv ou ndjson (opcional; deduzido da extensão do ficheiro)
+
+    Retorna:
+    - Número de produtos criados e relatório de erros por linha; se o
+      ficheiro não puder ser lido até ao fim, file_error indica onde parou
+      e que os lotes anteriores foram mantidos (400 se nada foi importado)
+    """
+    error = active_seller_error(request.user)
+    if error:
+        return error
+
+    upload = request.FILES.get("file")
+    if upload is None:
+        return Response(
+            {"error": "Nenhum ficheiro enviado."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    file_format = request.data.get("format") or detect_format(
+        upload.name, upload.content_type
+    )
+    if file_format not in FORMATS:
+        return Response(
+            {"error": "Formato inválido. Use csv ou ndjson."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    report = ProductImporter(request.user.store).run(upload, file_format)
+    if report["created"]:
+        status_code = status.HTTP_201_CREATED
+    elif "file_error" in report:
+        # Ficheiro ilegível e nada importado
+        status_code = status.HTTP_400_BAD_REQUEST
+    else:
+        status_code = status.HTTP_200_OK
+    return Response(report, status=status_code)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def bulk_update_products(request):
+    """
+    Endpoint para atualizar preço e estoque de vários produtos de uma vez.
+    Apenas vendedores aprovados com lojas ativas podem atualizar produtos.
+
+    Parâmetros:
+    - products: lista de entradas {id ou slug, price, stock_quantity,
+      in_stock} (até MAX_ENTRIES); também é aceite a lista diretamente
+      no corpo
+
+    Retorna:
+    - Número de produtos atualizados e relatório de erros por entrada
+    """
+    error = active_seller_error(request.user)
+    if error:
+        return error
+
+    entries = request.data
+    if isinstance(entries, dict):
+        entries = entries.get("products")
+    if not isinstance(entries, list) or not entries:
+        return Response(
+            {"error": "Envie uma lista de produtos a atualizar."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if len(entries) > bulk.MAX_ENTRIES:
+        return Response(
+            {"error": f"Máximo de {bulk.MAX_ENTRIES} produtos por pedido."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    report = bulk.update_stock_and_prices(request.user.store, entries)
+    return Response(report)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def export_products(request):
+    """
+    Endpoint para exportar o catálogo em streaming.
+    Vendedores exportam a própria loja; administradores exportam uma loja
+    (parâmetro store) ou toda a plataforma.
+
+    Parâmetros:
+    - output: csv (padrão) ou ndjson
+    - gzip: true para comprimir a saída
+    - store: slug da loja (apenas administradores)
+
+    Retorna:
+    - Ficheiro com os produtos, gerado à medida que é enviado
+    """
+    user = request.user
+    store_slug = request.query_params.get("store")
+    if user.is_staff or user.user_type == "admin":
+        store = None
+        if store_slug:
+            try:
+                store = Store.objects.get(slug=store_slug)
+            except Store.DoesNotExist:
+                return Response(
+                    {"error": "Loja não encontrada."},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+    elif user.user_type == "seller" and hasattr(user, "store"):
+        store = user.store
+    else:
+        return Response(
+            {"error": "Apenas vendedores e administradores podem exportar produtos."},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+
+    file_format = request.query_params.get("output", "csv")
+    if file_format not in exporter.FORMATS:
+        return Response(
+            {"error": "Formato inválido. Use csv ou ndjson."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    compress = request.query_params.get("gzip") in ("1", "true")
+
+    stream = exporter.export_stream(
+        exporter.export_queryset(store), file_format, compress
+    )
+    filename = f"{store.slug if store else 'catalogo'}.{file_format}"
+    if compress:
+        filename += ".gz"
+        content_type = "application/gzip"
+    else:
+        content_type = f"{exporter.CONTENT_TYPES[file_format]}; charset=utf-8"
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
 @api_view(["PUT", "DELETE"])
 @permission_classes([IsAuthenticated])
 def manage_product(request, slug):
@@ -186,13 +492,16 @@ def manage_product(request, slug):
 def product_search(request):
     """
     Endpoint para busca de produtos.
-    Busca por nome, descrição ou categoria.
+    Busca por nome, descrição ou categoria no índice full-text,
+    com resultados ordenados por relevância.
 
     Parâmetros:
     - query: termo de busca
+    - cursor, page_size: paginação (ver RankedPagination)
+    - fields, expand: campos a devolver (ex.: fields=id,name,price,image)
 
     Retorna:
-    - Lista de produtos correspondentes à busca
+    - Página de produtos correspondentes à busca
     """
     query = request.query_params.get("query")
     if not query:
@@ -201,34 +510,113 @@ def product_search(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    products = Product.objects.filter(
-        Q(name__icontains=query)
-        | Q(description__icontains=query)
-        | Q(category__name__icontains=query),
-        store__is_active=True,
+    paginator = RankedPagination()
+    ids = paginator.paginate(
+        lambda offset, limit: search_products(query, offset, limit), request
     )
+    fields = requested_fields(request)
+    products = ProductListSerializer.optimize_queryset(
+        Product.objects.all(), fields
+    ).in_bulk(ids)
+    page = [products[pk] for pk in ids if pk in products]
+
+    serializer = ProductListSerializer(page, many=True, fields=fields)
+    return paginator.get_paginated_response(serializer.data)
+
+
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def product_suggest(request):
+    """
+    Endpoint de sugestões de pesquisa (autocomplete).
+    Servido por um índice de prefixos em memória, sem consultar o banco
+    enquanto o catálogo não muda.
+
+    Parâmetros:
+    - q: texto digitado
+    - limit: número máximo de sugestões de cada tipo (padrão 5, máximo 10)
 
-    serializer = ProductListSerializer(products, many=True)
-    return Response(serializer.data)
+    Retorna:
+    - Nomes e slugs das categorias e produtos que começam pelo texto
+    """
+    try:
+        limit = int(request.query_params.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        return Response(
+            {"error": "Limite inválido."}, status=status.HTTP_400_BAD_REQUEST
+        )
+    limit = min(max(limit, 1), MAX_LIMIT)
+    query = request.query_params.get("q", "")
+    return Response({"query": query, **suggest(query, limit)})
 
 
+@api_view(["GET"])
+@permission_classes([AllowAny])
+def bought_together(request, slug):
+    """
+    Endpoint de produtos frequentemente comprados junto com um produto.
+    Lido da tabela de coocorrências (ver recommendations.py) pelo índice,
+    depois de obter o id do produto.
+
+    Parâmetros:
+    - slug: slug do produto
+    - limit: número máximo de produtos (padrão 6, máximo 20)
+    - fields, expand: campos a devolver (ex.: fields=id,name,price,image)
+
+    Retorna:
+    - Produtos mais comprados junto com o produto, por número de pedidos
+    """
+    try:
+        limit = int(request.query_params.get("limit", recommendations.DEFAULT_LIMIT))
+    except ValueError:
+        return Response(
+            {"error": "Limite inválido."}, status=status.HTTP_400_BAD_REQUEST
+        )
+    limit = min(max(limit, 1), recommendations.MAX_LIMIT)
+
+    product_id = (
+        Product.objects.filter(slug=slug, store__is_active=True)
+        .values_list("pk", flat=True)
+        .first()
+    )
+    if product_id is None:
+        return Response(
+            {"error": "Produto não encontrado"}, status=status.HTTP_404_NOT_FOUND
+        )
+    fields = requested_fields(request)
+    products = ProductListSerializer.optimize_queryset(
+        recommendations.bought_together(product_id), fields
+    )
+    results = fastpath.serialize(ProductListSerializer, products[:limit], fields)
+    return Response({"product": slug, "results": results})
+
+
+@conditional(store_products_probe)
 @api_view(["GET"])
 @permission_classes([AllowAny])
 def store_products(request, slug):
     """
     Endpoint para listar produtos de uma loja específica.
+    Suporta GET condicional (ETag / Last-Modified).
 
     Parâmetros:
     - slug: slug da loja
+    - cursor, page_size, ordering: paginação (ver KeysetPagination)
+    - fields, expand: campos a devolver (ex.: fields=id,name,price,image)
 
     Retorna:
-    - Lista de produtos da loja ou mensagem de erro
+    - Página de produtos da loja ou mensagem de erro
     """
     try:
         store = Store.objects.get(slug=slug, is_active=True)
-        products = Product.objects.filter(store=store)
-        serializer = ProductListSerializer(products, many=True)
-        return Response(serializer.data)
+        fields = requested_fields(request)
+        products = ProductListSerializer.optimize_queryset(
+            Product.objects.filter(store=store), fields
+        )
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(products, request)
+        serializer = ProductListSerializer(page, many=True, fields=fields)
+        return paginator.get_paginated_response(serializer.data)
     except Store.DoesNotExist:
         return Response(
             {"error": "Loja não encontrada."}, status=status.HTTP_404_NOT_FOUND
@@ -1,11 +1,12 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from apps.core.serializers import QuerysetShapingMixin
 from .models import ProductRating, Review
 
 User = get_user_model()
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(QuerysetShapingMixin, serializers.ModelSerializer):
     """
     Serializer para avaliações de produtos.
     """
@@ -27,6 +28,8 @@ class ReviewSerializer(serializers.ModelSerializer):
             "updated_at",
         ]
         read_only_fields = ["id", "created_at", "updated_at"]
+        select_related_fields = ["product", "user"]
+        field_dependencies = {"user": ["user__id", "user__username"]}
 
     def get_user(self, obj):
         """
@@ -38,6 +41,12 @@ class ReviewSerializer(serializers.ModelSerializer):
             "username": obj.user.username,
         }
 
+    def get_user_from_row(self, row):
+        """
+        Versão de get_user para linhas de values() (ver apps.core.fastpath).
+        """
+        return {"id": row["user__id"], "username": row["user__username"]}
+
 
 class ProductRatingSerializer(serializers.ModelSerializer):
     """
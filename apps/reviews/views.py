@@ -4,6 +4,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from apps.core import fastpath
 from apps.orders.models import OrderItem
 from .models import ProductRating, Review
 from .serializers import ProductRatingSerializer, ReviewSerializer
@@ -264,5 +265,4 @@ def get_store_product_reviews(request):
         "product", "user"
     )
 
-    serializer = ReviewSerializer(reviews, many=True)
-    return Response(serializer.data)
+    return Response(fastpath.serialize(ReviewSerializer, reviews))
@@ -1,12 +1,13 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from apps.core.serializers import QuerysetShapingMixin
 from .models import Wishlist
 from apps.products.serializers import ProductListSerializer
 
 User = get_user_model()
 
 
-class WishlistSerializer(serializers.ModelSerializer):
+class WishlistSerializer(QuerysetShapingMixin, serializers.ModelSerializer):
     """
     Serializer para itens da lista de desejos.
     """
@@ -21,3 +22,4 @@ class WishlistSerializer(serializers.ModelSerializer):
     class Meta:
         model = Wishlist
         fields = ["id", "user", "product", "created_at"]
+        select_related_fields = ["user"]
@@ -7,6 +7,7 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from .models import Wishlist
 from apps.products.models import Product, Category
 from apps.accounts.models import Store
+from apps.core.testing import QueryCountMixin
 
 User = get_user_model()
 
@@ -281,3 +282,41 @@ class WishlistAPITest(APITestCase):
 
         # Deve haver apenas 1 item
         self.assertEqual(Wishlist.objects.filter(user=self.user).count(), 1)
+
+
+class WishlistQueryCountTest(QueryCountMixin, APITestCase):
+    """Testes do número de queries da lista de desejos"""
+
+    def setUp(self):
+        """Configuração inicial para os testes"""
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.category = Category.objects.create(name="Test Category")
+        self.created = 0
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+    def add_items(self, count):
+        """Acrescenta produtos de lojas diferentes à lista de desejos"""
+        for _ in range(count):
+            self.created += 1
+            seller = User.objects.create_user(
+                username=f"seller{self.created}",
+                email=f"seller{self.created}@example.com",
+                password="sellerpass123",
+                user_type="seller",
+            )
+            store = Store.objects.create(name=f"Store {self.created}", owner=seller)
+            product = Product.objects.create(
+                name=f"Product {self.created}",
+                price=10,
+                category=self.category,
+                store=store,
+            )
+            Wishlist.objects.create(user=self.user, product=product)
+
+    def test_get_wishlist_constant_queries(self):
+        """Testa que listar a lista de desejos não faz uma query por item"""
+        url = reverse("get_user_wishlist")
+        self.assertConstantQueries(lambda: self.client.get(url), self.add_items)
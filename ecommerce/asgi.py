@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ecommerce.settings")
 
 application = get_asgi_application()
+
+# Grava periodicamente no banco as visualizações dos produtos
+# (ver apps/products/counters.py)
+from apps.products.counters import view_counter  # noqa: E402
+
+view_counter.start()
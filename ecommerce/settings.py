@@ -43,6 +43,7 @@ THIRDS_APPs = [
 ]
 
 LOCAL_APPS = [
+    "apps.core.apps.CoreConfig",
     "apps.accounts.apps.AccountsConfig",
     "apps.products.apps.ProductsConfig",
     "apps.cart.apps.CartConfig",
@@ -56,6 +57,7 @@ INSTALLED_APPS = DJANGO_APPS + THIRDS_APPs + LOCAL_APPS
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "apps.core.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -96,6 +98,45 @@ DATABASES = {
 }
 
 
+# Cache
+# Redis (django-redis) quando REDIS_URL estiver definido, memória local caso contrário
+
+REDIS_URL = os.getenv("REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django_redis.cache.RedisCache",
+            "LOCATION": REDIS_URL,
+            "OPTIONS": {"CLIENT_CLASS": "django_redis.client.DefaultClient"},
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "ecommerce",
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        }
+    }
+
+# Tempo máximo (segundos) de uma resposta no cache do catálogo
+CATALOG_CACHE_TIMEOUT = int(os.getenv("CATALOG_CACHE_TIMEOUT", "300"))
+
+# Visualizações dos produtos: acumuladas em memória ("local") ou no Redis
+# ("redis") e gravadas no banco a cada intervalo (ver apps/products/counters.py)
+VIEW_COUNTER_BACKEND = os.getenv(
+    "VIEW_COUNTER_BACKEND", "redis" if REDIS_URL else "local"
+)
+VIEW_COUNTER_FLUSH_INTERVAL = int(os.getenv("VIEW_COUNTER_FLUSH_INTERVAL", "10"))
+
+# Carrinhos anónimos: nas tabelas do carrinho ("database"), num hash do
+# Redis por carrinho ("redis") ou em memória ("local"), expirando
+# GUEST_CART_TTL segundos depois da última alteração (ver apps/cart/guest.py)
+GUEST_CART_BACKEND = os.getenv("GUEST_CART_BACKEND", "database")
+GUEST_CART_TTL = int(os.getenv("GUEST_CART_TTL", str(7 * 24 * 3600)))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -141,6 +182,16 @@ STATICFILES_DIRS = (
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Variantes das imagens enviadas (largura máxima em px), geradas em segundo
+# plano após o upload (ver apps/core/images.py)
+IMAGE_VARIANT_SIZES = {"thumbnail": 300, "medium": 800}
+IMAGE_VARIANTS_ASYNC = os.getenv("IMAGE_VARIANTS_ASYNC", "True").lower() in (
+    "true",
+    "1",
+    "yes",
+)
+IMAGE_VARIANTS_WORKERS = int(os.getenv("IMAGE_VARIANTS_WORKERS", "2"))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -159,6 +210,16 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    # JSON com orjson quando instalado (mesma saída do JSONRenderer do DRF)
+    "DEFAULT_RENDERER_CLASSES": [
+        "apps.core.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "apps.core.renderers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 20,
     "DEFAULT_FILTER_BACKENDS": [
@@ -169,6 +230,20 @@ REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
 
+# Serializa as listagens mais pesadas diretamente a partir de values()
+# (ver apps/core/fastpath.py)
+FAST_SERIALIZATION = os.getenv("FAST_SERIALIZATION", "False").lower() in (
+    "true",
+    "1",
+    "yes",
+)
+
+# Compressão das respostas da API (gzip, ou brotli se instalado); respostas
+# menores que COMPRESSION_MIN_SIZE bytes seguem sem compressão
+# (ver apps/core/middleware.py)
+COMPRESSION_PATH_PREFIX = "/api/v1/"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+
 # Adicionar ao settings.py após REST_FRAMEWORK
 
 SPECTACULAR_SETTINGS = {
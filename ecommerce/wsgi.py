@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ecommerce.settings")
 
 application = get_wsgi_application()
+
+# Grava periodicamente no banco as visualizações dos produtos
+# (ver apps/products/counters.py)
+from apps.products.counters import view_counter  # noqa: E402
+
+view_counter.start()